@@ -0,0 +1,201 @@
+"""Benchmarks of the filetools readers on synthetic data.
+
+Usage:
+
+    python benchmarks/run_benchmarks.py --size small --out results.jsonl
+    python benchmarks/run_benchmarks.py --size small --compare results.jsonl
+
+Each benchmark is repeated and the fastest time is kept, with its throughput, and
+then run once more under tracemalloc for the peak memory allocated during the call.
+Results are appended as one JSON line per benchmark, tagged with the git commit, so
+runs of different versions can be compared with --compare.
+"""
+
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import numpy as np
+
+# the repository root, so filetools imports without being installed.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic
+
+from filetools.fits import ReadFITS
+from filetools.gadget import ReadGADGET
+from filetools.gadget import gadget2ascii
+from filetools.gadget import rm_gadget_ascii_copy
+from filetools.hdf5 import get_hdf5_data
+from filetools.hdf5 import close_hdf5_files
+
+
+SIZES = {'small': {'nfiles': 4, 'npart': 50000, 'fits_rows': 200000, 'hdf5_rows': 500000},
+         'medium': {'nfiles': 16, 'npart': 250000, 'fits_rows': 2000000, 'hdf5_rows': 5000000},
+         'large': {'nfiles': 64, 'npart': 1000000, 'fits_rows': 20000000, 'hdf5_rows': 50000000}}
+
+
+def get_version():
+    """Returns the git commit of the working tree, None outside a git repository."""
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        if out.returncode == 0:
+            return out.stdout.strip()
+    except OSError:
+        pass
+    return None
+
+
+def time_call(func, repeat=3):
+    """Times func, which returns (items, nbytes) processed.
+
+    The timed calls run without tracemalloc, whose tracing slows allocations down, and
+    one more call is made with tracemalloc on to measure the peak memory.
+
+    Returns
+    -------
+    result : dict
+        Fastest wall time, items/s, MB/s and the tracemalloc peak in MB.
+    """
+    best = None
+    for i in range(0, repeat):
+        t0 = time.perf_counter()
+        items, nbytes = func()
+        dt = time.perf_counter() - t0
+        if best is None or dt < best:
+            best = dt
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]/1e6
+    finally:
+        tracemalloc.stop()
+    return {'time': best, 'items': items, 'items_per_s': items/best, 'MB_per_s': nbytes/best/1e6,
+            'peak_MB': peak}
+
+
+def _nbytes(data):
+    """Returns the bytes of an array or tuple of arrays."""
+    if isinstance(data, (tuple, list)):
+        return sum(np.asarray(_d).nbytes for _d in data)
+    return np.asarray(data).nbytes
+
+
+def get_benchmarks(workdir, size, backend):
+    """Returns the benchmarks as a list of (name, function), writing their input files."""
+    gfname = os.path.join(workdir, 'snap')
+    infoname = synthetic.make_gadget(gfname, nfiles=size['nfiles'], npart=size['npart'])
+    fitsname = os.path.join(workdir, 'table.fits')
+    synthetic.make_fits(fitsname, nrows=size['fits_rows'])
+    hdf5name = os.path.join(workdir, 'data.hdf5')
+    synthetic.make_hdf5(hdf5name, nrows=size['hdf5_rows'])
+    hdf5gzip = os.path.join(workdir, 'data_gzip.hdf5')
+    synthetic.make_hdf5(hdf5gzip, nrows=size['hdf5_rows'], compression='gzip')
+
+    def gadget_read(**kwargs):
+        RG = ReadGADGET()
+        RG.file(gfname, info=infoname)
+        data = RG.read(return_pos=True, return_vel=True, return_pid=True, backend=backend, **kwargs)
+        return len(data[0]), _nbytes(data)
+
+    def fits_chunks():
+        RF = ReadFITS()
+        RF.file(fitsname, chunks=20)
+        nrows, nbytes = 0, 0
+        while RF.read_all == False:
+            data = RF.read()
+            nrows += len(data)
+            nbytes += data.nbytes
+        RF.clean()
+        return nrows, nbytes
+
+    def hdf5_read(fname, select=None):
+        data = get_hdf5_data(fname, ['pos', 'vel', 'pid'], select=select, pool=False)
+        return len(data[0]), _nbytes(data)
+
+    def ascii_copy():
+        gadget2ascii(gfname, infoname, backend=backend)
+        rm_gadget_ascii_copy(gfname)
+        return size['nfiles']*size['npart'], 0
+
+    boxsize = 1000.
+    return [('gadget_read_full', lambda: gadget_read()),
+            ('gadget_read_full_workers4', lambda: gadget_read(workers=4)),
+            ('gadget_read_full_preallocate', lambda: gadget_read(preallocate=True)),
+            ('gadget_read_region', lambda: gadget_read(xmin=0.1*boxsize, xmax=0.3*boxsize,
+                                                       ymin=0.2*boxsize, ymax=0.6*boxsize)),
+            ('fits_read_chunks', fits_chunks),
+            ('hdf5_read_full', lambda: hdf5_read(hdf5name)),
+            ('hdf5_read_slice', lambda: hdf5_read(hdf5name, select=np.s_[:size['hdf5_rows']//10])),
+            ('hdf5_read_gzip', lambda: hdf5_read(hdf5gzip)),
+            ('gadget2ascii', ascii_copy)]
+
+
+def compare(results, fname):
+    """Prints the time of each benchmark relative to the last matching run in fname."""
+    old = {}
+    with open(fname, 'r') as f:
+        for line in f:
+            result = json.loads(line)
+            if 'time' in result:
+                old[(result['name'], result['size'])] = result
+    for result in results:
+        key = (result['name'], result['size'])
+        if 'time' in result and key in old:
+            print('%-32s %8.3fs  %6.2fx  (was %.3fs, %s)' % (result['name'], result['time'],
+                  result['time']/old[key]['time'], old[key]['time'], old[key]['version']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the filetools readers.')
+    parser.add_argument('--size', default='small', choices=list(SIZES.keys()))
+    parser.add_argument('--backend', default='memmap', help="ReadGADGET backend.")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', default=None, help="Only runs benchmarks containing this string.")
+    parser.add_argument('--workdir', default=None, help="Directory for the synthetic files, default is temporary.")
+    parser.add_argument('--out', default=None, help="Appends results to this JSON lines file.")
+    parser.add_argument('--compare', default=None, help="JSON lines file of an earlier run.")
+    args = parser.parse_args(argv)
+    workdir = args.workdir
+    if workdir is None:
+        workdir = tempfile.mkdtemp(prefix='filetools_bench_')
+    elif os.path.isdir(workdir) == False:
+        os.makedirs(workdir)
+    version = get_version()
+    results = []
+    try:
+        benchmarks = get_benchmarks(workdir, SIZES[args.size], args.backend)
+        for name, func in benchmarks:
+            if args.only is not None and args.only not in name:
+                continue
+            result = {'name': name, 'size': args.size, 'backend': args.backend, 'version': version,
+                      'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+            try:
+                result.update(time_call(func, repeat=args.repeat))
+                print('%-32s %8.3fs %12.4g items/s %10.1f MB/s %10.1f MB peak' % (name, result['time'],
+                      result['items_per_s'], result['MB_per_s'], result['peak_MB']))
+            except Exception as error:
+                result['error'] = repr(error)
+                print('%-32s failed: %r' % (name, error))
+            results.append(result)
+    finally:
+        close_hdf5_files()
+        if args.workdir is None:
+            shutil.rmtree(workdir)
+    if args.out is not None:
+        with open(args.out, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+    if args.compare is not None:
+        compare(results, args.compare)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Startup time of importing filetools and its subpackages.
+
+Usage:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --max-ms 50
+
+Each import is timed in fresh interpreters, reporting the median import time and the
+heavy dependencies the import loaded. With --max-ms the script exits with an error if
+`import filetools` is slower than this or loads any heavy dependency.
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+
+HEAVY = ['numpy', 'h5py', 'fitsio', 'pygadgetreader', 'mpi4py']
+
+IMPORTS = ['filetools', 'filetools.utils', 'filetools.gadget', 'filetools.hdf5', 'filetools.fits']
+
+_SCRIPT = """
+import sys, time, json
+t0 = time.perf_counter()
+%s
+dt = time.perf_counter() - t0
+print(json.dumps({'time': dt, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+
+def time_import(statement, repeat=5):
+    """Returns the median time in seconds of a statement in fresh interpreters and the
+    heavy dependencies loaded by it."""
+    times, loaded = [], []
+    for i in range(0, repeat):
+        out = subprocess.run([sys.executable, '-c', _SCRIPT % (statement, HEAVY)],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.strip().split('\n')[-1])
+        result = json.loads(out.stdout.strip().split('\n')[-1])
+        times.append(result['time'])
+        loaded = result['loaded']
+    return float(np.median(times)), loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Startup time of importing filetools.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help="Fails if 'import filetools' takes longer than this.")
+    args = parser.parse_args(argv)
+    results = {}
+    for name in IMPORTS:
+        try:
+            dt, loaded = time_import('import ' + name, repeat=args.repeat)
+        except RuntimeError as error:
+            print('%-20s failed: %s' % (name, error))
+            continue
+        results[name] = (dt, loaded)
+        print('%-20s %8.1f ms   loads: %s' % (name, dt*1e3, ', '.join(loaded) if len(loaded) != 0 else '-'))
+    if args.max_ms is not None and 'filetools' in results:
+        dt, loaded = results['filetools']
+        if dt*1e3 > args.max_ms or len(loaded) != 0:
+            sys.exit("'import filetools' took %.1f ms and loaded %s." % (dt*1e3, loaded))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Synthetic GADGET, FITS and HDF5 files for the benchmarks."""
+
+import os
+import numpy as np
+import h5py
+import fitsio
+
+from filetools.gadget import header
+from filetools.gadget import infofile
+
+
+def _write_record(f, data):
+    """Writes a Fortran unformatted record."""
+    data = np.ascontiguousarray(data)
+    marker = np.array([data.nbytes], dtype='<i4').tobytes()
+    f.write(marker)
+    f.write(data.tobytes())
+    f.write(marker)
+
+
+def make_gadget(gfname, nfiles=8, npart=100000, boxsize=1000., seed=0, ngrid=0):
+    """Writes a multi-file GADGET format-1 snapshot of dark matter particles and its info
+    file gfname + '.info'.
+
+    The box is split into nfiles slabs along x, one per sub-file, so region reads can
+    skip files.
+
+    Parameters
+    ----------
+    gfname : str
+        Gadget filename root, sub-files are gfname + '.0', gfname + '.1', ...
+    nfiles : int, optional
+        Number of sub-files.
+    npart : int, optional
+        Number of particles in each sub-file.
+    boxsize : float, optional
+        Box size.
+    seed : int, optional
+        Random seed.
+    ngrid : int, optional
+        Per-file grid of the info file, see make_gadget_info.
+
+    Returns
+    -------
+    infoname : str
+        Info file name.
+    """
+    rng = np.random.default_rng(seed)
+    dirname = os.path.dirname(gfname)
+    if dirname != '' and os.path.isdir(dirname) == False:
+        os.makedirs(dirname)
+    for i in range(0, nfiles):
+        pos = rng.uniform(0., boxsize, (npart, 3)).astype('<f4')
+        pos[:, 0] = (pos[:, 0] + i*boxsize)/nfiles
+        vel = rng.normal(0., 100., (npart, 3)).astype('<f4')
+        pid = np.arange(i*npart, (i+1)*npart, dtype='<u4')
+        head = np.zeros(1, dtype=np.dtype(header.HEADER_DTYPE).newbyteorder('<'))
+        head['npart'][0, 1] = npart
+        head['massarr'][0, 1] = 1.
+        head['npartTotal'][0, 1] = (npart*nfiles) & 0xffffffff
+        head['npartTotalHighWord'][0, 1] = (npart*nfiles) >> 32
+        head['num_files'] = nfiles
+        head['boxsize'] = boxsize
+        head['O0'], head['Ol'], head['h'] = 0.3, 0.7, 0.7
+        with open(gfname + '.' + str(i), 'wb') as f:
+            for data in [head, pos, vel, pid]:
+                _write_record(f, data)
+    infoname = gfname + '.info'
+    infofile.make_gadget_info(gfname, infoname, ngrid=ngrid)
+    return infoname
+
+
+def make_fits(fname, nrows=1000000, ncols=8, seed=0):
+    """Writes a FITS binary table of float64 columns 'C0', 'C1', ...
+
+    Parameters
+    ----------
+    fname : str
+        FITS file name.
+    nrows : int, optional
+        Number of rows.
+    ncols : int, optional
+        Number of columns.
+    seed : int, optional
+        Random seed.
+    """
+    rng = np.random.default_rng(seed)
+    data = np.zeros(nrows, dtype=[('C%i' % i, 'f8') for i in range(0, ncols)])
+    for i in range(0, ncols):
+        data['C%i' % i] = rng.uniform(0., 1., nrows)
+    fitsio.write(fname, data, clobber=True)
+
+
+def make_hdf5(fname, nrows=1000000, chunk=65536, compression=None, seed=0):
+    """Writes a HDF5 file with chunked datasets 'pos' (N, 3), 'vel' (N, 3) and 'pid' (N).
+
+    Parameters
+    ----------
+    fname : str
+        HDF5 file name.
+    nrows : int, optional
+        Number of rows.
+    chunk : int, optional
+        Chunk length in rows.
+    compression : str, optional
+        HDF5 compression filter, e.g. 'gzip' or 'lzf'.
+    seed : int, optional
+        Random seed.
+    """
+    rng = np.random.default_rng(seed)
+    with h5py.File(fname, 'w') as hdf5_file:
+        for key, data in [('pos', rng.uniform(0., 1000., (nrows, 3)).astype('f4')),
+                          ('vel', rng.normal(0., 100., (nrows, 3)).astype('f4')),
+                          ('pid', np.arange(nrows, dtype='int64'))]:
+            chunks = (min(chunk, nrows),) + data.shape[1:]
+            hdf5_file.create_dataset(key, data=data, chunks=chunks, compression=compression)
@@ -1,6 +1,18 @@
+import importlib
 
-from . import fits
-from . import folder
-from . import gadget
-from . import hdf5
-from . import utils
+
+# subpackages are imported on first use, so e.g. fitsio is not loaded by scripts
+# which only read GADGET files.
+_SUBPACKAGES = ['fits', 'folder', 'gadget', 'hdf5', 'utils']
+
+__all__ = list(_SUBPACKAGES)
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + _SUBPACKAGES)
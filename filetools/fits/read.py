@@ -1,5 +1,71 @@
 import numpy as np
-import fitsio
+import functools
+
+from .. import utils
+
+
+fitsio = utils.lazy_import('fitsio')
+
+
+def _get_where_mask(data, where):
+    """Internal function returning the rows of data passing the where predicate.
+
+    Parameters
+    ----------
+    data : array
+        Structured array of the filter columns.
+    where : dict or function
+        Either a dictionary of column name to (min, max) inclusive limits, with None
+        for an open limit, or a function of data returning a boolean mask.
+    """
+    if callable(where):
+        return np.asarray(where(data), dtype='bool')
+    mask = np.ones(len(data), dtype='bool')
+    for col in where:
+        lim_min, lim_max = where[col]
+        if lim_min is not None:
+            mask &= data[col] >= lim_min
+        if lim_max is not None:
+            mask &= data[col] <= lim_max
+    return mask
+
+
+def _scan_chunk(rows, fname, columns, where, where_columns):
+    """Internal function which reads the rows of a chunk passing the where predicate.
+
+    The filter columns are read for the whole chunk, the other columns only for the
+    rows which pass. The file is opened by the task itself, so no handle is shared
+    between threads or inherited by forked processes.
+
+    Parameters
+    ----------
+    rows : tuple
+        First and last (exclusive) rows of the chunk.
+    fname : str
+        FITS filename.
+    columns : list
+        Columns outputted.
+    where : dict or function
+        Row predicate, see _get_where_mask.
+    where_columns : list
+        Columns needed by the predicate.
+    """
+    with fitsio.FITS(fname) as FITS:
+        hdu = FITS[1]
+        minrows, maxrows = rows
+        filt = hdu[where_columns][minrows:maxrows]
+        ind = np.flatnonzero(_get_where_mask(filt, where))
+        dtype = hdu.get_rec_dtype()[0]
+        data = np.empty(len(ind), dtype=[(col, dtype[col]) for col in columns])
+        rest = [col for col in columns if col not in where_columns]
+        for col in columns:
+            if col in where_columns:
+                data[col] = filt[col][ind]
+        if len(rest) != 0 and len(ind) != 0:
+            _data = hdu.read(columns=rest, rows=ind + minrows)
+            for col in rest:
+                data[col] = _data[col]
+    return data
 
 
 class ReadFITS:
@@ -13,11 +79,19 @@ class ReadFITS:
         self.fraction = None
         self.fraction_rows = None
         self.column_names = None
+        self.columns = None
+        self.row_bytes = None
+        self.chunk_bytes = None
+        self.prefetch = 0
+        self.verbose = False
         self.current_chunk = 0
         self.read_all = False
+        self._prefetcher = None
+        self._prefetch_next = None
+        self._prefetch_columns = None
 
 
-    def file(self, fname, chunks=100):
+    def file(self, fname, chunks=100, chunk_bytes=None, columns=None, prefetch=0, verbose=False):
         """Input the fits filename so fitsio can find the number of rows and determine
         the size of chunks.
 
@@ -27,31 +101,129 @@ class ReadFITS:
             FITS filename.
         chunks : int
             Number of chunks to be read at one time.
+        chunk_bytes : int, optional
+            Memory budget of a chunk in bytes. If set, the rows per chunk are worked out
+            from the row width of the selected columns and chunks is ignored. Later
+            reads of wider columns are then refused, as they would exceed the budget.
+        columns : list, optional
+            Columns read by default, default is all columns.
+        prefetch : int, optional
+            Number of chunks read ahead by a background thread while the caller works on
+            the current chunk. Reading ahead restarts whenever a chunk other than the
+            next one, or different columns, are requested.
+        verbose : bool, optional
+            Prints the file layout here and the rows of each chunk read.
         """
         self.clean()
         self.fname = fname
         self.FITS = fitsio.FITS(fname)
         self.nrows = self.FITS[1].get_nrows()
+        self.column_names = self.FITS[1].get_colnames()
+        self.columns = columns
+        self.prefetch = prefetch
+        self.verbose = verbose
+        if self.columns is None:
+            self.columns = self.column_names
+        self.row_bytes = self._get_row_bytes(self.columns)
+        self.chunk_bytes = chunk_bytes
+        if chunk_bytes is not None:
+            rows = max(int(chunk_bytes // self.row_bytes), 1)
+            chunks = max(int(np.ceil(self.nrows/rows)), 1)
         self.chunks = chunks
         self.fraction = 1./self.chunks
         self.fraction_rows = int(self.nrows*self.fraction)
-        self.column_names = self.FITS[1].get_colnames()
-        print('FITS file:', self.fname)
-        print('Rows total:', self.nrows)
-        print("Chunks:", self.chunks)
-        print('Rows per chunk:', self.fraction_rows)
-        print('Column names:', self.column_names)
+        if chunk_bytes is not None:
+            self.fraction_rows = rows
+        if self.verbose == True:
+            print('FITS file:', self.fname)
+            print('Rows total:', self.nrows)
+            print("Chunks:", self.chunks)
+            print('Rows per chunk:', self.fraction_rows)
+            print('Column names:', self.column_names)
+
+
+    def _get_row_bytes(self, columns):
+        """Internal function returning the width in bytes of a row of the selected columns."""
+        if isinstance(columns, str):
+            columns = [columns]
+        dtype = self.FITS[1].get_rec_dtype()[0]
+        return np.dtype([(col, dtype[col]) for col in columns]).itemsize
+
+
+    def _check_columns(self, columns):
+        """Internal function checking columns fit in the chunk_bytes budget set in file."""
+        if self.chunk_bytes is not None and self._get_row_bytes(columns) > self.row_bytes:
+            raise ValueError("Columns %s are wider than the columns chunk_bytes was set for "
+                             "in file, set them there instead." % columns)
+
+
+    def _get_chunk_rows(self, chunk):
+        """Internal function returning the first and last (exclusive) rows of a chunk."""
+        minrows = chunk*self.fraction_rows
+        if chunk+1 != self.chunks:
+            maxrows = (chunk+1)*self.fraction_rows
+        else:
+            maxrows = self.nrows
+        return minrows, maxrows
+
+
+    def _iter_chunks(self, chunk, columns):
+        """Internal generator reading chunks in order from a given chunk, through its own
+        file handle so it can run in a background thread."""
+        with fitsio.FITS(self.fname) as FITS:
+            for _chunk in range(chunk, self.chunks):
+                minrows, maxrows = self._get_chunk_rows(_chunk)
+                yield FITS[1][columns][minrows:maxrows]
+
+
+    def _stop_prefetch(self):
+        """Internal function which stops the background reader."""
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+        self._prefetcher = None
+        self._prefetch_next = None
+        self._prefetch_columns = None
+
 
+    def _get_colnums(self, columns):
+        """Internal function returning the sorted column numbers of a list of columns."""
+        return np.unique([self.column_names.index(col) for col in columns]).astype('int64')
 
-    def read(self, columns=None, chunk=None):
+
+    def get_buffer(self, columns=None):
+        """Returns an empty array large enough to hold any chunk, for use with read(out=).
+
+        Parameters
+        ----------
+        columns : list, optional
+            Columns read, default is all columns (or the columns set in file). The
+            buffer has the columns in file order, as outputted by read.
+        """
+        if columns is None:
+            columns = self.columns
+        self._check_columns(columns)
+        minrows, maxrows = self._get_chunk_rows(self.chunks-1)
+        nrows = max(self.fraction_rows, maxrows - minrows)
+        if isinstance(columns, str):
+            return np.empty(nrows, dtype=self.FITS[1].get_rec_dtype()[0][columns])
+        dtype = self.FITS[1].get_rec_dtype(colnums=self._get_colnums(columns))[0]
+        return np.empty(nrows, dtype=dtype)
+
+
+    def read(self, columns=None, chunk=None, out=None):
         """Reads iteratively unless the which_chunk is set.
 
         Parameters
         ----------
         columns : str, optional
-            Defines which columns to read, default will output all.
+            Defines which columns to read, default will output all (or the columns set
+            in file).
         chunk : int, optional
             Define which chunk of data to read.
+        out : array, optional
+            Preallocated buffer from get_buffer, so the same memory is reused across
+            chunks. Each chunk is read with fitsio and then copied in, so the returned
+            array is a view of out which is overwritten by the next read.
 
         Returns
         -------
@@ -59,19 +231,30 @@ class ReadFITS:
             Data contained in a dictionary.
         """
         if columns is None:
-            columns = self.column_names
+            columns = self.columns
+        self._check_columns(columns)
         if chunk is not None:
             assert chunk < self.chunks, "Chunk is too large for number of chunks defined."
             self.current_chunk = chunk
-        if self.current_chunk+1 != self.chunks:
-            minrows = self.current_chunk*self.fraction_rows
-            maxrows = (self.current_chunk+1)*self.fraction_rows
+        minrows, maxrows = self._get_chunk_rows(self.current_chunk)
+        if self.verbose == True:
+            print(minrows, maxrows)
+        if out is not None:
+            assert len(out) >= maxrows - minrows, "out is too small for the chunk."
+        if self.prefetch > 0:
+            if self._prefetch_next != self.current_chunk or self._prefetch_columns != columns:
+                self._stop_prefetch()
+                self._prefetcher = utils.prefetch(self._iter_chunks(self.current_chunk, columns),
+                                                  depth=self.prefetch)
+                self._prefetch_columns = columns
+            data = next(self._prefetcher)
+            self._prefetch_next = self.current_chunk + 1
         else:
-            minrows = self.current_chunk*self.fraction_rows
-            maxrows = self.nrows
-        rows = np.arange(minrows, maxrows, 1)
-        print(minrows,maxrows)
-        data = fitsio.read(self.fname, rows=rows, columns=columns)
+            # contiguous row slice read through the open HDU.
+            data = self.FITS[1][columns][minrows:maxrows]
+        if out is not None:
+            out[:len(data)] = data
+            data = out[:len(data)]
         if self.current_chunk + 1 < self.chunks:
             self.current_chunk += 1
         else:
@@ -79,5 +262,68 @@ class ReadFITS:
         return data
 
 
+    def scan(self, columns=None, where=None, where_columns=None, workers=None, pool='process',
+             stream=False):
+        """Reads the rows passing a predicate, chunk by chunk.
+
+        For each chunk the filter columns are read first and the remaining columns are
+        only read for the rows which pass.
+
+        Parameters
+        ----------
+        columns : list, optional
+            Columns outputted, default will output all (or the columns set in file).
+        where : dict or function, optional
+            Either a dictionary of column name to (min, max) inclusive limits, with None
+            for an open limit, e.g. {'Z': (0.5, 0.7)}, or a function taking a structured
+            array of where_columns and returning a boolean mask. A function must be
+            defined at module level if pool is 'process'. Default keeps every row.
+        where_columns : list, optional
+            Columns needed by a where function, default for a dictionary is its keys.
+        workers : int, optional
+            Number of chunks scanned concurrently.
+        pool : str, optional
+            Either 'thread' or 'process'.
+        stream : bool, optional
+            If True a generator yielding the matching rows of each chunk (in order) is
+            returned, otherwise the matches are concatenated.
+
+        Returns
+        -------
+        data : array or generator
+            Matching rows.
+        """
+        if columns is None:
+            columns = self.columns
+        if isinstance(columns, str):
+            columns = [columns]
+        self._check_columns(columns)
+        if where is None:
+            where = {}
+        if where_columns is None:
+            assert callable(where) == False, "where_columns must be given for a where function."
+            where_columns = list(where.keys())
+        if len(where_columns) == 0:
+            where_columns = [columns[0]]
+        rows = [self._get_chunk_rows(chunk) for chunk in range(0, self.chunks)]
+        _scan = functools.partial(_scan_chunk, fname=self.fname, columns=columns, where=where,
+                                  where_columns=list(where_columns))
+        datas = utils.pool_map(_scan, rows, workers=workers, pool=pool)
+        if stream == True:
+            return datas
+        return np.concatenate(list(datas))
+
+
+    def __iter__(self):
+        """Iterates over every chunk from the first, with the columns set in file."""
+        self.current_chunk = 0
+        self.read_all = False
+        while self.read_all == False:
+            yield self.read()
+
+
     def clean(self):
+        self._stop_prefetch()
+        if self.FITS is not None:
+            self.FITS.close()
         self.__init__()
@@ -3,7 +3,29 @@ from .ascii_single import gadget2ascii_single
 from .ascii import gadget2ascii
 from .ascii import rm_gadget_ascii_copy
 
+from .binary import gadget2binary_single
+from .binary import gadget2binary
+from .binary import load_gadget_binary
+from .binary import rm_gadget_binary_copy
+
+from .header import GadgetHeader
+from .header import get_header
+from .header import clear_header_cache
+
 from .info import get_gadget_info
 
+from .infofile import make_gadget_info
+from .infofile import load_gadget_info
+
+from .snapshot import GadgetSnapshot
+from .snapshot import readblock
+
+from .index import FileIndex
+
+from .spatial import get_morton_key
+from .spatial import get_morton_cells
+from .spatial import gadget2sorted_hdf5
+from .spatial import read_sorted_hdf5
+
 from .read_single import readsnap
 from .read import ReadGADGET
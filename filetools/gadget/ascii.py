@@ -2,9 +2,10 @@ import numpy as np
 import subprocess
 
 from . import ascii_single
+from . import infofile
 
 
-def gadget2ascii(gfname, infoname, MPI=None):
+def gadget2ascii(gfname, infoname, MPI=None, backend='pygadgetreader'):
     """Creates an ascii copy of the gadget file.
 
     Parameters
@@ -15,25 +16,27 @@ def gadget2ascii(gfname, infoname, MPI=None):
         Used for obtaining particle IDs.
     MPI : obj, optional
         MPIutils MPI class object.
+    backend : str, optional
+        Either 'pygadgetreader' or 'memmap' (native memory mapped reader).
     """
     if MPI is None:
-        data = np.loadtxt(infoname, unpack=True)
-        blocks = data[0]
+        data = infofile.load_gadget_info(infoname)
+        blocks = data['filenum']
         nparts = np.zeros(len(blocks))
-        nparts[1:] = data[7][:-1]
+        nparts[1:] = infofile.get_info_npart(gfname, data)[:-1]
         nparts = nparts.astype('int')
         nparts = np.cumsum(nparts)
         fnames = []
         for i in range(0, len(blocks)):
             fnames.append(gfname + '.' + str(i))
         for i in range(0, len(blocks)):
-            ascii_single.gadget2ascii_single(fnames[i], nparts[i])
+            ascii_single.gadget2ascii_single(fnames[i], nparts[i], backend=backend)
     else:
         if MPI.rank == 0:
-            data = np.loadtxt(infoname, unpack=True)
-            blocks = data[0]
+            data = infofile.load_gadget_info(infoname)
+            blocks = data['filenum']
             nparts = np.zeros(len(blocks))
-            nparts[1:] = data[7][:-1]
+            nparts[1:] = infofile.get_info_npart(gfname, data)[:-1]
             nparts = nparts.astype('int')
             nparts = np.cumsum(nparts)
             fnames = []
@@ -48,7 +51,7 @@ def gadget2ascii(gfname, infoname, MPI=None):
         for mpi_ind in range(0, MPI_loop_size):
             i = MPI.mpi_ind2ind(mpi_ind)
             if i is not None:
-                ascii_single.gadget2ascii_single(fnames[i], nparts[i])
+                ascii_single.gadget2ascii_single(fnames[i], nparts[i], backend=backend)
 
 
 def rm_gadget_ascii_copy(gfname):
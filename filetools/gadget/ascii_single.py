@@ -1,7 +1,7 @@
 import numpy as np
 from . import read
 
-def gadget2ascii_single(gfname_single, IDstart=0):
+def gadget2ascii_single(gfname_single, IDstart=0, backend='pygadgetreader'):
     """Converts single Gadget file into ascii format.
 
     Parameters
@@ -10,9 +10,12 @@ def gadget2ascii_single(gfname_single, IDstart=0):
         Single gadget filename.
     IDstart : int
         Particle ID starter.
+    backend : str, optional
+        Either 'pygadgetreader' or 'memmap' (native memory mapped reader).
     """
     reader = read.ReadGADGET()
-    posvel = reader.readsnap(gfname_single, return_pos=True, return_vel=True, part='dm', single=1)
+    posvel = reader.readsnap(gfname_single, return_pos=True, return_vel=True, part='dm', single=1,
+                             backend=backend)
     pos, vel = posvel[0], posvel[1]
     x, y, z = pos[:, 0], pos[:, 1], pos[:, 2]
     vx, vy, vz = vel[:, 0], vel[:, 1], vel[:, 2]
@@ -0,0 +1,220 @@
+import os
+import glob
+import functools
+import numpy as np
+
+from . import infofile
+from . import read_single
+from .. import utils
+
+
+h5py = utils.lazy_import('h5py')
+
+
+BINARY_FIELDS = ['pos', 'vel', 'pid']
+
+
+def _get_binary_fname(gfname_single, field, fmt):
+    """Internal function returning the file name of a binary copy."""
+    if fmt == 'npy':
+        return gfname_single + '.' + field + '.npy'
+    return gfname_single + '.hdf5'
+
+
+def _get_binary_files(gfname, fmt):
+    """Internal function returning the sorted file numbers of the binary copies of a snapshot."""
+    suffix = _get_binary_fname('', 'pos', fmt)
+    files = []
+    for _fname in glob.glob(gfname + '.*' + suffix):
+        num = _fname[len(gfname)+1:len(_fname)-len(suffix)]
+        if num.isdigit():
+            files.append(int(num))
+    return sorted(files)
+
+
+def gadget2binary_single(gfname_single, IDstart=0, fmt='npy', part='dm', chunk=65536,
+                         compression=None, backend='pygadgetreader'):
+    """Converts single Gadget file into a binary copy.
+
+    The positions and velocities keep the dtype of the snapshot and the particle IDs
+    are written as int64, numbered from IDstart as in gadget2ascii_single.
+
+    Parameters
+    ----------
+    gfname_single : str
+        Single gadget filename.
+    IDstart : int, optional
+        Particle ID starter.
+    fmt : str, optional
+        Either 'npy', writing gfname_single + '.pos.npy', '.vel.npy' and '.pid.npy',
+        or 'hdf5', writing datasets 'pos', 'vel' and 'pid' to gfname_single + '.hdf5'.
+    part : str, optional
+        Particle type, default set to 'dm' (dark matter).
+    chunk : int, optional
+        HDF5 chunk length in particles.
+    compression : str, optional
+        HDF5 compression filter, e.g. 'gzip' or 'lzf'.
+    backend : str, optional
+        Either 'pygadgetreader' or 'memmap' (native memory mapped reader).
+    """
+    assert fmt in ['npy', 'hdf5'], "Unknown format %s." % fmt
+    pos, vel = read_single.readsnap(gfname_single, return_pos=True, return_vel=True, part=part,
+                                    single=1, backend=backend)
+    pid = np.arange(len(pos), dtype='int64')
+    if IDstart != 0:
+        pid += IDstart
+    data = {'pos': np.asarray(pos), 'vel': np.asarray(vel), 'pid': pid}
+    if fmt == 'npy':
+        for field in BINARY_FIELDS:
+            np.save(_get_binary_fname(gfname_single, field, fmt),
+                    data[field].astype(data[field].dtype.newbyteorder('='), copy=False))
+    else:
+        with h5py.File(_get_binary_fname(gfname_single, None, fmt), 'w') as hdf5_file:
+            for field in BINARY_FIELDS:
+                _data = data[field].astype(data[field].dtype.newbyteorder('='), copy=False)
+                chunks = None
+                if len(_data) != 0:
+                    chunks = (min(chunk, len(_data)),) + _data.shape[1:]
+                hdf5_file.create_dataset(field, data=_data, chunks=chunks, compression=compression)
+
+
+def _gadget2binary_args(args, **kwargs):
+    """Internal function calling gadget2binary_single on a (file name, IDstart) pair."""
+    gadget2binary_single(args[0], IDstart=args[1], **kwargs)
+
+
+def gadget2binary(gfname, infoname, fmt='npy', part='dm', chunk=65536, compression=None,
+                  backend='pygadgetreader', workers=None, MPI=None, progress=True):
+    """Creates a binary copy of the gadget file, one per sub-file.
+
+    Parameters
+    ----------
+    gfname : str
+        Gadget filename root.
+    infoname : str
+        Used for obtaining particle IDs.
+    fmt : str, optional
+        Either 'npy' or 'hdf5', see gadget2binary_single.
+    part : str, optional
+        Particle type, default set to 'dm' (dark matter).
+    chunk : int, optional
+        HDF5 chunk length in particles.
+    compression : str, optional
+        HDF5 compression filter, e.g. 'gzip' or 'lzf'.
+    backend : str, optional
+        Either 'pygadgetreader' or 'memmap' (native memory mapped reader).
+    workers : int, optional
+        Number of sub-files converted concurrently in a process pool (on each MPI node).
+    MPI : obj, optional
+        MPIutils MPI class object.
+    progress : bool, optional
+        Reports the progress of the conversion on rank 0, see utils.ProgressTracker.
+    """
+    if MPI is None or MPI.rank == 0:
+        data = infofile.load_gadget_info(infoname)
+        nparts = np.zeros(len(data['filenum']), dtype='int64')
+        nparts[1:] = infofile.get_info_npart(gfname, data, part=part)[:-1]
+        nparts = np.cumsum(nparts)
+        fnames = [gfname + '.' + str(i) for i in range(0, len(nparts))]
+    if MPI is not None:
+        if MPI.rank == 0:
+            MPI.send(fnames, tag=11)
+            MPI.send(nparts, tag=12)
+        else:
+            fnames = MPI.recv(0, tag=11)
+            nparts = MPI.recv(0, tag=12)
+        MPI_loop_size = MPI.set_loop(len(fnames))
+        _fnames, _nparts = [], []
+        for mpi_ind in range(0, MPI_loop_size):
+            i = MPI.mpi_ind2ind(mpi_ind)
+            if i is not None:
+                _fnames.append(fnames[i])
+                _nparts.append(nparts[i])
+        fnames, nparts = _fnames, _nparts
+    _convert = functools.partial(_gadget2binary_args, fmt=fmt, part=part, chunk=chunk,
+                                 compression=compression, backend=backend)
+    outs = utils.pool_map(_convert, list(zip(fnames, nparts)), workers=workers, pool='process')
+    tracker = utils.ProgressTracker(len(fnames), explanation='Converting GADGET File',
+                                    mode='auto' if progress == True else 'off', MPI=MPI)
+    for out in outs:
+        tracker.update()
+    tracker.close()
+
+
+def load_gadget_binary(gfname, files=None, fmt='npy', return_pos=True, return_vel=True,
+                       return_pid=False, mmap=False, workers=None):
+    """Loads a binary copy made by gadget2binary.
+
+    Parameters
+    ----------
+    gfname : str
+        Gadget filename root, or a single gadget filename if files is an empty list.
+    files : list, optional
+        File numbers to load, default loads every sub-file with a binary copy.
+    fmt : str, optional
+        Either 'npy' or 'hdf5'.
+    return_pos : bool, optional
+        Outputs the positions.
+    return_vel : bool, optional
+        Outputs the velocities.
+    return_pid : bool, optional
+        Outputs the particle IDs.
+    mmap : bool, optional
+        For 'npy' copies of a single file, returns memory mapped arrays.
+    workers : int, optional
+        Number of sub-files loaded concurrently in a thread pool.
+
+    Returns
+    -------
+    data : array or tuple
+        Requested fields, in the same form as outputted by ReadGADGET.read.
+    """
+    assert fmt in ['npy', 'hdf5'], "Unknown format %s." % fmt
+    flags = [return_pos, return_vel, return_pid]
+    fields = [field for field, flag in zip(BINARY_FIELDS, flags) if flag == True]
+    if files is None:
+        fnames = [gfname + '.' + str(f) for f in _get_binary_files(gfname, fmt)]
+    elif len(files) == 0:
+        fnames = [gfname]
+    else:
+        fnames = [gfname + '.' + str(f) for f in files]
+    _load = functools.partial(_load_binary_single, fields=fields, fmt=fmt,
+                              mmap=mmap and len(fnames) == 1)
+    datas = [[] for field in fields]
+    for _data in utils.pool_map(_load, fnames, workers=workers, pool='thread'):
+        for j in range(0, len(fields)):
+            datas[j].append(_data[j])
+    if len(fnames) == 1:
+        data = [datas[j][0] for j in range(0, len(fields))]
+    else:
+        data = [np.concatenate(datas[j]) for j in range(0, len(fields))]
+    if len(data) == 1:
+        return data[0]
+    return tuple(data)
+
+
+def _load_binary_single(gfname_single, fields, fmt='npy', mmap=False):
+    """Internal function which loads the fields of a single binary copy."""
+    if fmt == 'npy':
+        mmap_mode = 'r' if mmap == True else None
+        return [np.load(_get_binary_fname(gfname_single, field, fmt), mmap_mode=mmap_mode) for field in fields]
+    with h5py.File(_get_binary_fname(gfname_single, None, fmt), 'r') as hdf5_file:
+        return [hdf5_file[field][()] for field in fields]
+
+
+def rm_gadget_binary_copy(gfname, fmt='npy'):
+    """Removes all binary copies of the gadget file.
+
+    Parameters
+    ----------
+    gfname : str
+        Gadget filename root.
+    fmt : str, optional
+        Either 'npy' or 'hdf5'.
+    """
+    for f in _get_binary_files(gfname, fmt):
+        if fmt == 'npy':
+            for field in BINARY_FIELDS:
+                os.remove(_get_binary_fname(gfname + '.' + str(f), field, fmt))
+        else:
+            os.remove(_get_binary_fname(gfname + '.' + str(f), None, fmt))
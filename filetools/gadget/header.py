@@ -0,0 +1,128 @@
+import os.path
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from .. import utils
+
+
+pyg = utils.lazy_import('pygadgetreader')
+
+
+# Layout of the 256 byte GADGET header.
+HEADER_DTYPE = [('npart', 'u4', 6), ('massarr', 'f8', 6), ('time', 'f8'),
+                ('redshift', 'f8'), ('flag_sfr', 'i4'), ('flag_feedback', 'i4'),
+                ('npartTotal', 'u4', 6), ('flag_cooling', 'i4'), ('num_files', 'i4'),
+                ('boxsize', 'f8'), ('O0', 'f8'), ('Ol', 'f8'), ('h', 'f8'),
+                ('flag_stellarage', 'i4'), ('flag_metals', 'i4'),
+                ('npartTotalHighWord', 'u4', 6), ('flag_entropy_instead_u', 'i4'),
+                ('fill', 'u1', 60)]
+
+
+# Cached headers, least recently used first, each stored by path as [modification time,
+# size, header] so a rewritten file replaces its old entry.
+_HEADER_CACHE = OrderedDict()
+_HEADER_CACHE_LOCK = threading.Lock()
+_HEADER_CACHE_SIZE = 4096
+
+
+class GadgetHeader:
+
+
+    def __init__(self, header):
+        """Header of a GADGET snapshot.
+
+        Parameters
+        ----------
+        header : dict
+            Header values, with the keys of HEADER_DTYPE.
+        """
+        self.npart = np.array(header['npart'], dtype='int64')
+        self.massarr = np.array(header['massarr'], dtype='float64')
+        self.time = float(header['time'])
+        self.redshift = float(header['redshift'])
+        self.npartTotal = np.array(header['npartTotal'], dtype='int64')
+        if 'npartTotalHighWord' in header:
+            self.npartTotal += np.array(header['npartTotalHighWord'], dtype='int64') << 32
+        self.num_files = int(header['num_files'])
+        self.boxsize = float(header['boxsize'])
+        self.omegam = float(header['O0'])
+        self.omegal = float(header['Ol'])
+        self.h = float(header['h'])
+
+
+def _read_header(fname):
+    """Internal function which reads the header of a single file in one pass, falling
+    back to pygadgetreader for files that are not GADGET binaries."""
+    try:
+        with open(fname, 'rb') as f:
+            head = f.read(4 + 16 + 4 + 256)
+        for endian in ['<', '>']:
+            marker = np.frombuffer(head[:4], dtype=endian + 'i4')[0]
+            if marker == 256:
+                start = 4
+                break
+            elif marker == 8:
+                # skips the format-2 block label record.
+                start = 16 + 4
+                break
+        else:
+            raise IOError("%s is not a GADGET binary file." % fname)
+        dtype = np.dtype(HEADER_DTYPE).newbyteorder(endian)
+        head = np.frombuffer(head[start:start+256], dtype=dtype)[0]
+        header = {}
+        for key in dtype.names:
+            if key != 'fill':
+                header[key] = head[key]
+        return GadgetHeader(header)
+    except (IOError, ValueError):
+        header = {'npart': pyg.readheader(fname, 'npartThisFile'),
+                  'massarr': pyg.readheader(fname, 'massTable'),
+                  'time': pyg.readheader(fname, 'time'),
+                  'redshift': pyg.readheader(fname, 'redshift'),
+                  'npartTotal': pyg.readheader(fname, 'npartTotal'),
+                  'num_files': pyg.readheader(fname, 'nfiles'),
+                  'boxsize': pyg.readheader(fname, 'boxsize'),
+                  'O0': pyg.readheader(fname, 'O0'),
+                  'Ol': pyg.readheader(fname, 'Ol'),
+                  'h': pyg.readheader(fname, 'h')}
+        return GadgetHeader(header)
+
+
+def get_header(gfname):
+    """Returns the header of a snapshot, cached by path, modification time and size.
+
+    Parameters
+    ----------
+    gfname : str
+        Gadget file name, either a single file or the root of a multi-part snapshot
+        (in which case the header of the first part is read).
+
+    Returns
+    -------
+    header : GadgetHeader
+        Snapshot header.
+    """
+    fname = gfname
+    if os.path.isfile(fname) == False and os.path.isfile(fname + '.0') == True:
+        fname = fname + '.0'
+    stat = os.stat(fname)
+    key = os.path.abspath(fname)
+    with _HEADER_CACHE_LOCK:
+        entry = _HEADER_CACHE.get(key)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            _HEADER_CACHE.move_to_end(key)
+            return entry[2]
+    header = _read_header(fname)
+    with _HEADER_CACHE_LOCK:
+        _HEADER_CACHE[key] = [stat.st_mtime_ns, stat.st_size, header]
+        _HEADER_CACHE.move_to_end(key)
+        while len(_HEADER_CACHE) > _HEADER_CACHE_SIZE:
+            _HEADER_CACHE.popitem(last=False)
+    return header
+
+
+def clear_header_cache():
+    """Empties the header cache."""
+    with _HEADER_CACHE_LOCK:
+        _HEADER_CACHE.clear()
@@ -0,0 +1,7 @@
+# The region helpers and file index are shared with the hdf5 readers, see utils.region.
+from ..utils.region import get_box
+from ..utils.region import get_sphere_box
+from ..utils.region import get_periodic_boxes
+from ..utils.region import merge_ranges
+from ..utils.region import get_cell_id
+from ..utils.region import FileIndex
@@ -1,8 +1,9 @@
-import pygadgetreader as pyg
+from . import header
 
 
 def get_gadget_info(gfname):
-    """Retrieves information of a simulation snapshot from the gadget file
+    """Retrieves information of a simulation snapshot from the gadget file, reading the
+    header once and caching it (see header.get_header).
 
     Parameters
     ----------
@@ -24,10 +25,11 @@ def get_gadget_info(gfname):
     npart : int
         Total number of particles.
     """
-    partmass = pyg.readheader(gfname, 'massTable')[1]
-    boxsize = pyg.readheader(gfname, 'boxsize')
-    omegam = pyg.readheader(gfname, 'O0')
-    omegal = pyg.readheader(gfname, 'Ol')
-    h = pyg.readheader(gfname, 'h')
-    npart = pyg.readheader(gfname, 'npartTotal')[1]
+    head = header.get_header(gfname)
+    partmass = head.massarr[1]
+    boxsize = head.boxsize
+    omegam = head.omegam
+    omegal = head.omegal
+    h = head.h
+    npart = head.npartTotal[1]
     return omegam, omegal, h, boxsize, partmass, npart
@@ -0,0 +1,170 @@
+import os.path
+import functools
+import numpy as np
+
+from . import header
+from . import index
+from . import snapshot
+from .. import utils
+
+
+def _scan_file(fname, part='dm', ngrid=0, sort=False):
+    """Internal function which finds the bounds, particle count and cell counts of a sub-file.
+
+    Parameters
+    ----------
+    fname : str
+        Single gadget filename, which is only read.
+    part : str, optional
+        Particle type, default set to 'dm' (dark matter).
+    ngrid : int, optional
+        Number of cells along each axis of the per-file grid, 0 for no grid.
+    sort : bool, optional
+        If True the permutation sorting the particles by cell is also returned.
+    """
+    snap = snapshot.GadgetSnapshot(fname)
+    pos = snap.block('pos', part=part)
+    npart = len(pos)
+    if npart == 0:
+        bounds = np.zeros(6)
+    else:
+        bounds = np.concatenate([pos.min(axis=0), pos.max(axis=0)]).astype('float64')
+    cell_counts, order = None, None
+    if ngrid > 0:
+        cell_id = index.get_cell_id(pos, bounds, ngrid)
+        cell_counts = np.bincount(cell_id, minlength=ngrid**3)
+        if sort == True:
+            order = np.argsort(cell_id, kind='stable').astype('uint32')
+    snap.close()
+    return bounds, npart, cell_counts, order
+
+
+def get_order_name(infoname):
+    """Returns the name of the per-file cell order written by make_gadget_info(sort=True).
+
+    Parameters
+    ----------
+    infoname : str
+        Info file name.
+    """
+    if infoname.endswith('.npz'):
+        infoname = infoname[:-len('.npz')]
+    return infoname + '.order.npy'
+
+
+def make_gadget_info(gfname, infoname, part='dm', ngrid=0, sort=False, workers=None, pool='thread',
+                     progress=True):
+    """Scans the sub-files of a GADGET snapshot and writes its info file.
+
+    The text info file has, for each sub-file, the file number, the six bounds and the
+    particle count (columns 0, 1-6 and 7). A binary sidecar infoname + '.npz' holds the
+    same table and, if ngrid > 0, the particle counts on a ngrid**3 grid spanning each
+    file's bounds. ReadGADGET.file reads the sidecar in preference to the text file,
+    unless the text file is newer. The snapshot files are only read.
+
+    Parameters
+    ----------
+    gfname : str
+        Gadget filename root.
+    infoname : str
+        Info file name.
+    part : str, optional
+        Particle type, default set to 'dm' (dark matter).
+    ngrid : int, optional
+        Number of cells along each axis of the per-file grid, 0 for no grid.
+    sort : bool, optional
+        If True the permutation sorting the particles of each sub-file by cell is
+        written to infoname + '.order.npy' (4 bytes per particle), so that region
+        reads of this particle type with the memmap backend only read the particles
+        of the cells they need.
+    workers : int, optional
+        Number of sub-files scanned concurrently.
+    pool : str, optional
+        Either 'thread' or 'process'.
+    progress : bool, optional
+        Reports the progress of the scan, see utils.ProgressTracker.
+    """
+    if sort == True and ngrid <= 0:
+        raise ValueError("Sorting requires a grid, set ngrid.")
+    fnames = snapshot.get_snapshot_files(gfname)
+    _scan = functools.partial(_scan_file, part=part, ngrid=ngrid, sort=sort)
+    bounds = np.zeros((len(fnames), 6))
+    npart = np.zeros(len(fnames), dtype='int64')
+    cell_counts, order = None, None
+    if ngrid > 0:
+        cell_counts = np.zeros((len(fnames), ngrid**3), dtype='int64')
+    if sort == True:
+        ptype = snapshot.get_part_type(part)
+        offsets = np.zeros(len(fnames)+1, dtype='int64')
+        offsets[1:] = np.cumsum([header.get_header(_fname).npart[ptype] for _fname in fnames])
+        order = np.lib.format.open_memmap(get_order_name(infoname), mode='w+', dtype='uint32',
+                                          shape=(int(offsets[-1]),))
+    tracker = utils.ProgressTracker(len(fnames), explanation='Scanning GADGET File',
+                                    mode='auto' if progress == True else 'off')
+    for i, out in enumerate(utils.pool_map(_scan, fnames, workers=workers, pool=pool)):
+        bounds[i], npart[i] = out[0], out[1]
+        if ngrid > 0:
+            cell_counts[i] = out[2]
+        if sort == True:
+            order[offsets[i]:offsets[i+1]] = out[3]
+        tracker.update(particles=npart[i])
+    tracker.close()
+    if sort == True:
+        order.flush()
+        del order
+    filenum = np.arange(len(fnames))
+    fmt = ['%d'] + ['%.8e']*6 + ['%d']
+    np.savetxt(infoname, np.column_stack([filenum, bounds, npart]), fmt=fmt)
+    if ngrid > 0:
+        np.savez(infoname + '.npz', filenum=filenum, bounds=bounds, npart=npart,
+                 part=snapshot.get_part_type(part), cell_counts=cell_counts, is_sorted=sort)
+    else:
+        np.savez(infoname + '.npz', filenum=filenum, bounds=bounds, npart=npart,
+                 part=snapshot.get_part_type(part))
+
+
+def load_gadget_info(infoname):
+    """Loads a GADGET info file, from its binary sidecar if there is one which is not
+    older than the text file (see utils.load_info).
+
+    Parameters
+    ----------
+    infoname : str
+        Info file name.
+
+    Returns
+    -------
+    info : dict
+        Contains 'filenum', 'bounds' (N, 6) and 'npart' (None if the file has no
+        particle count column). From the sidecar also 'part' (the particle type index
+        scanned), 'cell_counts' and 'is_sorted' if it has a per-file grid, and 'order'
+        (the name of the cell order file) if it is sorted.
+    """
+    info = utils.load_info(infoname)
+    if 'is_sorted' in info:
+        info['is_sorted'] = bool(info['is_sorted'])
+        if info['is_sorted'] == True and os.path.isfile(get_order_name(infoname)) == True:
+            info['order'] = get_order_name(infoname)
+        else:
+            info['is_sorted'] = False
+    return info
+
+
+def get_info_npart(gfname, info, part='dm'):
+    """Returns the particle count of each sub-file of an info file, from its particle
+    count column or, for info files without one, from the sub-file headers.
+
+    Parameters
+    ----------
+    gfname : str
+        Gadget filename root.
+    info : dict
+        Info file, see load_gadget_info.
+    part : str, optional
+        Particle type read from the headers, default set to 'dm' (dark matter).
+    """
+    if info['npart'] is not None:
+        return np.asarray(info['npart'], dtype='int64')
+    ptype = snapshot.get_part_type(part)
+    npart = [header.get_header(gfname + '.' + str(f)).npart[ptype] for f in info['filenum']]
+    return np.array(npart, dtype='int64')
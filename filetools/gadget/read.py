@@ -1,10 +1,67 @@
+import time
 import numpy as np
-import pygadgetreader as pyg
+import functools
 
+from . import header
+from . import index
+from . import infofile
 from . import read_single
+from . import snapshot
 from .. import utils
 
 
+def _readsnap_file(fname, ranges=None, stats=False, rank=0, **kwargs):
+    """Internal function which reads a sub-file, restricted to the particles of its grid
+    cells if ranges has an entry (cell ranges, order file name, offset) for it. If stats
+    is True a per-file record (see utils.make_record) is returned with the output."""
+    if ranges is not None and fname in ranges:
+        _ranges, ordername, offset = ranges[fname]
+        order = np.load(ordername, mmap_mode='r')
+        ind = [order[offset+start:offset+end] for start, end in _ranges]
+        kwargs['index'] = np.sort(np.concatenate(ind + [np.zeros(0, dtype='uint32')])).astype('int64')
+    if stats == False:
+        return read_single.readsnap(fname, **kwargs)
+    record = utils.make_record(fname, rank=rank)
+    return read_single.readsnap(fname, record=record, **kwargs), record
+
+
+def _count_file(fname, ranges=None, **kwargs):
+    """Internal function returning the number of particles of a sub-file kept by the
+    region cut and sample in kwargs, found by reading only their positions."""
+    kwargs.update(return_pos=True, return_vel=False, return_pid=False)
+    return len(_readsnap_file(fname, ranges=ranges, **kwargs))
+
+
+def _split_balanced(weights, nparts):
+    """Internal function which splits items into contiguous parts of near equal total weight.
+
+    Parameters
+    ----------
+    weights : array
+        Weight of each item, e.g. the particle count of each file.
+    nparts : int
+        Number of parts.
+
+    Returns
+    -------
+    edges : array
+        Part i contains the items edges[i] to edges[i+1].
+    """
+    weights = np.asarray(weights, dtype='float64')
+    if len(weights) == 0 or weights.sum() <= 0.:
+        weights = np.ones(len(weights))
+    cumsum = np.zeros(len(weights)+1)
+    cumsum[1:] = np.cumsum(weights)
+    targets = cumsum[-1]*np.arange(1, nparts)/nparts
+    cuts = np.searchsorted(cumsum, targets)
+    # use whichever neighbouring edge is closest to the target.
+    lower = np.clip(cuts-1, 0, len(weights))
+    closer = np.abs(cumsum[lower] - targets) < np.abs(cumsum[np.clip(cuts, 0, len(weights))] - targets)
+    cuts = np.where(closer, lower, cuts)
+    edges = np.concatenate([[0], cuts, [len(weights)]]).astype('int')
+    return np.maximum.accumulate(np.clip(edges, 0, len(weights)))
+
+
 class ReadGADGET:
 
 
@@ -13,16 +70,16 @@ class ReadGADGET:
         self.fname = None
         self.info = None
         self.filenum = None
-        self.filexmin = None
-        self.fileymin = None
-        self.filezmin = None
-        self.filexmax = None
-        self.fileymax = None
-        self.filezmax = None
+        self.filebounds = None
+        self.filenpart = None
+        self.filepart = None
+        self.fileorder = None
+        self.fileindex = None
 
 
-    def _is_file_in_range_1d(self, xmin, xmax, file_xmin, file_xmax):
-        """Internal function for checking whether a file is within range along one axis.
+    def _is_file_in_range(self, xmin, xmax, ymin, ymax, zmin, zmax, center=None, radius=None,
+                          boxsize=None):
+        """Internal function for checking whether a file is within a range.
 
         Parameters
         ----------
@@ -30,38 +87,59 @@ class ReadGADGET:
             Minimum X.
         xmax : float
             Maximum X.
-        file_xmin : float
-            File minimum X.
-        file_xmax : float
-            File maximum X.
+        ymin : float
+            Minimum Y.
+        ymax : float
+            Maximum Y.
+        zmin : float
+            Minimum Z.
+        zmax : float
+            Maximum Z.
+        center : array, optional
+            Sphere center, used instead of the box limits.
+        radius : float, optional
+            Sphere radius.
+        boxsize : float, optional
+            Size of the periodic box, if the region wraps around its edges.
         """
-        if xmin is not None and xmax is not None:
-            # To be out of range both extremes have to be outside the target range.
-            if file_xmax <= xmin:
-                return False
-            elif file_xmin >= xmax:
-                return False
-            else:
-                return True
-        elif xmin is not None and xmax is None:
-            if file_xmax <= xmin:
-                return False
-            else:
-                return True
-        elif xmin is None and xmax is not None:
-            if file_xmin > xmax:
-                return False
-            else:
-                return True
-        else:
-            return True
+        return self.fileindex.query(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax,
+                                    center=center, radius=radius, boxsize=boxsize)
 
 
-    def _is_file_in_range(self, xmin, xmax, ymin, ymax, zmin, zmax):
-        """Internal function for checking whether a file is within a range.
+    def files_in_range(self, boxes):
+        """Returns the sub-files needed for each of many regions.
 
         Parameters
         ----------
+        boxes : array
+            (M, 6) region limits [xmin, xmax, ymin, ymax, zmin, zmax], with NaN for
+            limits that are not set.
+
+        Returns
+        -------
+        files : list
+            Array of the file numbers needed for each region.
+        """
+        assert self.fileindex is not None, "Info file must be set."
+        return self.fileindex.query_batch(boxes)
+
+
+    def _get_file_ranges(self, files_needed, fnames, backend, part, xmin, xmax, ymin, ymax, zmin,
+                         zmax, center=None, radius=None, boxsize=None):
+        """Internal function returning the ranges of the grid cells each sub-file needs in
+        its cell order, with the order file name and the file's offset in it, keyed by
+        file name, or None if they cannot be used.
+
+        Parameters
+        ----------
+        files_needed : array
+            File numbers.
+        fnames : list
+            File names.
+        backend : str
+            Reader backend, ranges are only used by the 'memmap' backend.
+        part : str
+            Particle type, ranges are only used for the type the info file was made for.
         xmin : float
             Minimum X.
         xmax : float
@@ -74,15 +152,52 @@ class ReadGADGET:
             Minimum Z.
         zmax : float
             Maximum Z.
+        center : array, optional
+            Sphere center, used instead of the box limits.
+        radius : float, optional
+            Sphere radius.
+        boxsize : float, optional
+            Size of the periodic box, if the region wraps around its edges.
+        """
+        if backend != 'memmap' or self.fileorder is None or snapshot.get_part_type(part) != self.filepart:
+            return None
+        if all(lim is None for lim in [xmin, xmax, ymin, ymax, zmin, zmax]) and center is None:
+            return None
+        if center is not None:
+            box = index.get_sphere_box(center, radius)
+        else:
+            box = index.get_box(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax)
+        if boxsize is None:
+            boxes = box[np.newaxis]
+        else:
+            boxes = index.get_periodic_boxes(box, boxsize)
+        boxes = [[None if np.isnan(lim) else lim for lim in _box] for _box in boxes]
+        offsets = np.zeros(len(self.filenpart)+1, dtype='int64')
+        offsets[1:] = np.cumsum(self.filenpart)
+        ranges = {}
+        for i in range(0, len(files_needed)):
+            _ranges = [self.fileindex.cell_ranges(files_needed[i], *_box) for _box in boxes]
+            _ranges = _ranges[0] if len(_ranges) == 1 else index.merge_ranges(np.concatenate(_ranges))
+            offset = offsets[np.flatnonzero(self.filenum == files_needed[i])[0]]
+            ranges[fnames[i]] = (_ranges, self.fileorder, offset)
+        return ranges
+
+
+    def _map_files(self, func, fnames, workers=None, pool='thread'):
+        """Internal generator which applies func to each file, yielding outputs in file order.
+
+        Parameters
+        ----------
+        func : function
+            Function applied to each file name.
+        fnames : list
+            File names.
+        workers : int, optional
+            Number of concurrent readers, if None the files are read one at a time.
+        pool : str, optional
+            Either 'thread' or 'process'.
         """
-        files_needed = []
-        for i in range(0, len(self.filenum)):
-            is_x_in_range = self._is_file_in_range_1d(xmin, xmax, self.filexmin[i], self.filexmax[i])
-            is_y_in_range = self._is_file_in_range_1d(ymin, ymax, self.fileymin[i], self.fileymax[i])
-            is_z_in_range = self._is_file_in_range_1d(zmin, zmax, self.filezmin[i], self.filezmax[i])
-            if is_x_in_range*is_y_in_range*is_z_in_range == 1:
-                files_needed.append(self.filenum[i])
-        return files_needed
+        return utils.pool_map(func, fnames, workers=workers, pool=pool)
 
 
     def file(self, fname, info=None):
@@ -93,23 +208,32 @@ class ReadGADGET:
         fname : str
             File name.
         info : str
-            Info file name.
+            Info file name, see make_gadget_info. If a binary sidecar info + '.npz'
+            exists and is not older it is read instead of the text file.
         """
         self.fname = fname
         self.info = info
         if self.info is not None:
-            dinfo = np.loadtxt(self.info, unpack=True)
-            self.filenum = dinfo[0].astype('int')
-            self.filexmin = dinfo[1]
-            self.fileymin = dinfo[2]
-            self.filezmin = dinfo[3]
-            self.filexmax = dinfo[4]
-            self.fileymax = dinfo[5]
-            self.filezmax = dinfo[6]
+            dinfo = infofile.load_gadget_info(self.info)
+            self.filenum = dinfo['filenum']
+            self.filebounds = dinfo['bounds']
+            self.filenpart = dinfo['npart']
+            self.filepart = dinfo.get('part')
+            self.fileorder = dinfo.get('order')
+            self.fileindex = index.FileIndex(self.filenum, self.filebounds,
+                                             cell_counts=dinfo.get('cell_counts'),
+                                             is_sorted=dinfo.get('is_sorted', False))
+
+
+    def get_header(self):
+        """Returns the snapshot header, read once and cached (see header.get_header)."""
+        return header.get_header(self.fname)
 
 
     def readsnap(self, fname, return_pos=True, return_vel=True, return_pid=False, part='dm', single=0,
-                 xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None, suppress=1):
+                 xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None, suppress=1,
+                 backend='pygadgetreader', center=None, radius=None, periodic=False, sample=None,
+                 seed=0):
         """Reads snapshot file.
 
         Parameters
@@ -140,16 +264,276 @@ class ReadGADGET:
             Maximum z-value.
         suppress : int, optional
             Suppresses print statements from pygadgetreader.
+        backend : str, optional
+            Either 'pygadgetreader' or 'memmap' (native memory mapped reader).
+        center : array, optional
+            Sphere center [x, y, z], if set only particles within radius are kept.
+        radius : float, optional
+            Sphere radius.
+        periodic : bool, optional
+            If True the region wraps around the edges of the box (size from the header).
+        sample : int or float, optional
+            Every n-th particle if an int, or a random fraction if a float.
+        seed : int, optional
+            Random seed of a fractional sample.
         """
         return read_single.readsnap(fname, return_pos=return_pos, return_vel=return_vel,
                                     return_pid=return_pid, part=part, single=single,
                                     xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax,
-                                    zmin=zmin, zmax=zmax, suppress=suppress)
+                                    zmin=zmin, zmax=zmax, suppress=suppress, backend=backend,
+                                    center=center, radius=radius, periodic=periodic,
+                                    sample=sample, seed=seed)
+
+
+    def _get_fields(self, return_pos, return_vel, return_pid):
+        """Internal function returning the names of the fields being read, in output order."""
+        fields = []
+        if return_pos == True:
+            fields.append('pos')
+        if return_vel == True:
+            fields.append('vel')
+        if return_pid == True:
+            fields.append('pid')
+        return fields
+
+
+    def _split_output(self, out, nfields):
+        """Internal function returning a readsnap output as a list of fields."""
+        if nfields == 1:
+            return [out]
+        return list(out)
+
+
+    def _join_output(self, data):
+        """Internal function returning a list of fields in the form outputted by read."""
+        if len(data) == 1:
+            return data[0]
+        return tuple(data)
+
+
+    def _get_file_npart(self, files, part='dm', MPI=None):
+        """Internal function returning the particle counts of files.
+
+        Counts come from the info file when it has a count column made for this particle
+        type, otherwise from the headers. With MPI the headers are only read on rank 0
+        and the counts broadcast to the other ranks.
+
+        Parameters
+        ----------
+        files : list
+            File numbers.
+        part : str, optional
+            Particle type, default set to 'dm' (dark matter).
+        MPI : obj, optional
+            MPI class object with an mpi4py-like communicator MPI.comm.
+        """
+        ptype = snapshot.get_part_type(part)
+        if self.filenpart is not None and self.filepart == ptype:
+            ind = {f: i for i, f in enumerate(self.filenum)}
+            return np.array([self.filenpart[ind[f]] for f in files], dtype='int64')
+        npart = None
+        if MPI is None or MPI.rank == 0:
+            npart = [header.get_header(self.fname + '.' + str(f)).npart[ptype] for f in files]
+            npart = np.array(npart, dtype='int64')
+        if MPI is not None:
+            npart = MPI.comm.bcast(npart, root=0)
+        return npart
+
+
+    def _track_files(self, outs, nfiles, progress=False):
+        """Internal generator yielding the outputs of (output, record) pairs of files while
+        reporting progress from the records, see utils.ProgressTracker."""
+        tracker = utils.ProgressTracker(nfiles, explanation='Reading from GADGET File',
+                                        mode='auto' if progress == True else 'off')
+        try:
+            for _out, record in outs:
+                tracker.update(particles=record['nread'], nbytes=record['nbytes'])
+                yield _out
+        finally:
+            tracker.close()
+            outs.close()
+
+
+    def _read_files(self, func, fnames, nfields, counts=None, workers=None, pool='thread',
+                    progress=False, MPI=None, stats=None):
+        """Internal function which reads a list of files and joins them into single arrays.
+
+        Parameters
+        ----------
+        func : function
+            Function returning the readsnap output for a file name and its per-file
+            record (see utils.make_record).
+        fnames : list
+            File names.
+        nfields : int
+            Number of fields returned by func.
+        counts : array, optional
+            Number of particles returned from each file. If given, the outputs are
+            allocated once and each file is written into its own slice, otherwise the
+            outputs are appended to lists and concatenated.
+        workers : int, optional
+            Number of concurrent readers.
+        pool : str, optional
+            Either 'thread' or 'process'.
+        progress : bool, optional
+            Reports progress and throughput, see utils.ProgressTracker, from the particles
+            and bytes read from each file (not those kept).
+        MPI : obj, optional
+            mpiutils MPI class object, progress is only reported by rank 0.
+        stats : obj, optional
+            utils.ReadStats object the per-file records are added to.
+        """
+        if len(fnames) == 0:
+            return [None for j in range(0, nfields)]
+        if counts is None:
+            datas = [[] for j in range(0, nfields)]
+        else:
+            data = None
+            starts = np.zeros(len(counts)+1, dtype='int')
+            starts[1:] = np.cumsum(counts)
+        tracker = utils.ProgressTracker(len(fnames), explanation='Reading from GADGET File',
+                                        mode='auto' if progress == True else 'off', MPI=MPI)
+        for i, (_out, record) in enumerate(self._map_files(func, fnames, workers=workers, pool=pool)):
+            if stats is not None:
+                t = time.time()
+            _data = self._split_output(_out, nfields)
+            if counts is None:
+                for j in range(0, nfields):
+                    datas[j].append(_data[j])
+            else:
+                if data is None:
+                    data = [np.empty((starts[-1],) + np.shape(_d)[1:], dtype=np.asarray(_d).dtype.newbyteorder('='))
+                            for _d in _data]
+                for j in range(0, nfields):
+                    if len(_data[j]) != counts[i]:
+                        raise IOError("Read %i particles from %s but its header has %i." % (len(_data[j]), fnames[i], counts[i]))
+                    data[j][starts[i]:starts[i+1]] = _data[j]
+            if stats is not None:
+                utils.add_phase(record, 'copy', t)
+                stats.add_file(record)
+            tracker.update(particles=record['nread'], nbytes=record['nbytes'])
+        tracker.close()
+        if counts is None:
+            if stats is not None:
+                t = time.time()
+            data = [np.concatenate(datas[j]) for j in range(0, nfields)]
+            if stats is not None:
+                stats.add_phase('concatenate', t, rank=0 if MPI is None else MPI.rank)
+        return data
+
+
+    def _combine_mpi(self, data, MPI, preallocate=False):
+        """Internal function which combines the outputs of each MPI node onto rank 0.
+
+        Parameters
+        ----------
+        data : list
+            Fields read by this node, None if no files were read.
+        MPI : obj
+            mpiutils MPI class object.
+        preallocate : bool, optional
+            If True rank 0 allocates the combined arrays once and fills in each node's
+            slice, otherwise the outputs are concatenated.
+        """
+        nfields = len(data)
+        if MPI.rank != 0:
+            if preallocate == True:
+                if data[0] is None:
+                    MPI.send(0, to_rank=0, tag=10)
+                else:
+                    MPI.send(len(data[0]), to_rank=0, tag=10)
+            for j in range(0, nfields):
+                MPI.send(data[j], to_rank=0, tag=11+j)
+            return [None for j in range(0, nfields)]
+        if preallocate == False:
+            datas = [[data[j]] if data[j] is not None else [] for j in range(0, nfields)]
+            for i in range(1, MPI.size):
+                for j in range(0, nfields):
+                    _data = MPI.recv(i, tag=11+j)
+                    if _data is not None:
+                        datas[j].append(_data)
+            return [np.concatenate(datas[j]) if len(datas[j]) != 0 else None for j in range(0, nfields)]
+        counts = np.zeros(MPI.size, dtype='int')
+        if data[0] is not None:
+            counts[0] = len(data[0])
+        for i in range(1, MPI.size):
+            counts[i] = MPI.recv(i, tag=10)
+        starts = np.zeros(MPI.size+1, dtype='int')
+        starts[1:] = np.cumsum(counts)
+        combined = [None for j in range(0, nfields)]
+        for i in range(0, MPI.size):
+            for j in range(0, nfields):
+                if i == 0:
+                    _data = data[j]
+                else:
+                    _data = MPI.recv(i, tag=11+j)
+                if _data is None:
+                    continue
+                if combined[j] is None:
+                    combined[j] = np.empty((starts[-1],) + np.shape(_data)[1:], dtype=_data.dtype.newbyteorder('='))
+                combined[j][starts[i]:starts[i+1]] = _data
+        return combined
+
+
+    def _gatherv_mpi(self, data, MPI):
+        """Internal function which gathers the outputs of each MPI node into preallocated
+        arrays on rank 0 with collective Gatherv calls.
+
+        Parameters
+        ----------
+        data : list
+            Fields read by this node, None if no files were read.
+        MPI : obj
+            MPI class object with an mpi4py-like communicator MPI.comm.
+        """
+        comm = MPI.comm
+        meta = []
+        for _data in data:
+            if _data is None:
+                meta.append(None)
+            else:
+                meta.append((len(_data), np.asarray(_data).dtype.newbyteorder('=').str, np.shape(_data)[1:]))
+        metas = comm.gather(meta, root=0)
+        layouts = None
+        if MPI.rank == 0:
+            layouts = []
+            for j in range(0, len(data)):
+                _metas = [_meta[j] for _meta in metas if _meta[j] is not None]
+                if len(_metas) == 0:
+                    layouts.append(None)
+                else:
+                    counts = [0 if _meta[j] is None else _meta[j][0] for _meta in metas]
+                    layouts.append((_metas[0][1], _metas[0][2], counts))
+        layouts = comm.bcast(layouts, root=0)
+        combined = []
+        for j in range(0, len(data)):
+            if layouts[j] is None:
+                combined.append(None)
+                continue
+            dtype, shape, counts = layouts[j]
+            ncomp = int(np.prod(shape))
+            if data[j] is None:
+                sendbuf = np.empty((0,) + tuple(shape), dtype=dtype)
+            else:
+                sendbuf = np.ascontiguousarray(data[j], dtype=dtype)
+            if MPI.rank == 0:
+                counts = np.array(counts, dtype='int')
+                displs = np.zeros(len(counts), dtype='int')
+                displs[1:] = np.cumsum(counts)[:-1]
+                recvbuf = np.empty((counts.sum(),) + tuple(shape), dtype=dtype)
+                comm.Gatherv(sendbuf, [recvbuf, ((counts*ncomp).tolist(), (displs*ncomp).tolist())], root=0)
+                combined.append(recvbuf)
+            else:
+                comm.Gatherv(sendbuf, None, root=0)
+                combined.append(None)
+        return combined
 
 
     def read(self, return_pos=True, return_vel=True, return_pid=False, part='dm',
              xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None,
-             MPI=None, combine=True, suppress=1):
+             MPI=None, combine=True, suppress=1, backend='pygadgetreader', workers=None,
+             pool='thread', preallocate=False, collective=False, stats=None, center=None,
+             radius=None, periodic=False, sample=None, seed=0, progress=False):
         """Reads file.
 
         Parameters
@@ -180,202 +564,256 @@ class ReadGADGET:
             If MPI is on this sets whether we need to combine the final dataset.
         suppress : int, optional
             Suppresses print statements from pygadgetreader.
+        backend : str, optional
+            Either 'pygadgetreader' or 'memmap' (native memory mapped reader).
+        workers : int, optional
+            If an info file is set, the number of sub-files read concurrently (on each
+            MPI node). Outputs are kept in file order.
+        pool : str, optional
+            Either 'thread' or 'process', the pool used when workers > 1.
+        preallocate : bool, optional
+            If True and an info file is set, the particle count of each sub-file is found
+            first so the outputs are allocated once and filled in place, rather than
+            appended to lists and concatenated. Counts come from the headers, or for a
+            region cut or fractional sample from a first pass which reads only the
+            positions and applies the cut. Rank 0 combines MPI outputs in place either
+            way.
+        collective : bool, optional
+            If MPI is on, sub-files are split into contiguous parts of near equal
+            particle count (from the info file's count column, or from the headers read
+            on rank 0) and the outputs are combined on rank 0 with collective
+            bcast/gather/Gatherv calls on MPI.comm into preallocated arrays. utils.run_local provides a multiprocessing MPI object for running
+            this on one machine.
+        stats : obj, optional
+            utils.ReadStats object which collects, for each sub-file, the time spent
+            opening, decoding, masking and copying, the bytes read and the particles
+            read and kept, plus the time spent combining MPI outputs. Each rank collects
+            its own, use stats.gather_mpi to join them.
+        center : array, optional
+            Sphere center [x, y, z], if set only particles within radius of it are read
+            (instead of the region limits) and only the sub-files whose bounds come
+            within radius of it are opened.
+        radius : float, optional
+            Sphere radius.
+        periodic : bool, optional
+            If True the region limits or sphere wrap around the edges of the box, with
+            the box size from the header. Limits may then lie outside the box or have
+            the minimum above the maximum, e.g. xmin=90, xmax=10 in a box of size 100.
+        sample : int or float, optional
+            Subsampling of each sub-file before any region cut: an int n keeps every
+            n-th particle and a float between 0 and 1 keeps a random fraction. The
+            'memmap' backend only reads the sampled records from each block.
+        seed : int, optional
+            Random seed of a fractional sample. Each sub-file is sampled with its own
+            stream, so the sample does not depend on the number of workers or MPI ranks.
+        progress : bool, optional
+            Reports the sub-files read and the throughput on rank 0, see
+            utils.ProgressTracker.
         """
+        fields = self._get_fields(return_pos, return_vel, return_pid)
+        if sample is not None:
+            read_single.check_sample(sample)
+        boxsize = None
+        if periodic == True:
+            boxsize = self.get_header().boxsize
+        if center is not None:
+            assert radius is not None, "radius must be set for a sphere."
+            center = np.asarray(center, dtype='float64')
         if self.info is None:
             # then we just read the entire thing.
-            out = self.readsnap(self.fname, return_pos=return_pos, return_vel=return_vel, return_pid=return_pid,
-                                part=part, single=0, xmin=xmin, xmax=xmax, ymin=ymin,
-                                ymax=ymax, zmin=zmin, zmax=zmax, suppress=suppress)
-            if return_pid == True:
-                if return_pos == True and return_vel == True:
-                    pos, vel, pid = out[0], out[1], out[2]
-                elif return_pos == True and return_vel == False:
-                    pos, pid = out[0], out[1]
-                elif return_pos == False and return_vel == True:
-                    vel, pid = out[0], out[1]
-            else:
-                if return_pos == True and return_vel == True:
-                    pos, vel = out[0], out[1]
-                elif return_pos == True and return_vel == False:
-                    pos = out
-                elif return_pos == False and return_vel == True:
-                    vel = out
+            record = None
+            if stats is not None:
+                record = utils.make_record(self.fname)
+            out = read_single.readsnap(self.fname, return_pos=return_pos, return_vel=return_vel,
+                                       return_pid=return_pid, part=part, single=0, xmin=xmin,
+                                       xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax,
+                                       suppress=suppress, backend=backend, record=record,
+                                       center=center, radius=radius, periodic=periodic,
+                                       boxsize=boxsize, sample=sample, seed=seed)
+            if stats is not None:
+                stats.add_file(record)
+            data = self._split_output(out, len(fields))
         else:
-            files_needed = self._is_file_in_range(xmin, xmax, ymin, ymax, zmin, zmax)
-            if MPI is None:
-                for i in range(0, len(files_needed)):
-                    fname_chunk = self.fname + '.' + str(files_needed[i])
-                    _out = self.readsnap(fname_chunk, return_pos=return_pos, return_vel=return_vel, return_pid=return_pid,
-                                         part=part, single=1, xmin=xmin, xmax=xmax, ymin=ymin,
-                                         ymax=ymax, zmin=zmin, zmax=zmax, suppress=suppress)
-                    if return_pid == True:
-                        if return_pos == True and return_vel == True:
-                            _pos, _vel, _pid = _out[0], _out[1], _out[2]
-                        elif return_pos == True and return_vel == False:
-                            _pos, _pid = _out[0], _out[1]
-                        elif return_pos == False and return_vel == True:
-                            _vel, _pid = _out[0], _out[1]
-                    else:
-                        if return_pos == True and return_vel == True:
-                            _pos, _vel = _out[0], _out[1]
-                        elif return_pos == True and return_vel == False:
-                            _pos = _out
-                        elif return_pos == False and return_vel == True:
-                            _vel = _out
-                    if i == 0:
-                        poss = [_pos]
-                        if return_vel == True:
-                            vels = [_vel]
-                        if return_pid == True:
-                            pids = [_pid]
-                    else:
-                        poss.append(_pos)
-                        if return_vel == True:
-                            vels.append(_vel)
-                        if return_pid == True:
-                            pids.append(_pid)
-                    utils.progress_bar(i, len(files_needed), indexing=True, explanation='Reading from GADGET File')
-                pos = np.concatenate(poss)
-                if return_vel == True:
-                    vel = np.concatenate(vels)
-                if return_pid == True:
-                    pid = np.concatenate(pids)
-            else:
+            files_needed = self._is_file_in_range(xmin, xmax, ymin, ymax, zmin, zmax, center=center,
+                                                  radius=radius, boxsize=boxsize)
+            if MPI is not None and collective == True:
+                files_needed = MPI.comm.bcast(files_needed, root=0)
+                weights = self._get_file_npart(files_needed, part=part, MPI=MPI)
+                edges = _split_balanced(weights, MPI.size)
+                files_needed = files_needed[edges[MPI.rank]:edges[MPI.rank+1]]
+            elif MPI is not None:
                 if MPI.rank == 0:
-                    fnames = []
-                    for i in range(0, len(files_needed)):
-                        fname_chunk = self.fname + '.' + str(files_needed[i])
-                        fnames.append(fname_chunk)
-                    MPI.send(fnames, tag=11)
+                    MPI.send(files_needed, tag=11)
                 else:
-                    fnames = MPI.recv(0, tag=11)
+                    files_needed = MPI.recv(0, tag=11)
                 MPI.wait()
-                MPI_loop_size = MPI.set_loop(len(fnames))
+                MPI_loop_size = MPI.set_loop(len(files_needed))
+                _files_needed = []
                 for mpi_ind in range(0, MPI_loop_size):
                     i = MPI.mpi_ind2ind(mpi_ind)
                     if i is not None:
-                        _out = self.readsnap(fnames[i], return_pos, return_vel, return_pid, part,
-                                             1, xmin, xmax, ymin, ymax, zmin, zmax, suppress)
-                        if return_pid == True:
-                            if return_pos == True and return_vel == True:
-                                _pos, _vel, _pid = _out[0], _out[1], _out[2]
-                            elif return_pos == True and return_vel == False:
-                                _pos, _pid = _out[0], _out[1]
-                            elif return_pos == False and return_vel == True:
-                                _vel, _pid = _out[0], _out[1]
-                        else:
-                            if return_pos == True and return_vel == True:
-                                _pos, _vel = _out[0], _out[1]
-                            elif return_pos == True and return_vel == False:
-                                _pos = _out
-                            elif return_pos == False and return_vel == True:
-                                _vel = _out
-                        if mpi_ind == 0:
-                            poss = [_pos]
-                            if return_vel == True:
-                                vels = [_vel]
-                            if return_pid == True:
-                                pids = [_pid]
-                        else:
-                            poss.append(_pos)
-                            if return_vel == True:
-                                vels.append(_vel)
-                            if return_pid == True:
-                                pids.append(_pid)
-                    else:
-                        if mpi_ind == 0:
-                            poss = []
-                            vels = []
-                            pids = []
-                if len(poss) != 0:
-                    pos = np.concatenate(poss)
-                    if return_vel == True:
-                        vel = np.concatenate(vels)
-                    if return_pid == True:
-                        pid = np.concatenate(pids)
+                        _files_needed.append(files_needed[i])
+                files_needed = _files_needed
+            fnames = [self.fname + '.' + str(files_needed[i]) for i in range(0, len(files_needed))]
+            ranges = self._get_file_ranges(files_needed, fnames, backend, part, xmin, xmax, ymin, ymax,
+                                           zmin, zmax, center=center, radius=radius, boxsize=boxsize)
+            rank = 0 if MPI is None else MPI.rank
+            # records are always made as they give the bytes read for the progress report.
+            _readsnap = functools.partial(_readsnap_file, ranges=ranges, stats=True, rank=rank,
+                                          return_pos=return_pos, return_vel=return_vel,
+                                          return_pid=return_pid,
+                                          part=part, single=1, xmin=xmin, xmax=xmax, ymin=ymin,
+                                          ymax=ymax, zmin=zmin, zmax=zmax, suppress=suppress,
+                                          backend=backend, center=center, radius=radius,
+                                          periodic=periodic, boxsize=boxsize, sample=sample,
+                                          seed=seed)
+            counts = None
+            if preallocate == True:
+                iscut = center is not None or any(lim is not None for lim in [xmin, xmax, ymin, ymax, zmin, zmax])
+                if iscut == False and (sample is None or isinstance(sample, (int, np.integer))):
+                    counts = self._get_file_npart(files_needed, part=part)
+                    if sample is not None:
+                        counts = (counts + sample - 1)//sample
                 else:
-                    pos, vel = None, None
-                if combine == True and MPI is not None:
-                    if MPI.rank != 0:
-                        if return_pos == True:
-                            MPI.send(pos, to_rank=0, tag=11)
-                        if return_vel == True:
-                            MPI.send(vel, to_rank=0, tag=12)
-                        if return_pid == True:
-                            MPI.send(pid, to_rank=0, tag=13)
-                    else:
-                        if return_pos == True:
-                            poss = [pos]
-                        if return_vel == True:
-                            vels = [vel]
-                        if return_pid == True:
-                            pids = [pid]
-                        for i in range(1, MPI.size):
-                            if return_pos == True:
-                                _pos = MPI.recv(i, tag=11)
-                                if _pos is not None:
-                                    poss.append(_pos)
-                            if return_vel == True:
-                                _vel = MPI.recv(i, tag=12)
-                                if _vel is not None:
-                                    vels.append(_vel)
-                            if return_pid == True:
-                                _pid = MPI.recv(i, tag=13)
-                                if _pid is not None:
-                                    pids.append(_pid)
-                        if return_pos == True:
-                            pos = np.concatenate(poss)
-                        if return_vel == True:
-                            vel = np.concatenate(vels)
-                        if return_pid == True:
-                            pid = np.concatenate(pids)
-        # outputs
-        if combine == True and MPI is not None:
-            if MPI.rank == 0:
-                if return_pid == True:
-                    if return_pos == True and return_vel == True:
-                        return pos, vel, pid
-                    elif return_pos == True and return_vel == False:
-                        return pos, pid
-                    elif return_pos == False and return_vel == True:
-                        return vel, pid
+                    # a position only pass counts the particles kept in each file.
+                    _count = functools.partial(_count_file, ranges=ranges, part=part, single=1,
+                                               xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax,
+                                               zmin=zmin, zmax=zmax, suppress=suppress,
+                                               backend=backend, center=center, radius=radius,
+                                               periodic=periodic, boxsize=boxsize,
+                                               sample=sample, seed=seed)
+                    if stats is not None:
+                        t = time.time()
+                    counts = np.array(list(self._map_files(_count, fnames, workers=workers, pool=pool)),
+                                      dtype='int64')
+                    if stats is not None:
+                        stats.add_phase('count', t, rank=rank)
+            data = self._read_files(_readsnap, fnames, len(fields), counts=counts,
+                                    workers=workers, pool=pool, progress=progress, MPI=MPI,
+                                    stats=stats)
+            if combine == True and MPI is not None:
+                if stats is not None:
+                    t = time.time()
+                if collective == True:
+                    data = self._gatherv_mpi(data, MPI)
                 else:
-                    if return_pos == True and return_vel == True:
-                        return pos, vel
-                    elif return_pos == True and return_vel == False:
-                        return pos
-                    elif return_pos == False and return_vel == True:
-                        return vel
-            else:
-                if return_pid == True:
-                    if return_pos == True and return_vel == True:
-                        return None, None, None
-                    elif return_pos == True and return_vel == False:
-                        return None, None
-                    elif return_pos == False and return_vel == True:
-                        return None, None
-                else:
-                    if return_pos == True and return_vel == True:
-                        return None, None
-                    elif return_pos == True and return_vel == False:
-                        return None
-                    elif return_pos == False and return_vel == True:
-                        return None
+                    data = self._combine_mpi(data, MPI, preallocate=preallocate)
+                if stats is not None:
+                    stats.add_phase('mpi_combine', t, rank=rank)
+        return self._join_output(data)
+
+
+    def iter_chunks(self, return_pos=True, return_vel=True, return_pid=False, part='dm',
+                    xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None,
+                    npart=None, prefetch=0, suppress=1, backend='pygadgetreader', center=None,
+                    radius=None, periodic=False, sample=None, seed=0, progress=False):
+        """Iterates over the snapshot, yielding one sub-file or a fixed number of particles at a time.
+
+        Parameters
+        ----------
+        return_pos : bool, optional
+            Reads and outputs the positions from a GADGET file.
+        return_vel : bool, optional
+            Reads and outputs the velocities from a GADGET file.
+        return_pid : bool, optional
+            Reads and outputs the particle IDs from a GADGET file.
+        part : str, optional
+            Particle type, default set to 'dm' (dark matter).
+        xmin : float, optional
+            Minimum x-value.
+        xmax : float, optional
+            Maximum x-value.
+        ymin : float, optional
+            Minimum y-value.
+        ymax : float, optional
+            Maximum y-value.
+        zmin : float, optional
+            Minimum z-value.
+        zmax : float, optional
+            Maximum z-value.
+        npart : int, optional
+            If set, chunks of npart particles are yielded (the last chunk may be
+            smaller), otherwise one chunk is yielded per sub-file.
+        prefetch : int, optional
+            Number of sub-files read ahead by a background thread.
+        suppress : int, optional
+            Suppresses print statements from pygadgetreader.
+        backend : str, optional
+            Either 'pygadgetreader' or 'memmap' (native memory mapped reader).
+        center : array, optional
+            Sphere center [x, y, z], if set only particles within radius are read.
+        radius : float, optional
+            Sphere radius.
+        periodic : bool, optional
+            If True the region wraps around the edges of the box, see read.
+        sample : int or float, optional
+            Every n-th particle if an int, or a random fraction if a float, see read.
+        seed : int, optional
+            Random seed of a fractional sample.
+        progress : bool, optional
+            Reports the sub-files read and the throughput, see utils.ProgressTracker.
+
+        Yields
+        ------
+        data : array or tuple
+            Chunk in the same form as outputted by read: an array for a single field,
+            otherwise a tuple of arrays, which are writable in-memory arrays rather
+            than memory maps also with the 'memmap' backend.
+
+        Notes
+        -----
+        If no info file is set the sub-files are found from the GADGET header, which
+        requires a binary GADGET snapshot.
+        """
+        fields = self._get_fields(return_pos, return_vel, return_pid)
+        if sample is not None:
+            read_single.check_sample(sample)
+        ranges = None
+        boxsize = None
+        if periodic == True:
+            boxsize = self.get_header().boxsize
+        if self.info is None:
+            fnames = snapshot.get_snapshot_files(self.fname)
         else:
-            if return_pid == True:
-                if return_pos == True and return_vel == True:
-                    return pos, vel, pid
-                elif return_pos == True and return_vel == False:
-                    return pos, pid
-                elif return_pos == False and return_vel == True:
-                    return vel, pid
-            else:
-                if return_pos == True and return_vel == True:
-                    return pos, vel
-                elif return_pos == True and return_vel == False:
-                    return pos
-                elif return_pos == False and return_vel == True:
-                    return vel
+            files_needed = self._is_file_in_range(xmin, xmax, ymin, ymax, zmin, zmax, center=center,
+                                                  radius=radius, boxsize=boxsize)
+            fnames = [self.fname + '.' + str(files_needed[i]) for i in range(0, len(files_needed))]
+            ranges = self._get_file_ranges(files_needed, fnames, backend, part, xmin, xmax, ymin, ymax,
+                                           zmin, zmax, center=center, radius=radius, boxsize=boxsize)
+        _readsnap = functools.partial(_readsnap_file, ranges=ranges, stats=True,
+                                      return_pos=return_pos, return_vel=return_vel,
+                                      return_pid=return_pid, part=part, single=1, xmin=xmin,
+                                      xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax,
+                                      suppress=suppress,
+                                      backend=backend, center=center, radius=radius,
+                                      periodic=periodic, boxsize=boxsize, sample=sample, seed=seed)
+        outs = utils.prefetch((_readsnap(fname) for fname in fnames), depth=prefetch)
+        outs = self._track_files(outs, len(fnames), progress=progress)
+        if npart is None:
+            for _out in outs:
+                # memmap views are copied so chunks are owned, writable arrays like read's.
+                _data = [np.array(_d) if isinstance(_d, np.memmap) or _d.flags.writeable == False else _d
+                         for _d in map(np.asarray, self._split_output(_out, len(fields)))]
+                yield self._join_output(_data)
+            return
+        assert npart > 0, "npart must be positive."
+        pending = [[] for field in fields]
+        npending = 0
+        for _out in outs:
+            _data = self._split_output(_out, len(fields))
+            for j in range(0, len(fields)):
+                pending[j].append(_data[j])
+            npending += len(_data[0])
+            if npending >= npart:
+                data = [np.concatenate(pending[j]) for j in range(0, len(fields))]
+                start = 0
+                while npending - start >= npart:
+                    yield self._join_output([data[j][start:start+npart] for j in range(0, len(fields))])
+                    start += npart
+                pending = [[data[j][start:]] for j in range(0, len(fields))]
+                npending -= start
+        if npending > 0:
+            yield self._join_output([np.concatenate(pending[j]) for j in range(0, len(fields))])
 
 
     def clean(self):
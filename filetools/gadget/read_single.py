@@ -1,9 +1,133 @@
+import os
+import time
+import zlib
 import numpy as np
-import pygadgetreader as pyg
+
+from . import header
+from . import snapshot
+from .. import utils
+from ..utils.region import get_mask
+
+
+pyg = utils.lazy_import('pygadgetreader')
+
+
+def check_sample(sample):
+    """Checks a subsampling argument, raising a ValueError if it is not an int of at
+    least 1 or a float in (0, 1].
+
+    Parameters
+    ----------
+    sample : int or float
+        An int n keeps every n-th particle, a float between 0 and 1 keeps each particle
+        with this probability.
+    """
+    if isinstance(sample, (bool, np.bool_)):
+        raise ValueError("sample must be an int or a float, not a bool.")
+    if isinstance(sample, (int, np.integer)):
+        if sample < 1:
+            raise ValueError("An integer sample must be at least 1, not %i." % sample)
+    elif isinstance(sample, (float, np.floating)):
+        if not 0. < sample <= 1.:
+            raise ValueError("A fractional sample must be in (0, 1], not %g; use an int "
+                             "to keep every n-th particle." % sample)
+    else:
+        raise ValueError("sample must be an int or a float, not %s." % type(sample).__name__)
+
+
+def get_sample_index(npart, sample, seed=0, key='', index=None):
+    """Returns the indices of the particles of a file kept by subsampling.
+
+    Parameters
+    ----------
+    npart : int
+        Number of particles in the file.
+    sample : int or float
+        An int n keeps every n-th particle, a float in (0, 1] keeps each particle with
+        this probability, see check_sample.
+    seed : int, optional
+        Random seed, used with key so each file is sampled independently but the same
+        way whichever process reads it.
+    key : str, optional
+        Identifies the file, e.g. its base name.
+    index : array, optional
+        Sorted particle indices, if set only those kept by the sample are returned.
+
+    Returns
+    -------
+    ind : array
+        Sorted particle indices.
+    """
+    check_sample(sample)
+    if isinstance(sample, (int, np.integer)):
+        if index is None:
+            return np.arange(0, npart, sample, dtype='int64')
+        return index[index % sample == 0]
+    rng = np.random.default_rng([seed, zlib.crc32(key.encode())])
+    keep = rng.random(npart) < sample
+    if index is None:
+        return np.flatnonzero(keep)
+    return index[keep[index]]
+
+
+def _readsnap_memmap(fname, fields, part='dm', single=0, xmin=None, xmax=None,
+                     ymin=None, ymax=None, zmin=None, zmax=None, index=None, record=None,
+                     center=None, radius=None, boxsize=None, sample=None, seed=0):
+    """Internal function which reads fields with the memmap backend.
+
+    If region limits or a sphere are set the positions are read first, whether or not
+    'pos' is in fields, and only the selected records of the remaining blocks are read.
+    If index is set only the positions of those particles are considered, and if sample
+    is set only the sampled records are read from any block. If record is given (see
+    utils.make_record) the phase timings, bytes and particle counts are added to it,
+    with the bytes of every record read, including positions dropped by the cut.
+    """
+    fnames = snapshot.get_snapshot_files(fname, single=single)
+    iscut = center is not None or any(lim is not None for lim in [xmin, xmax, ymin, ymax, zmin, zmax])
+    datas = [[] for field in fields]
+    for _fname in fnames:
+        if record is not None:
+            t = time.time()
+        snap = snapshot.GadgetSnapshot(_fname)
+        if record is not None:
+            t = utils.add_phase(record, 'open', t)
+        ind = index if iscut == True else None
+        nread = snap.npart(part)
+        if sample is not None:
+            ind = get_sample_index(nread, sample, seed=seed, key=os.path.basename(_fname), index=ind)
+        if ind is not None:
+            nread = len(ind)
+        if iscut == True:
+            pos = snap.block('pos', part=part)
+            if ind is not None:
+                pos = snapshot.take(pos, ind)
+            mask = get_mask(pos, xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax,
+                            center=center, radius=radius, boxsize=boxsize)
+            if record is not None:
+                record['nbytes'] += pos.nbytes
+                t = utils.add_phase(record, 'mask', t)
+            if mask is not None:
+                ind = np.flatnonzero(mask) if ind is None else ind[mask]
+        for j, field in enumerate(fields):
+            block = snap.block(field, part=part)
+            if ind is not None:
+                block = snapshot.take(block, ind)
+            if record is not None and (field != 'pos' or iscut == False):
+                record['nbytes'] += block.nbytes
+            datas[j].append(block)
+        if record is not None:
+            t = utils.add_phase(record, 'decode', t)
+            record['nread'] += nread
+            record['nkept'] += nread if ind is None else len(ind)
+    if len(fnames) == 1:
+        return [datas[j][0] for j in range(0, len(fields))]
+    return [np.concatenate(datas[j]) for j in range(0, len(fields))]
 
 
 def readsnap(fname, return_pos=True, return_vel=True, return_pid=False, part='dm', single=0,
-             xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None, suppress=1):
+             xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None, suppress=1,
+             backend='pygadgetreader', index=None, record=None, center=None, radius=None,
+             periodic=False, boxsize=None, sample=None, seed=0):
     """Reads snapshot file.
 
     Parameters
@@ -11,7 +135,8 @@ def readsnap(fname, return_pos=True, return_vel=True, return_pid=False, part='dm
     fname : str
         Gadget file name.
     return_pos : bool, optional
-        Reads and outputs the positions from a GADGET file.
+        Reads and outputs the positions from a GADGET file. Positions are read whenever
+        region limits or a sphere are set, so the cut also applies if this is False.
     return_vel : bool, optional
         Reads and outputs the velocities from a GADGET file.
     return_pid : bool, optional
@@ -34,39 +159,113 @@ def readsnap(fname, return_pos=True, return_vel=True, return_pid=False, part='dm
         Maximum z-value.
     suppress : int, optional
         Suppresses print statements from pygadgetreader.
+    backend : str, optional
+        Either 'pygadgetreader' or 'memmap'. The 'memmap' backend parses the binary
+        file once and returns zero-copy memory mapped views of each block. If region
+        limits are set, velocities and IDs are only read for the selected particles.
+    index : array, optional
+        Sorted indices of the particles of a single file which include every particle
+        inside the region limits, e.g. those of the grid cells overlapping them. Only
+        used by the 'memmap' backend when region limits or a sphere are set.
+    record : dict, optional
+        Per-file record (see utils.make_record) which phase timings, bytes and particle
+        counts are added to.
+    center : array, optional
+        Sphere center [x, y, z], if set only particles within radius of it are kept
+        (instead of the region limits).
+    radius : float, optional
+        Sphere radius.
+    periodic : bool, optional
+        If True the region limits or sphere wrap around the edges of the box, see
+        get_mask.
+    boxsize : float, optional
+        Size of the periodic box, default is read from the header.
+    sample : int or float, optional
+        Subsampling, see get_sample_index: an int n keeps every n-th particle of each
+        sub-file and a float keeps a random fraction. Both backends sample each sub-file
+        the same way, but 'memmap' only reads the sampled records while
+        'pygadgetreader' reads every particle and then samples.
+    seed : int, optional
+        Random seed of a fractional sample.
     """
-    if return_pos == True:
-        pos = pyg.readsnap(fname, 'pos', part, single=single, suppress=suppress)
-    if return_vel == True:
-        vel = pyg.readsnap(fname, 'vel', part, single=single, suppress=suppress)
-    if return_pid == True:
-        pid = pyg.readsnap(fname, 'pid', part, single=single, suppress=suppress)
-    if return_pos == True:
-        mask = np.ones(len(pos))
-        if xmin is not None:
-            cond = np.where(pos[:, 0] < xmin)[0]
-            mask[cond] = 0.
-        if xmax is not None:
-            cond = np.where(pos[:, 0] > xmax)[0]
-            mask[cond] = 0.
-        if ymin is not None:
-            cond = np.where(pos[:, 1] < ymin)[0]
-            mask[cond] = 0.
-        if ymax is not None:
-            cond = np.where(pos[:, 1] > ymax)[0]
-            mask[cond] = 0.
-        if zmin is not None:
-            cond = np.where(pos[:, 2] < zmin)[0]
-            mask[cond] = 0.
-        if zmax is not None:
-            cond = np.where(pos[:, 2] > zmax)[0]
-            mask[cond] = 0.
-        cond = np.where(mask == 1.)[0]
-        pos = pos[cond]
+    if periodic == True:
+        if boxsize is None:
+            boxsize = header.get_header(fname).boxsize
+    else:
+        boxsize = None
+    assert backend in ['pygadgetreader', 'memmap'], "Unknown backend %s." % backend
+    if sample is not None:
+        check_sample(sample)
+    iscut = center is not None or any(lim is not None for lim in [xmin, xmax, ymin, ymax, zmin, zmax])
+    if backend == 'memmap':
+        fields = []
+        if return_pos == True:
+            fields.append('pos')
+        if return_vel == True:
+            fields.append('vel')
+        if return_pid == True:
+            fields.append('pid')
+        if single != 1:
+            index = None
+        data = _readsnap_memmap(fname, fields, part=part, single=single, xmin=xmin, xmax=xmax,
+                                ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax, index=index,
+                                record=record, center=center, radius=radius, boxsize=boxsize,
+                                sample=sample, seed=seed)
+        if return_pos == True:
+            pos = data[fields.index('pos')]
+        if return_vel == True:
+            vel = data[fields.index('vel')]
+        if return_pid == True:
+            pid = data[fields.index('pid')]
+    else:
+        # positions are also read to apply a cut when they are not returned.
+        readpos = return_pos == True or iscut == True
+        if record is not None:
+            t = time.time()
+        if readpos == True:
+            pos = pyg.readsnap(fname, 'pos', part, single=single, suppress=suppress)
         if return_vel == True:
-            vel = vel[cond]
+            vel = pyg.readsnap(fname, 'vel', part, single=single, suppress=suppress)
         if return_pid == True:
-            pid = pid[cond]
+            pid = pyg.readsnap(fname, 'pid', part, single=single, suppress=suppress)
+        if record is not None:
+            # bytes and particles read from the file, before sampling and the cut.
+            _datas = [pos if readpos == True else None, vel if return_vel == True else None,
+                      pid if return_pid == True else None]
+            _datas = [np.asarray(_d) for _d in _datas if _d is not None]
+            record['nbytes'] += sum(_d.nbytes for _d in _datas)
+            nread = len(_datas[0])
+            record['nread'] += nread
+        if sample is not None:
+            # each sub-file is sampled with its own stream, as with the 'memmap' backend.
+            fnames = snapshot.get_snapshot_files(fname, single=single)
+            ptype = snapshot.get_part_type(part)
+            npart = [int(header.get_header(_fname).npart[ptype]) for _fname in fnames]
+            offsets = np.cumsum([0] + npart)
+            ind = np.concatenate([get_sample_index(npart[i], sample, seed=seed,
+                                                   key=os.path.basename(fnames[i])) + offsets[i]
+                                  for i in range(0, len(fnames))])
+            if readpos == True:
+                pos = pos[ind]
+            if return_vel == True:
+                vel = vel[ind]
+            if return_pid == True:
+                pid = pid[ind]
+        if record is not None:
+            t = utils.add_phase(record, 'decode', t)
+        if iscut == True:
+            mask = get_mask(pos, xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax,
+                            center=center, radius=radius, boxsize=boxsize)
+            if mask is not None:
+                pos = pos[mask]
+                if return_vel == True:
+                    vel = vel[mask]
+                if return_pid == True:
+                    pid = pid[mask]
+            if record is not None:
+                t = utils.add_phase(record, 'mask', t)
+        if record is not None:
+            record['nkept'] += len(pos) if iscut == True else len(ind) if sample is not None else nread
     if return_pid == True:
         if return_pos == True and return_vel == True:
             return [pos, vel, pid]
@@ -74,6 +273,8 @@ def readsnap(fname, return_pos=True, return_vel=True, return_pid=False, part='dm
             return [pos, pid]
         elif return_pos == False and return_vel == True:
             return [vel, pid]
+        else:
+            return pid
     else:
         if return_pos == True and return_vel == True:
             return [pos, vel]
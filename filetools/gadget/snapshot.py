@@ -0,0 +1,293 @@
+import os.path
+import numpy as np
+
+from . import header
+
+
+# Particle type names used by pygadgetreader, mapped onto GADGET type indices.
+PART_TYPES = {'gas': 0, 'dm': 1, 'disk': 2, 'bulge': 3, 'star': 4, 'bndry': 5}
+
+# Block names used in this module, mapped onto the GADGET format-2 labels.
+BLOCK_LABELS = {'pos': 'POS ', 'vel': 'VEL ', 'pid': 'ID  ', 'mass': 'MASS'}
+
+# Order of the blocks in a GADGET format-1 file (which has no block labels).
+FORMAT1_BLOCKS = ['pos', 'vel', 'pid', 'mass']
+
+# Number of components per particle for each block.
+BLOCK_NCOMP = {'pos': 3, 'vel': 3, 'pid': 1, 'mass': 1}
+
+def get_part_type(part):
+    """Returns the GADGET particle type index.
+
+    Parameters
+    ----------
+    part : str or int
+        Particle type, either a pygadgetreader name (e.g. 'dm') or an index 0-5.
+    """
+    if isinstance(part, str):
+        assert part in PART_TYPES, "Unknown particle type %s." % part
+        return PART_TYPES[part]
+    assert 0 <= int(part) < 6, "Particle type must be between 0 and 5."
+    return int(part)
+
+
+def get_snapshot_files(fname, single=0):
+    """Returns the list of binary files that make up a snapshot.
+
+    Parameters
+    ----------
+    fname : str
+        Gadget file name, either a single file or the root of a multi-part snapshot.
+    single : int, optional
+        If 1 only the file fname is returned, otherwise all parts are returned.
+    """
+    if single == 1:
+        return [fname]
+    if os.path.isfile(fname):
+        return [fname]
+    num_files = header.get_header(fname + '.0').num_files
+    return [fname + '.' + str(i) for i in range(0, max(num_files, 1))]
+
+
+class GadgetSnapshot:
+
+
+    def __init__(self, fname, mode='r'):
+        """Parses the header and the block offsets of a single GADGET binary file.
+
+        Parameters
+        ----------
+        fname : str
+            Single gadget filename, in GADGET format-1 or format-2.
+        mode : str, optional
+            Memory map mode, 'r' for read-only or 'r+' to allow blocks to be modified.
+        """
+        self.fname = fname
+        self.mode = mode
+        self.endian = None
+        self.format = None
+        self.header = None
+        self.blocks = {}
+        self._map = None
+        self._parse()
+
+
+    def _read_marker(self, f):
+        """Internal function which reads a fortran record marker."""
+        marker = f.read(4)
+        if len(marker) < 4:
+            return None
+        return int(np.frombuffer(marker, dtype=self.endian + 'i4')[0])
+
+
+    def _parse(self):
+        """Internal function which reads the header and locates each block."""
+        with open(self.fname, 'rb') as f:
+            marker = f.read(4)
+            if np.frombuffer(marker, dtype='<i4')[0] in [8, 256]:
+                self.endian = '<'
+            elif np.frombuffer(marker, dtype='>i4')[0] in [8, 256]:
+                self.endian = '>'
+            else:
+                raise IOError("%s is not a GADGET binary file." % self.fname)
+            f.seek(0)
+            if self._read_marker(f) == 8:
+                self.format = 2
+            else:
+                self.format = 1
+            f.seek(0)
+            filesize = os.path.getsize(self.fname)
+            block_index = 0
+            while f.tell() < filesize:
+                if self.format == 2:
+                    if self._read_marker(f) is None:
+                        break
+                    label = f.read(4).decode('ascii', errors='replace')
+                    f.seek(8, 1)
+                    name = None
+                    for key in BLOCK_LABELS:
+                        if BLOCK_LABELS[key] == label:
+                            name = key
+                    if label == 'HEAD':
+                        name = 'head'
+                else:
+                    if block_index == 0:
+                        name = 'head'
+                    elif block_index <= len(FORMAT1_BLOCKS):
+                        name = FORMAT1_BLOCKS[block_index-1]
+                    else:
+                        name = None
+                nbytes = self._read_marker(f)
+                if nbytes is None:
+                    break
+                offset = f.tell()
+                if name == 'head':
+                    dtype = np.dtype(header.HEADER_DTYPE).newbyteorder(self.endian)
+                    head = np.frombuffer(f.read(256), dtype=dtype)[0]
+                    self.header = {}
+                    for key in dtype.names:
+                        if key != 'fill':
+                            self.header[key] = head[key].copy() if np.ndim(head[key]) else head[key].item()
+                elif name is not None:
+                    self.blocks[name] = (offset, nbytes)
+                f.seek(offset + nbytes + 4)
+                block_index += 1
+        if self.header is None:
+            raise IOError("%s has no GADGET header." % self.fname)
+        if self.format == 1 and 'mass' in self.blocks:
+            # the mass block only exists if some particles have no fixed mass.
+            if self._block_npart('mass').sum() == 0:
+                del self.blocks['mass']
+
+
+    def _block_npart(self, name):
+        """Internal function returning the number of particles of each type in a block."""
+        npart = np.array(self.header['npart'], dtype='int64')
+        if name == 'mass':
+            npart[np.array(self.header['massarr']) != 0.] = 0
+        return npart
+
+
+    def _get_map(self):
+        """Internal function which memory maps the file (once)."""
+        if self._map is None:
+            self._map = np.memmap(self.fname, dtype=np.uint8, mode=self.mode)
+        return self._map
+
+
+    def block_dtype(self, name):
+        """Returns the dtype of a block as stored on disk.
+
+        Parameters
+        ----------
+        name : str
+            Block name, one of 'pos', 'vel', 'pid' or 'mass'.
+        """
+        assert name in self.blocks, "Block %s is not in %s." % (name, self.fname)
+        nelem = self._block_npart(name).sum()*BLOCK_NCOMP[name]
+        itemsize = self.blocks[name][1] // max(nelem, 1)
+        assert itemsize in [4, 8], "Block %s has an unexpected size." % name
+        if name == 'pid':
+            return np.dtype(self.endian + 'u' + str(itemsize))
+        return np.dtype(self.endian + 'f' + str(itemsize))
+
+
+    def npart(self, part='dm'):
+        """Returns the number of particles of one type in this file.
+
+        Parameters
+        ----------
+        part : str or int, optional
+            Particle type, default set to 'dm' (dark matter).
+        """
+        return int(self.header['npart'][get_part_type(part)])
+
+
+    def block(self, name, part='dm'):
+        """Returns a zero-copy memory mapped view of a block.
+
+        Parameters
+        ----------
+        name : str
+            Block name, one of 'pos', 'vel', 'pid' or 'mass'.
+        part : str or int, optional
+            Particle type, default set to 'dm' (dark matter).
+
+        Returns
+        -------
+        data : memmap
+            Memory mapped array, of shape (npart, 3) for 'pos' and 'vel' and (npart,)
+            otherwise.
+        """
+        ptype = get_part_type(part)
+        dtype = self.block_dtype(name)
+        npart = self._block_npart(name)
+        ncomp = BLOCK_NCOMP[name]
+        if npart[ptype] == 0:
+            if ncomp == 1:
+                return np.empty(0, dtype=dtype)
+            return np.empty((0, ncomp), dtype=dtype)
+        start = self.blocks[name][0] + npart[:ptype].sum()*ncomp*dtype.itemsize
+        end = start + npart[ptype]*ncomp*dtype.itemsize
+        data = self._get_map()[start:end].view(dtype)
+        if ncomp != 1:
+            data = data.reshape(npart[ptype], ncomp)
+        return data
+
+
+    def flush(self):
+        """Writes any changes to blocks back to disk."""
+        if self._map is not None:
+            self._map.flush()
+
+
+    def close(self):
+        """Releases the memory map."""
+        self._map = None
+
+
+def take(data, ind, min_run=64):
+    """Copies the selected records of a (memory mapped) block.
+
+    Records are copied as contiguous runs when the selection is made of long runs,
+    otherwise fancy indexing is used so that only the selected records are touched.
+
+    Parameters
+    ----------
+    data : array
+        Block, usually a memory mapped view.
+    ind : array
+        Sorted indices of the selected records.
+    min_run : int, optional
+        Minimum mean run length for the selection to be copied as runs.
+    """
+    if len(ind) == 0:
+        return np.empty((0,) + data.shape[1:], dtype=data.dtype)
+    breaks = np.flatnonzero(np.diff(ind) != 1) + 1
+    if len(ind) < min_run*(len(breaks) + 1):
+        return np.asarray(data[ind])
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(ind)]])
+    out = np.empty((len(ind),) + data.shape[1:], dtype=data.dtype)
+    for i in range(0, len(starts)):
+        out[starts[i]:ends[i]] = data[ind[starts[i]]:ind[starts[i]] + ends[i] - starts[i]]
+    return out
+
+
+def readblock(fname, name, part='dm', single=0):
+    """Reads a block from a GADGET binary snapshot.
+
+    Parameters
+    ----------
+    fname : str
+        Gadget file name.
+    name : str
+        Block name, one of 'pos', 'vel', 'pid' or 'mass'.
+    part : str or int, optional
+        Particle type, default set to 'dm' (dark matter).
+    single : int, optional
+        If 1 opens a single snapshot part, otherwise opens them all.
+
+    Returns
+    -------
+    data : array
+        For a single file a zero-copy memory mapped view, otherwise the blocks of
+        each part are copied into one array.
+    """
+    fnames = get_snapshot_files(fname, single=single)
+    if len(fnames) == 1:
+        return GadgetSnapshot(fnames[0]).block(name, part=part)
+    snaps = [GadgetSnapshot(_fname) for _fname in fnames]
+    nparts = np.array([snap.npart(part) for snap in snaps])
+    ncomp = BLOCK_NCOMP[name]
+    dtype = snaps[0].block_dtype(name).newbyteorder('=')
+    if ncomp == 1:
+        data = np.empty(nparts.sum(), dtype=dtype)
+    else:
+        data = np.empty((nparts.sum(), ncomp), dtype=dtype)
+    start = 0
+    for i in range(0, len(snaps)):
+        if nparts[i] != 0:
+            data[start:start+nparts[i]] = snaps[i].block(name, part=part)
+        start += nparts[i]
+    return data
@@ -0,0 +1,272 @@
+import numpy as np
+
+from . import index
+from . import read
+from . import read_single
+from .. import utils
+
+
+h5py = utils.lazy_import('h5py')
+
+
+def _spread_bits(x):
+    """Internal function spacing the lower 21 bits of x three bits apart."""
+    x = x.astype('uint64') & np.uint64(0x1fffff)
+    x = (x | (x << np.uint64(32))) & np.uint64(0x1f00000000ffff)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x1f0000ff0000ff)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x100f00f00f00f00f)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x10c30c30c30c30c3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return x
+
+
+def get_morton_key(ix, iy, iz):
+    """Returns the Morton (Z-order) keys of integer cell coordinates.
+
+    Parameters
+    ----------
+    ix, iy, iz : array
+        Cell coordinates, each below 2**21.
+
+    Returns
+    -------
+    key : array
+        Morton keys, cells close in space mostly have close keys.
+    """
+    return (_spread_bits(np.asarray(ix)) << np.uint64(2)) | (_spread_bits(np.asarray(iy)) << np.uint64(1)) \
+        | _spread_bits(np.asarray(iz))
+
+
+def _compact_bits(x):
+    """Internal function gathering every third bit of x, the inverse of _spread_bits."""
+    x = x.astype('uint64') & np.uint64(0x1249249249249249)
+    x = (x ^ (x >> np.uint64(2))) & np.uint64(0x10c30c30c30c30c3)
+    x = (x ^ (x >> np.uint64(4))) & np.uint64(0x100f00f00f00f00f)
+    x = (x ^ (x >> np.uint64(8))) & np.uint64(0x1f0000ff0000ff)
+    x = (x ^ (x >> np.uint64(16))) & np.uint64(0x1f00000000ffff)
+    x = (x ^ (x >> np.uint64(32))) & np.uint64(0x1fffff)
+    return x.astype('int64')
+
+
+def get_morton_cells(key):
+    """Returns the integer cell coordinates of Morton keys, the inverse of get_morton_key.
+
+    Parameters
+    ----------
+    key : array
+        Morton keys.
+
+    Returns
+    -------
+    ix, iy, iz : array
+        Cell coordinates.
+    """
+    key = np.asarray(key, dtype='uint64')
+    return _compact_bits(key >> np.uint64(2)), _compact_bits(key >> np.uint64(1)), _compact_bits(key)
+
+
+def _search_dset(dset, value, side='left'):
+    """Internal function which binary searches a sorted 1D dataset, like np.searchsorted,
+    reading one element per step rather than the whole dataset."""
+    lo, hi = 0, len(dset)
+    while lo < hi:
+        mid = (lo + hi)//2
+        if dset[mid] < value or (side == 'right' and dset[mid] == value):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _get_cells(pos, boxmin, cellsize, ngrid):
+    """Internal function returning the integer cell coordinates of positions."""
+    cells = np.floor((pos - boxmin)/cellsize).astype('int64')
+    return np.clip(cells, 0, ngrid-1)
+
+
+def gadget2sorted_hdf5(gfname, hdf5_filename, infoname=None, part='dm', level=6, chunk=65536,
+                       compression='gzip', backend='pygadgetreader', workers=None):
+    """Writes a GADGET snapshot to a HDF5 file with particles sorted along a Morton curve.
+
+    The box spanned by the particles is split into 2**level cells along each axis and
+    the particles are sorted by the Morton key of their cell, so each cell is a
+    contiguous range of rows. The datasets 'pos', 'vel' and 'pid' are chunked and
+    compressed, and the key-to-offset table is stored as 'cell_key', 'cell_offset'
+    and 'cell_count' (non-empty cells only), with the attributes 'boxmin',
+    'cellsize' and 'level'. The whole snapshot is held in memory while sorting.
+
+    Parameters
+    ----------
+    gfname : str
+        Gadget filename root, or a single gadget file.
+    hdf5_filename : str
+        Output HDF5 file name.
+    infoname : str, optional
+        Info file name, passed to ReadGADGET.file.
+    part : str, optional
+        Particle type, default set to 'dm' (dark matter).
+    level : int, optional
+        Cells per axis are 2**level, at most 21.
+    chunk : int, optional
+        HDF5 chunk length in particles.
+    compression : str, optional
+        HDF5 compression filter, e.g. 'gzip' or 'lzf', None for no compression.
+    backend : str, optional
+        Either 'pygadgetreader' or 'memmap' (native memory mapped reader).
+    workers : int, optional
+        Number of sub-files read concurrently, if an info file is set.
+    """
+    assert level <= 21, "level must be at most 21."
+    RG = read.ReadGADGET()
+    RG.file(gfname, info=infoname)
+    pos, vel, pid = RG.read(return_pos=True, return_vel=True, return_pid=True, part=part,
+                            backend=backend, workers=workers)
+    ngrid = 2**level
+    if len(pos) == 0:
+        boxmin, cellsize = np.zeros(3), np.ones(3)
+    else:
+        boxmin = pos.min(axis=0).astype('float64')
+        cellsize = np.maximum(pos.max(axis=0) - boxmin, np.finfo('float64').tiny)/ngrid
+    cells = _get_cells(pos, boxmin, cellsize, ngrid)
+    key = get_morton_key(cells[:, 0], cells[:, 1], cells[:, 2])
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    cell_key, cell_offset, cell_count = np.unique(key, return_index=True, return_counts=True)
+    with h5py.File(hdf5_filename, 'w') as hdf5_file:
+        for name, _data in zip(['pos', 'vel', 'pid'], [pos, vel, pid]):
+            _data = np.asarray(_data)
+            _data = _data[order].astype(_data.dtype.newbyteorder('='), copy=False)
+            chunks = None
+            if len(_data) != 0:
+                chunks = (min(chunk, len(_data)),) + _data.shape[1:]
+            hdf5_file.create_dataset(name, data=_data, chunks=chunks, compression=compression)
+        hdf5_file.create_dataset('cell_key', data=cell_key)
+        hdf5_file.create_dataset('cell_offset', data=cell_offset.astype('int64'))
+        hdf5_file.create_dataset('cell_count', data=cell_count.astype('int64'))
+        hdf5_file.attrs['boxmin'] = boxmin
+        hdf5_file.attrs['cellsize'] = cellsize
+        hdf5_file.attrs['level'] = level
+
+
+def get_sorted_ranges(hdf5_file, xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None):
+    """Returns the row ranges of the cells of a sorted HDF5 file overlapping a box.
+
+    Parameters
+    ----------
+    hdf5_file : obj
+        Open h5py file written by gadget2sorted_hdf5.
+    xmin : float, optional
+        Minimum x-value.
+    xmax : float, optional
+        Maximum x-value.
+    ymin : float, optional
+        Minimum y-value.
+    ymax : float, optional
+        Maximum y-value.
+    zmin : float, optional
+        Minimum z-value.
+    zmax : float, optional
+        Maximum z-value.
+
+    Returns
+    -------
+    ranges : array
+        (K, 2) start and end rows, merged where cells are adjacent in the file.
+    """
+    boxmin = hdf5_file.attrs['boxmin']
+    cellsize = hdf5_file.attrs['cellsize']
+    ngrid = 2**int(hdf5_file.attrs['level'])
+    box = index.get_box(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax)
+    ilims = np.zeros((3, 2), dtype='int64')
+    for axis in range(0, 3):
+        ilo, ihi = 0, ngrid-1
+        if not np.isnan(box[2*axis]):
+            ilo = int(np.clip(np.floor((box[2*axis] - boxmin[axis])/cellsize[axis]), 0, ngrid-1))
+        if not np.isnan(box[2*axis+1]):
+            ihi = int(np.clip(np.floor((box[2*axis+1] - boxmin[axis])/cellsize[axis]), 0, ngrid-1))
+        ilims[axis] = ilo, ihi
+    # Morton keys grow with each coordinate, so the cells in the box have keys between
+    # those of its corners and only that part of the stored (non-empty) keys is read.
+    dset = hdf5_file['cell_key']
+    lo = _search_dset(dset, get_morton_key(*ilims[:, 0]), side='left')
+    hi = _search_dset(dset, get_morton_key(*ilims[:, 1]), side='right')
+    if hi <= lo:
+        return np.zeros((0, 2), dtype='int64')
+    ix, iy, iz = get_morton_cells(dset[lo:hi])
+    inbox = (ix >= ilims[0, 0]) & (ix <= ilims[0, 1]) & (iy >= ilims[1, 0]) & (iy <= ilims[1, 1]) \
+        & (iz >= ilims[2, 0]) & (iz <= ilims[2, 1])
+    ind = np.flatnonzero(inbox)
+    if len(ind) == 0:
+        return np.zeros((0, 2), dtype='int64')
+    starts = hdf5_file['cell_offset'][lo:hi][ind]
+    ends = starts + hdf5_file['cell_count'][lo:hi][ind]
+    # merge ranges which touch.
+    new = np.ones(len(starts), dtype='bool')
+    new[1:] = starts[1:] != ends[:-1]
+    last = np.ones(len(starts), dtype='bool')
+    last[:-1] = new[1:]
+    return np.column_stack([starts[new], ends[last]])
+
+
+def read_sorted_hdf5(hdf5_filename, return_pos=True, return_vel=True, return_pid=False,
+                     xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None):
+    """Reads the particles inside a box from a file written by gadget2sorted_hdf5, only
+    reading the row ranges of the cells overlapping the box.
+
+    Parameters
+    ----------
+    hdf5_filename : str
+        HDF5 file name.
+    return_pos : bool, optional
+        Outputs the positions.
+    return_vel : bool, optional
+        Outputs the velocities.
+    return_pid : bool, optional
+        Outputs the particle IDs.
+    xmin : float, optional
+        Minimum x-value.
+    xmax : float, optional
+        Maximum x-value.
+    ymin : float, optional
+        Minimum y-value.
+    ymax : float, optional
+        Maximum y-value.
+    zmin : float, optional
+        Minimum z-value.
+    zmax : float, optional
+        Maximum z-value.
+
+    Returns
+    -------
+    data : array or tuple
+        Requested fields, in the same form as outputted by ReadGADGET.read.
+    """
+    fields = []
+    for field, flag in zip(['pos', 'vel', 'pid'], [return_pos, return_vel, return_pid]):
+        if flag == True:
+            fields.append(field)
+    with h5py.File(hdf5_filename, 'r') as hdf5_file:
+        ranges = get_sorted_ranges(hdf5_file, xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax,
+                                   zmin=zmin, zmax=zmax)
+        starts = np.zeros(len(ranges)+1, dtype='int64')
+        starts[1:] = np.cumsum(ranges[:, 1] - ranges[:, 0])
+        names = fields if 'pos' in fields else ['pos'] + fields
+        data = {}
+        for name in names:
+            dset = hdf5_file[name]
+            data[name] = np.empty((starts[-1],) + dset.shape[1:], dtype=dset.dtype)
+            for i in range(0, len(ranges)):
+                dset.read_direct(data[name], source_sel=np.s_[ranges[i, 0]:ranges[i, 1]],
+                                 dest_sel=np.s_[starts[i]:starts[i+1]])
+    # cells on the edge of the box are cut exactly.
+    mask = read_single.get_mask(data['pos'], xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax,
+                                zmin=zmin, zmax=zmax)
+    out = []
+    for field in fields:
+        if mask is None:
+            out.append(data[field])
+        else:
+            out.append(data[field][mask])
+    if len(out) == 1:
+        return out[0]
+    return tuple(out)
@@ -1,6 +1,17 @@
 
 
 from .read import get_hdf5_data
+from .read import get_hdf5_file
+from .read import open_hdf5_file
+from .read import close_hdf5_files
+from .read import set_hdf5_pool_size
+
+from .iterate import iter_hdf5_data
+
+from .multi import get_hdf5_files
+from .multi import make_hdf5_info
+from .multi import ReadHDF5
 
 from .utils import print_hdf5_item_structure
 from .utils import get_hdf5_keys
+from .utils import get_hdf5_catalogue
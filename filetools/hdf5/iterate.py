@@ -0,0 +1,91 @@
+import math
+import numpy as np
+
+from .. import utils
+
+
+h5py = utils.lazy_import('h5py')
+
+
+def get_block_rows(dsets, block_bytes=2**26):
+    """Returns a number of rows aligned to the on-disk chunks of every dataset.
+
+    Parameters
+    ----------
+    dsets : list
+        h5py datasets sharing their first axis.
+    block_bytes : int, optional
+        Approximate memory budget of a block of all datasets.
+
+    Returns
+    -------
+    block_rows : int
+        Rows per block, a multiple of the first-axis chunk length of every chunked
+        dataset.
+    """
+    align = 1
+    row_bytes = 0
+    for dset in dsets:
+        if dset.chunks is not None:
+            align = align*dset.chunks[0]//math.gcd(align, dset.chunks[0])
+        row_bytes += dset.dtype.itemsize*int(np.prod(dset.shape[1:]))
+    nalign = max(int(block_bytes // max(row_bytes*align, 1)), 1)
+    return nalign*align
+
+
+def _iter_blocks(hdf5_filename, key_name, block_rows, block_bytes):
+    """Internal generator reading aligned blocks of one or more datasets."""
+    islist = isinstance(key_name, list)
+    keys = key_name if islist else [key_name]
+    with h5py.File(hdf5_filename, 'r') as hdf5_file:
+        dsets = [hdf5_file[key] for key in keys]
+        nrows = dsets[0].shape[0]
+        for dset in dsets:
+            assert dset.shape[0] == nrows, "Datasets must have the same length along the first axis."
+        align = get_block_rows(dsets, block_bytes=0)
+        if block_rows is None:
+            block_rows = get_block_rows(dsets, block_bytes=block_bytes)
+        else:
+            block_rows = int(np.ceil(block_rows/align))*align
+        for start in range(0, nrows, block_rows):
+            end = min(start + block_rows, nrows)
+            data = [dset[start:end] for dset in dsets]
+            if islist == True:
+                yield data
+            else:
+                yield data[0]
+
+
+def iter_hdf5_data(hdf5_filename, key_name, block_rows=None, block_bytes=2**26, prefetch=0,
+                   overide_extension=False):
+    """Iterates over one or more datasets in blocks aligned to their on-disk chunks.
+
+    Each block covers whole HDF5 chunks, so every chunk is read (and decompressed) once.
+
+    Parameters
+    ----------
+    hdf5_filename : str
+        Filename of the hdf5 file.
+    key_name : str
+        the key_name or key_names of datasets sharing their first axis.
+    block_rows : int, optional
+        Rows per block, rounded up to a multiple of the chunk length. Default is set
+        by block_bytes.
+    block_bytes : int, optional
+        Approximate memory budget of a block, used if block_rows is None.
+    prefetch : int, optional
+        Number of blocks read ahead by a background thread.
+    overide_extension : bool
+        Checks extension is hdf5 and allow for this to be added if not included in
+        the filename.
+
+    Yields
+    ------
+    data : array
+        Block of the dataset, or a list of blocks if key_name is a list.
+    """
+    if hdf5_filename.endswith('.hdf5') != True and overide_extension == True:
+        hdf5_filename = hdf5_filename + '.hdf5'
+    blocks = _iter_blocks(hdf5_filename, key_name, block_rows, block_bytes)
+    for data in utils.prefetch(blocks, depth=prefetch):
+        yield data
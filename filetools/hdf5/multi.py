@@ -0,0 +1,335 @@
+import glob
+import functools
+import numpy as np
+
+from .. import utils
+
+
+h5py = utils.lazy_import('h5py')
+
+
+# Rows of a sparse selection less than MAX_GAP rows apart are read in one hyperslab and
+# the gap discarded, and no hyperslab covers more than MAX_SPAN rows.
+MAX_GAP = 1024
+MAX_SPAN = 1048576
+
+
+def get_hdf5_files(fname):
+    """Returns the file numbers and names of a split HDF5 output.
+
+    Parameters
+    ----------
+    fname : str
+        File name pattern where '*' stands for the file number, e.g. 'snap.*.hdf5'.
+
+    Returns
+    -------
+    filenum : array
+        Sorted file numbers.
+    fnames : list
+        File names.
+    """
+    assert fname.count('*') == 1, "File name pattern must contain a single '*'."
+    prefix, suffix = fname.split('*')
+    filenum = []
+    for _fname in glob.glob(fname):
+        num = _fname[len(prefix):len(_fname)-len(suffix)]
+        if num.isdigit():
+            filenum.append(int(num))
+    filenum = np.array(sorted(filenum), dtype='int')
+    return filenum, [prefix + str(i) + suffix for i in filenum]
+
+
+def _scan_hdf5_file(fname, pos_key):
+    """Internal function returning the bounds and length of a position dataset."""
+    with h5py.File(fname, 'r') as hdf5_file:
+        pos = hdf5_file[pos_key][()]
+    if len(pos) == 0:
+        return np.zeros(6), 0
+    return np.concatenate([pos.min(axis=0), pos.max(axis=0)]).astype('float64'), len(pos)
+
+
+def make_hdf5_info(fname, infoname, pos_key, workers=None, pool='process', progress=True):
+    """Scans the parts of a split HDF5 output and writes an info file in the format of
+    make_gadget_info, used by ReadHDF5 to skip files outside a region.
+
+    Parameters
+    ----------
+    fname : str
+        File name pattern where '*' stands for the file number, e.g. 'snap.*.hdf5'.
+    infoname : str
+        Info file name.
+    pos_key : str
+        Key of the (N, 3) position dataset.
+    workers : int, optional
+        Number of files scanned concurrently.
+    pool : str, optional
+        Either 'thread' or 'process'.
+    progress : bool, optional
+        Reports the progress of the scan, see utils.ProgressTracker.
+    """
+    filenum, fnames = get_hdf5_files(fname)
+    _scan = functools.partial(_scan_hdf5_file, pos_key=pos_key)
+    bounds = np.zeros((len(fnames), 6))
+    npart = np.zeros(len(fnames), dtype='int64')
+    tracker = utils.ProgressTracker(len(fnames), explanation='Scanning HDF5 File',
+                                    mode='auto' if progress == True else 'off')
+    for i, out in enumerate(utils.pool_map(_scan, fnames, workers=workers, pool=pool)):
+        bounds[i], npart[i] = out
+        tracker.update(particles=npart[i])
+    tracker.close()
+    fmt = ['%d'] + ['%.8e']*6 + ['%d']
+    np.savetxt(infoname, np.column_stack([filenum, bounds, npart]), fmt=fmt)
+    np.savez(infoname + '.npz', filenum=filenum, bounds=bounds, npart=npart)
+
+
+def _get_hdf5_shapes(fname, keys):
+    """Internal function returning the shape and dtype of each dataset in a file."""
+    with h5py.File(fname, 'r') as hdf5_file:
+        return [(hdf5_file[key].shape, hdf5_file[key].dtype) for key in keys]
+
+
+def _get_spans(ind, gap=MAX_GAP, span=MAX_SPAN):
+    """Internal function grouping sorted, unique row indices into spans each read with one
+    hyperslab, returned as (K, 2) start and end positions in ind."""
+    if len(ind) == 0:
+        return np.zeros((0, 2), dtype='int64')
+    breaks = np.concatenate([[0], np.flatnonzero(np.diff(ind) > gap) + 1, [len(ind)]])
+    spans = []
+    for start, end in zip(breaks[:-1], breaks[1:]):
+        while start < end:
+            _end = min(end, np.searchsorted(ind, ind[start] + span, side='left'))
+            spans.append([start, _end])
+            start = _end
+    return np.array(spans, dtype='int64')
+
+
+def _read_hdf5_rows(dset, ind):
+    """Internal function reading the rows ind (sorted, unique) of a dataset.
+
+    Runs of consecutive rows are read straight into the output with read_direct, other
+    spans (see _get_spans) are read into a buffer of at most MAX_SPAN rows and the kept
+    rows copied out.
+    """
+    data = np.empty((len(ind),) + dset.shape[1:], dtype=dset.dtype)
+    for start, end in _get_spans(ind):
+        first, last = ind[start], ind[end-1] + 1
+        if last - first == end - start:
+            dset.read_direct(data, np.s_[first:last], np.s_[start:end])
+        else:
+            data[start:end] = dset[first:last][ind[start:end] - first]
+    return data
+
+
+def _index_hdf5_file(fname, pos_key, limits, return_pos=False):
+    """Internal function returning the rows of a file whose positions are inside the
+    region limits, and their positions if return_pos is True.
+
+    Parameters
+    ----------
+    fname : str
+        File name.
+    pos_key : str
+        Key of the (N, 3) position dataset.
+    limits : list
+        Region limits [xmin, xmax, ymin, ymax, zmin, zmax], None entries are not set.
+    return_pos : bool, optional
+        If True also returns the positions of the selected rows.
+    """
+    with h5py.File(fname, 'r') as hdf5_file:
+        pos = hdf5_file[pos_key][()]
+    ind = np.flatnonzero(utils.get_mask(pos, *limits))
+    if return_pos == True:
+        return ind, pos[ind]
+    return ind, None
+
+
+def _read_hdf5_file(args, keys):
+    """Internal function which reads datasets from a file, only the selected rows if
+    these are given.
+
+    Parameters
+    ----------
+    args : tuple
+        File name and the sorted, unique row indices (or None for every row).
+    keys : list
+        Dataset keys.
+    """
+    fname, ind = args
+    with h5py.File(fname, 'r') as hdf5_file:
+        if ind is None:
+            return [hdf5_file[key][()] for key in keys]
+        return [_read_hdf5_rows(hdf5_file[key], ind) for key in keys]
+
+
+class ReadHDF5:
+
+
+    def __init__(self):
+        """Initialises the class."""
+        self.fname = None
+        self.info = None
+        self.filenum = None
+        self.filebounds = None
+        self.filenpart = None
+        self.fileindex = None
+
+
+    def file(self, fname, info=None):
+        """Sets file name pattern and file info.
+
+        Parameters
+        ----------
+        fname : str
+            File name pattern where '*' stands for the file number, e.g. 'snap.*.hdf5'.
+        info : str, optional
+            Info file name, see make_hdf5_info (or make_gadget_info for the same
+            particles), used to skip files outside a region.
+        """
+        self.fname = fname
+        self.info = info
+        if self.info is None:
+            self.filenum, fnames = get_hdf5_files(self.fname)
+            self.filebounds, self.filenpart, self.fileindex = None, None, None
+        else:
+            dinfo = utils.load_info(self.info)
+            self.filenum = dinfo['filenum']
+            self.filebounds = dinfo['bounds']
+            self.filenpart = dinfo['npart']
+            self.fileindex = utils.FileIndex(self.filenum, self.filebounds)
+
+
+    def _get_fname(self, filenum):
+        """Internal function returning the file name of a file number."""
+        return self.fname.replace('*', str(filenum))
+
+
+    def get_shapes(self, key_name, files=None, workers=None, pool='thread'):
+        """Returns the shape and dtype of datasets in each file.
+
+        Parameters
+        ----------
+        key_name : str or list
+            Dataset key or keys.
+        files : list, optional
+            File numbers, default is all files.
+        workers : int, optional
+            Number of files opened concurrently.
+        pool : str, optional
+            Either 'thread' or 'process'.
+
+        Returns
+        -------
+        shapes : list
+            For each file a list of (shape, dtype) for each key.
+        """
+        keys = key_name if isinstance(key_name, list) else [key_name]
+        if files is None:
+            files = self.filenum
+        fnames = [self._get_fname(f) for f in files]
+        _shapes = functools.partial(_get_hdf5_shapes, keys=keys)
+        return list(utils.pool_map(_shapes, fnames, workers=workers, pool=pool))
+
+
+    def read(self, key_name, pos_key=None, xmin=None, xmax=None, ymin=None, ymax=None,
+             zmin=None, zmax=None, workers=None, pool='process', progress=False):
+        """Reads datasets from every part and joins them.
+
+        Parameters
+        ----------
+        key_name : str or list
+            Dataset key or keys, which must share their first axis within each file for
+            a region cut.
+        pos_key : str, optional
+            Key of the (N, 3) position dataset, needed for a region cut.
+        xmin : float, optional
+            Minimum x-value.
+        xmax : float, optional
+            Maximum x-value.
+        ymin : float, optional
+            Minimum y-value.
+        ymax : float, optional
+            Maximum y-value.
+        zmin : float, optional
+            Minimum z-value.
+        zmax : float, optional
+            Maximum z-value.
+        workers : int, optional
+            Number of files read concurrently.
+        pool : str, optional
+            Either 'thread' or 'process', the pool used when workers > 1.
+        progress : bool, optional
+            Reports the progress of the read, see utils.ProgressTracker.
+
+        Returns
+        -------
+        data : array
+            If key_name is a string the joined array, if a list then a list of arrays.
+        """
+        islist = isinstance(key_name, list)
+        keys = key_name if islist else [key_name]
+        limits = [xmin, xmax, ymin, ymax, zmin, zmax]
+        if all(lim is None for lim in limits):
+            limits = None
+            files = self.filenum
+        else:
+            assert pos_key is not None, "pos_key must be set for a region cut."
+            if self.fileindex is not None:
+                files = self.fileindex.query(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax,
+                                             zmin=zmin, zmax=zmax)
+            else:
+                files = self.filenum
+        fnames = [self._get_fname(f) for f in files]
+        if limits is None:
+            # dataset shapes are read up front so the outputs are allocated once.
+            shapes = self.get_shapes(keys, files=files, workers=workers, pool='thread')
+            lengths = [[_shape[j][0][0] for _shape in shapes] for j in range(0, len(keys))]
+            inds = [None for f in files]
+            _keys = keys
+        else:
+            # the rows kept in each file are found first so the outputs are allocated
+            # once and only those rows of the other datasets are read.
+            _index = functools.partial(_index_hdf5_file, pos_key=pos_key, limits=limits,
+                                       return_pos=pos_key in keys)
+            inds, poss = [], []
+            for _ind, _pos in utils.pool_map(_index, fnames, workers=workers, pool=pool):
+                inds.append(_ind)
+                poss.append(_pos)
+            shapes = self.get_shapes(keys, files=files, workers=workers, pool='thread')
+            lengths = [[len(_ind) for _ind in inds] for key in keys]
+            _keys = [key for key in keys if key != pos_key]
+        # the outputs are allocated from the first file, so every file must agree with it.
+        for i in range(1, len(shapes)):
+            for j in range(0, len(keys)):
+                if shapes[i][j][0][1:] != shapes[0][j][0][1:] or shapes[i][j][1] != shapes[0][j][1]:
+                    raise ValueError("%s in %s has shape %s and dtype %s, %s has %s and %s."
+                                     % (keys[j], fnames[i], shapes[i][j][0], shapes[i][j][1],
+                                        fnames[0], shapes[0][j][0], shapes[0][j][1]))
+        if len(shapes) == 0:
+            data = [None for key in keys]
+        else:
+            starts = np.zeros((len(keys), len(fnames)+1), dtype='int')
+            for j in range(0, len(keys)):
+                starts[j, 1:] = np.cumsum(lengths[j])
+            data = [np.empty((starts[j, -1],) + shapes[0][j][0][1:], dtype=shapes[0][j][1])
+                    for j in range(0, len(keys))]
+        if limits is not None and pos_key in keys:
+            j = keys.index(pos_key)
+            for i in range(0, len(fnames)):
+                data[j][starts[j, i]:starts[j, i+1]] = poss[i]
+                poss[i] = None
+        if len(_keys) != 0:
+            _read = functools.partial(_read_hdf5_file, keys=_keys)
+            args = list(zip(fnames, inds))
+            tracker = utils.ProgressTracker(len(fnames), explanation='Reading from HDF5 File',
+                                            mode='auto' if progress == True else 'off')
+            for i, _data in enumerate(utils.pool_map(_read, args, workers=workers, pool=pool)):
+                for _j, key in enumerate(_keys):
+                    j = keys.index(key)
+                    assert len(_data[_j]) == starts[j, i+1] - starts[j, i], "Length of %s in %s does not match." % (key, fnames[i])
+                    data[j][starts[j, i]:starts[j, i+1]] = _data[_j]
+                tracker.update(nbytes=sum(_d.nbytes for _d in _data))
+            tracker.close()
+        if islist == True:
+            return data
+        return data[0]
@@ -1,8 +1,158 @@
+import contextlib
+import threading
 import numpy as np
-import h5py
+from collections import OrderedDict
 
+from .. import utils
 
-def get_hdf5_data(hdf5_filename, key_name, overide_extension=False):
+
+h5py = utils.lazy_import('h5py')
+
+
+# Pool of open HDF5 files, least recently used first, each stored as [file, number of
+# open_hdf5_file blocks using it]. Files in use are not closed when evicted.
+_HDF5_FILES = OrderedDict()
+_HDF5_FILES_LOCK = threading.RLock()
+_HDF5_POOL_SIZE = 8
+
+
+def set_hdf5_pool_size(size):
+    """Sets the number of HDF5 files kept open by get_hdf5_file.
+
+    Parameters
+    ----------
+    size : int
+        Maximum number of open files, 0 closes files after every read.
+    """
+    global _HDF5_POOL_SIZE
+    with _HDF5_FILES_LOCK:
+        _HDF5_POOL_SIZE = size
+        _trim_hdf5_pool()
+
+
+def _trim_hdf5_pool():
+    """Internal function closing the least recently used files above the pool size,
+    skipping files in use."""
+    for fname in list(_HDF5_FILES.keys()):
+        if len(_HDF5_FILES) <= _HDF5_POOL_SIZE:
+            break
+        entry = _HDF5_FILES[fname]
+        if entry[1] == 0:
+            del _HDF5_FILES[fname]
+            entry[0].close()
+
+
+def _get_hdf5_entry(hdf5_filename):
+    """Internal function returning the pool entry of a file, opening it if needed."""
+    if hdf5_filename in _HDF5_FILES:
+        entry = _HDF5_FILES[hdf5_filename]
+        if entry[0].id.valid:
+            _HDF5_FILES.move_to_end(hdf5_filename)
+            return entry
+        del _HDF5_FILES[hdf5_filename]
+    entry = [h5py.File(hdf5_filename, 'r'), 0]
+    _HDF5_FILES[hdf5_filename] = entry
+    return entry
+
+
+def get_hdf5_file(hdf5_filename):
+    """Returns an open HDF5 file (read only) from the pool, opening it if needed.
+
+    Parameters
+    ----------
+    hdf5_filename : str
+        Filename of the hdf5 file.
+
+    Notes
+    -----
+    Files stay open until evicted or closed with close_hdf5_files, so changes made to a
+    file by another program after it was opened may not be seen. The file can be
+    evicted and closed once other files are opened, e.g. by another thread, so use
+    open_hdf5_file to keep it open while reading.
+    """
+    with _HDF5_FILES_LOCK:
+        if _HDF5_POOL_SIZE == 0:
+            return h5py.File(hdf5_filename, 'r')
+        entry = _get_hdf5_entry(hdf5_filename)
+        _trim_hdf5_pool()
+        return entry[0]
+
+
+@contextlib.contextmanager
+def open_hdf5_file(hdf5_filename):
+    """Context manager giving an open HDF5 file (read only) from the pool, which is not
+    closed by eviction or close_hdf5_files until the block exits.
+
+    Parameters
+    ----------
+    hdf5_filename : str
+        Filename of the hdf5 file.
+    """
+    with _HDF5_FILES_LOCK:
+        entry = _get_hdf5_entry(hdf5_filename)
+        entry[1] += 1
+    try:
+        yield entry[0]
+    finally:
+        with _HDF5_FILES_LOCK:
+            entry[1] -= 1
+            if _HDF5_FILES.get(hdf5_filename) is not entry:
+                # evicted or closed while in use.
+                if entry[1] == 0:
+                    entry[0].close()
+            else:
+                _trim_hdf5_pool()
+
+
+def close_hdf5_files():
+    """Closes all files in the HDF5 file pool, files in use by open_hdf5_file are closed
+    when their blocks exit."""
+    with _HDF5_FILES_LOCK:
+        while len(_HDF5_FILES) > 0:
+            fname, entry = _HDF5_FILES.popitem(last=False)
+            if entry[1] == 0:
+                entry[0].close()
+
+
+def _read_dataset(dset, select=None, out=None):
+    """Internal function which reads a (selection of a) dataset.
+
+    Parameters
+    ----------
+    dset : obj
+        h5py dataset.
+    select : slice, tuple or array, optional
+        Hyperslab (slice or tuple of slices) or integer index array along the first axis.
+    out : array, optional
+        Buffer which the selection is read into directly.
+    """
+    if select is not None and not isinstance(select, (slice, tuple)):
+        select = np.asarray(select)
+        if select.dtype == 'bool':
+            select = np.flatnonzero(select)
+        # h5py needs increasing unique indices, so the read is reordered afterwards.
+        uniq, inverse = np.unique(select, return_inverse=True)
+        if len(uniq) == len(select) and np.all(uniq == select):
+            source_sel = np.s_[select]
+        else:
+            data = dset[uniq][inverse]
+            if out is None:
+                return data
+            out[...] = data
+            return out
+    else:
+        source_sel = select
+    if out is None:
+        if source_sel is None:
+            return dset[()]
+        return dset[source_sel]
+    if dset.size != 0:
+        dset.read_direct(out, source_sel=source_sel)
+    return out
+
+
+def get_hdf5_data(hdf5_filename, key_name, overide_extension=False, select=None, out=None,
+                  pool=True):
     """Outputs a specific data set from the hdf5 data set.
 
     Parameters
@@ -14,6 +164,17 @@ def get_hdf5_data(hdf5_filename, key_name, overide_extension=False):
     overide_extension : bool
         Checks extension is hdf5 and allow for this to be added if not included in
         the filename.
+    select : slice, tuple or array, optional
+        Only reads part of each dataset: a slice or tuple of slices (hyperslab), or an
+        integer or boolean index array along the first axis, e.g. np.s_[1000:2000].
+    out : array or list, optional
+        Buffer (or a list of buffers if key_name is a list) the data is read into
+        directly with read_direct, which must match the shape of the selection. An
+        index array which is not increasing (or has repeats) is read in sorted order
+        into a temporary array and then reordered into out.
+    pool : bool, optional
+        Keeps the file open in a pool of recently used files (see open_hdf5_file), so
+        repeated calls do not reopen it. Otherwise the file is closed after reading.
 
     Returns
     -------
@@ -26,11 +187,20 @@ def get_hdf5_data(hdf5_filename, key_name, overide_extension=False):
         islist = True
     if hdf5_filename.endswith('.hdf5') != True and overide_extension == True:
         hdf5_filename = hdf5_filename + '.hdf5'
-    hdf5_file = h5py.File(hdf5_filename, 'r')
-    if islist is False:
-        data = np.array(hdf5_file[key_name])
+    if pool == True and _HDF5_POOL_SIZE == 0:
+        pool = False
+    if pool == True:
+        context = open_hdf5_file(hdf5_filename)
     else:
-        data = []
-        for i in range(0, len(key_name)):
-            data.append(np.array(hdf5_file[key_name[i]]))
+        context = h5py.File(hdf5_filename, 'r')
+    with context as hdf5_file:
+        if islist is False:
+            data = _read_dataset(hdf5_file[key_name], select=select, out=out)
+        else:
+            data = []
+            for i in range(0, len(key_name)):
+                _out = None
+                if out is not None:
+                    _out = out[i]
+                data.append(_read_dataset(hdf5_file[key_name[i]], select=select, out=_out))
     return data
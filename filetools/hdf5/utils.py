@@ -1,5 +1,11 @@
+import os
+import json
 import numpy as np
-import h5py
+
+from .. import utils
+
+
+h5py = utils.lazy_import('h5py')
 
 
 def print_hdf5_item_structure(item, offset='    '):
@@ -19,13 +25,79 @@ def print_hdf5_item_structure(item, offset='    '):
     else:
         print('Unknown item in HDF5 file:', item.name)
     if isinstance(item, h5py.File) or isinstance(item, h5py.Group):
-        for key, val in dict(item).items():
+        for key, val in item.items():
             sub_item = val
             print(offset, key)
             print_hdf5_item_structure(sub_item, offset + '    ')
 
 
-def get_hdf5_keys(hdf5_filename, overide_extension=False):
+def _get_catalogue_fname(hdf5_filename):
+    """Internal function returning the file name of the catalogue sidecar."""
+    return hdf5_filename + '.catalogue.json'
+
+
+def _make_hdf5_catalogue(hdf5_file):
+    """Internal function which records the layout of every dataset in a single
+    visititems pass."""
+    catalogue = {}
+    def _visit(name, item):
+        if isinstance(item, h5py.Dataset):
+            catalogue[name] = {'shape': list(item.shape), 'dtype': item.dtype.str,
+                               'chunks': None if item.chunks is None else list(item.chunks),
+                               'compression': item.compression,
+                               'compression_opts': item.compression_opts,
+                               'nbytes': int(item.size*item.dtype.itemsize),
+                               'storage_size': int(item.id.get_storage_size())}
+    hdf5_file.visititems(_visit)
+    return catalogue
+
+
+def get_hdf5_catalogue(hdf5_filename, overide_extension=False, cache=True):
+    """Returns the shape, dtype, chunking, compression and storage size of every dataset.
+
+    Parameters
+    ----------
+    hdf5_filename : str
+        Filename of the hdf5 file.
+    overide_extension : bool
+        Checks extension is hdf5 and allow for this to be added if not included in
+        the filename.
+    cache : bool, optional
+        Reads the catalogue from the sidecar hdf5_filename + '.catalogue.json' if it
+        matches the modification time and size of the file, otherwise the catalogue is
+        made and the sidecar (re)written.
+
+    Returns
+    -------
+    catalogue : dict
+        Keyed by dataset name, each a dict of 'shape', 'dtype', 'chunks',
+        'compression', 'compression_opts', 'nbytes' and 'storage_size' (bytes on disk).
+    """
+    if hdf5_filename.endswith('.hdf5') != True and overide_extension == True:
+        hdf5_filename = hdf5_filename + '.hdf5'
+    stat = os.stat(hdf5_filename)
+    stamp = [stat.st_mtime_ns, stat.st_size]
+    sidecar = _get_catalogue_fname(hdf5_filename)
+    if cache == True and os.path.isfile(sidecar):
+        try:
+            with open(sidecar, 'r') as f:
+                saved = json.load(f)
+            if saved['stamp'] == stamp:
+                return saved['catalogue']
+        except (IOError, ValueError, KeyError):
+            pass
+    with h5py.File(hdf5_filename, 'r') as hdf5_file:
+        catalogue = _make_hdf5_catalogue(hdf5_file)
+    if cache == True:
+        try:
+            with open(sidecar, 'w') as f:
+                json.dump({'stamp': stamp, 'catalogue': catalogue}, f)
+        except IOError:
+            pass
+    return catalogue
+
+
+def get_hdf5_keys(hdf5_filename, overide_extension=False, catalogue=False, cache=True):
     """Prints the HDF5 file structure and keys.
 
     Parameters
@@ -35,9 +107,16 @@ def get_hdf5_keys(hdf5_filename, overide_extension=False):
     overide_extension : bool
         Checks extension is hdf5 and allow for this to be added if not included in
         the filename.
+    catalogue : bool, optional
+        If True nothing is printed and the dataset catalogue is returned instead, see
+        get_hdf5_catalogue.
+    cache : bool, optional
+        Uses the catalogue sidecar file, if catalogue is True.
     """
     if hdf5_filename.endswith('.hdf5') != True and overide_extension == True:
         hdf5_filename = hdf5_filename + '.hdf5'
+    if catalogue == True:
+        return get_hdf5_catalogue(hdf5_filename, cache=cache)
     hdf5_file = h5py.File(hdf5_filename, 'r')
     print_hdf5_item_structure(hdf5_file)
     hdf5_file.close()
@@ -1 +1,13 @@
 from .progress import progress_bar
+from .progress import ProgressTracker
+from .stats import ReadStats
+from .stats import make_record
+from .stats import add_phase
+from .prefetch import prefetch
+from .pool import pool_map
+from .mpi_local import LocalMPI
+from .mpi_local import run_local
+from .lazy import lazy_import
+from .region import get_mask
+from .region import FileIndex
+from .info import load_info
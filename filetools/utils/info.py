@@ -0,0 +1,41 @@
+import os.path
+import numpy as np
+
+
+def load_info(infoname):
+    """Loads an info file of the bounds of each part of a split output, from its binary
+    sidecar infoname + '.npz' if there is one which is not older than the text file.
+
+    The text file has, for each part, the file number, the six bounds [xmin, ymin, zmin,
+    xmax, ymax, zmax] and optionally the particle count (columns 0, 1-6 and 7), see
+    gadget.make_gadget_info and hdf5.make_hdf5_info.
+
+    Parameters
+    ----------
+    infoname : str
+        Info file name.
+
+    Returns
+    -------
+    info : dict
+        Contains 'filenum', 'bounds' (N, 6) and 'npart' (None if the file has no
+        particle count column), and any other entries of the sidecar.
+    """
+    sidecar = infoname + '.npz'
+    if infoname.endswith('.npz'):
+        sidecar = infoname
+        infoname = infoname[:-len('.npz')]
+    use_sidecar = os.path.isfile(sidecar)
+    if use_sidecar == True and os.path.isfile(infoname) == True:
+        use_sidecar = os.path.getmtime(sidecar) >= os.path.getmtime(infoname)
+    if use_sidecar == True:
+        info = {}
+        with np.load(sidecar) as data:
+            for key in data.files:
+                info[key] = data[key].item() if data[key].ndim == 0 else data[key]
+        return info
+    dinfo = np.loadtxt(infoname, unpack=True, ndmin=2)
+    info = {'filenum': dinfo[0].astype('int'), 'bounds': dinfo[1:7].T.copy(), 'npart': None}
+    if len(dinfo) > 7:
+        info['npart'] = dinfo[7].astype('int')
+    return info
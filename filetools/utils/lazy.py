@@ -0,0 +1,36 @@
+import types
+import importlib
+
+
+class LazyModule(types.ModuleType):
+
+
+    def __init__(self, name):
+        """Module which is only imported when one of its attributes is first used.
+
+        Parameters
+        ----------
+        name : str
+            Module name, e.g. 'h5py'.
+        """
+        super().__init__(name)
+
+
+    def __getattr__(self, attr):
+        # only called for attributes missing from __dict__, so after the first use the
+        # module's attributes are found directly.
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """Returns a module which is imported on first use, so optional or heavy dependencies
+    (h5py, fitsio, pygadgetreader) are only loaded, and only fail, when used.
+
+    Parameters
+    ----------
+    name : str
+        Module name.
+    """
+    return LazyModule(name)
@@ -0,0 +1,205 @@
+import numpy as np
+import multiprocessing
+
+
+class LocalComm:
+
+
+    def __init__(self, mpi):
+        """Collective operations of a LocalMPI object, following the mpi4py communicator
+        method names used by filetools.
+
+        Parameters
+        ----------
+        mpi : obj
+            LocalMPI object.
+        """
+        self.mpi = mpi
+
+
+    def Get_rank(self):
+        """Returns the rank."""
+        return self.mpi.rank
+
+
+    def Get_size(self):
+        """Returns the number of ranks."""
+        return self.mpi.size
+
+
+    def Barrier(self):
+        """Waits for all ranks to reach this point."""
+        self.mpi.wait()
+
+
+    def bcast(self, obj, root=0):
+        """Broadcasts obj from root to all ranks."""
+        if self.mpi.rank == root:
+            for i in range(0, self.mpi.size):
+                if i != root:
+                    self.mpi.send(obj, to_rank=i, tag=-1)
+            return obj
+        return self.mpi.recv(root, tag=-1)
+
+
+    def gather(self, obj, root=0):
+        """Gathers obj from all ranks onto root, as a list in rank order."""
+        if self.mpi.rank != root:
+            self.mpi.send(obj, to_rank=root, tag=-2)
+            return None
+        objs = []
+        for i in range(0, self.mpi.size):
+            if i == root:
+                objs.append(obj)
+            else:
+                objs.append(self.mpi.recv(i, tag=-2))
+        return objs
+
+
+    def Gatherv(self, sendbuf, recvbuf, root=0):
+        """Gathers arrays of different lengths into a buffer on root.
+
+        Parameters
+        ----------
+        sendbuf : array
+            Array sent by this rank.
+        recvbuf : list
+            On root [buffer, (counts, displs)], with counts and displacements in
+            elements of the flattened buffer.
+        root : int, optional
+            Receiving rank.
+        """
+        if self.mpi.rank != root:
+            self.mpi.send(np.ascontiguousarray(sendbuf), to_rank=root, tag=-3)
+            return
+        buf, (counts, displs) = recvbuf[0], recvbuf[1]
+        flat = buf.reshape(-1)
+        for i in range(0, self.mpi.size):
+            if i == root:
+                _data = np.asarray(sendbuf)
+            else:
+                _data = self.mpi.recv(i, tag=-3)
+            assert _data.size == counts[i], "Gatherv count does not match for rank %i." % i
+            flat[displs[i]:displs[i]+counts[i]] = _data.reshape(-1)
+
+
+class LocalMPI:
+
+
+    def __init__(self, rank, size, queues, barrier):
+        """Single machine stand-in for the mpiutils MPI class, where each rank is a
+        process started by run_local.
+
+        Parameters
+        ----------
+        rank : int
+            Rank of this process.
+        size : int
+            Number of processes.
+        queues : dict
+            multiprocessing queues keyed by (sending rank, receiving rank).
+        barrier : obj
+            multiprocessing barrier.
+        """
+        self.rank = rank
+        self.size = size
+        self._queues = queues
+        self._barrier = barrier
+        self._pending = {}
+        self._loop_length = None
+        self._loop_size = None
+        self.comm = LocalComm(self)
+
+
+    def wait(self):
+        """Waits for all processes to reach this point."""
+        self._barrier.wait()
+
+
+    def send(self, data, to_rank=None, tag=11):
+        """Sends data to a rank, or to all other ranks if to_rank is None."""
+        if to_rank is None:
+            for i in range(0, self.size):
+                if i != self.rank:
+                    self._queues[(self.rank, i)].put((tag, data))
+        else:
+            self._queues[(self.rank, to_rank)].put((tag, data))
+
+
+    def recv(self, from_rank, tag=11):
+        """Receives data sent from a rank with a given tag."""
+        key = (from_rank, tag)
+        if key in self._pending and len(self._pending[key]) != 0:
+            return self._pending[key].pop(0)
+        while True:
+            _tag, data = self._queues[(from_rank, self.rank)].get()
+            if _tag == tag:
+                return data
+            self._pending.setdefault((from_rank, _tag), []).append(data)
+
+
+    def set_loop(self, length):
+        """Splits a loop of a given length into contiguous parts for each rank and
+        returns the loop size on each rank."""
+        self._loop_length = length
+        self._loop_size = int(np.ceil(length/self.size))
+        return self._loop_size
+
+
+    def mpi_ind2ind(self, mpi_ind):
+        """Converts the loop index on this rank to the global index, None if the rank
+        has no work at this index."""
+        ind = self.rank*self._loop_size + mpi_ind
+        if ind < self._loop_length:
+            return ind
+        return None
+
+
+def _run_rank(func, rank, size, queues, barrier, results, args, kwargs):
+    """Internal function which runs func on one rank."""
+    try:
+        out = func(LocalMPI(rank, size, queues, barrier), *args, **kwargs)
+        results.put((rank, True, out))
+    except BaseException as error:
+        results.put((rank, False, repr(error)))
+
+
+def run_local(func, size, *args, **kwargs):
+    """Runs func(MPI, *args, **kwargs) on size local processes, each given a LocalMPI
+    object, so MPI code paths can be run on one machine.
+
+    Parameters
+    ----------
+    func : function
+        Function taking an MPI-like object as its first argument.
+    size : int
+        Number of processes.
+
+    Returns
+    -------
+    outs : list
+        Output of func on each rank.
+    """
+    ctx = multiprocessing.get_context('fork')
+    queues = {}
+    for i in range(0, size):
+        for j in range(0, size):
+            queues[(i, j)] = ctx.Queue()
+    barrier = ctx.Barrier(size)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_run_rank, args=(func, rank, size, queues, barrier, results, args, kwargs))
+             for rank in range(0, size)]
+    for proc in procs:
+        proc.start()
+    outs = [None for i in range(0, size)]
+    for i in range(0, size):
+        rank, success, out = results.get()
+        if success == False:
+            # other ranks may be waiting on the failed rank, so they are stopped.
+            for proc in procs:
+                proc.terminate()
+            raise RuntimeError('run_local failed on rank %i: %s' % (rank, out))
+        outs[rank] = out
+    for proc in procs:
+        proc.join()
+    return outs
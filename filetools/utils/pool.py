@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+def pool_map(func, items, workers=None, pool='thread'):
+    """Applies a function to each item, concurrently if workers > 1, yielding outputs in order.
+
+    Parameters
+    ----------
+    func : function
+        Function applied to each item, must be picklable if pool is 'process'.
+    items : list
+        Items, e.g. file names.
+    workers : int, optional
+        Number of concurrent workers, if None the items are processed one at a time.
+    pool : str, optional
+        Either 'thread' or 'process'.
+    """
+    if workers is None or workers <= 1:
+        for item in items:
+            yield func(item)
+    else:
+        assert pool in ['thread', 'process'], "Unknown pool %s." % pool
+        if pool == 'thread':
+            executor = ThreadPoolExecutor(max_workers=workers)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        with executor:
+            for out in executor.map(func, items):
+                yield out
@@ -0,0 +1,95 @@
+import queue
+import atexit
+import threading
+
+
+# Background readers which are still running, stopped at exit so that no thread is
+# killed while inside a reader's C library.
+_ACTIVE = set()
+_ACTIVE_LOCK = threading.Lock()
+
+# Seconds waited for a background reader to finish the item it is reading and stop.
+JOIN_TIMEOUT = 10.
+
+
+def _stop_all():
+    """Internal function which stops all background readers."""
+    with _ACTIVE_LOCK:
+        active = list(_ACTIVE)
+    for stop, thread in active:
+        stop.set()
+    for stop, thread in active:
+        thread.join(timeout=JOIN_TIMEOUT)
+
+
+atexit.register(_stop_all)
+
+
+def prefetch(iterable, depth=1):
+    """Iterates over an iterable while a background thread reads ahead.
+
+    Parameters
+    ----------
+    iterable : iterable
+        Items to iterate over, e.g. a generator reading chunks from disk.
+    depth : int, optional
+        Number of items read ahead of the caller. If None or 0 no thread is used.
+
+    Yields
+    ------
+    item : obj
+        Items of the iterable, in order. An error raised while reading ahead is raised
+        to the caller when it reaches the item that failed.
+
+    Notes
+    -----
+    The background thread closes the iterable when it stops, so a generator's open
+    files are released there. Closing this generator early waits (up to JOIN_TIMEOUT
+    seconds) for the thread to finish the item it is reading and stop.
+    """
+    if depth is None or depth < 1:
+        for item in iterable:
+            yield item
+        return
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _worker():
+        try:
+            for item in iterable:
+                if _put((False, item)) == False:
+                    return
+        except BaseException as error:
+            _put((True, error))
+            return
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        _put((True, None))
+
+    thread = threading.Thread(target=_worker, daemon=True)
+    with _ACTIVE_LOCK:
+        _ACTIVE.add((stop, thread))
+    thread.start()
+    try:
+        while True:
+            done, item = items.get()
+            if done == True:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join(timeout=JOIN_TIMEOUT)
+        with _ACTIVE_LOCK:
+            _ACTIVE.discard((stop, thread))
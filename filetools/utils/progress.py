@@ -1,4 +1,5 @@
 import sys
+import time
 
 
 def progress_bar(index, length, explanation=None, indexing=False, num_refresh=50,
@@ -69,3 +70,135 @@ def progress_bar(index, length, explanation=None, indexing=False, num_refresh=50
             sys.stdout.flush()
     else:
         pass
+
+
+class ProgressTracker:
+
+
+    def __init__(self, length, explanation=None, unit='files', interval=0.5, log_interval=10.,
+                 mode='auto', MPI=None, stream=None, bar_length=50):
+        """Progress and throughput reporting for a loop, refreshed by time rather than by index.
+
+        Parameters
+        ----------
+        length : int
+            Total number of items, e.g. files.
+        explanation : str, optional
+            The message output.
+        unit : str, optional
+            Name of the items, used for the item rate.
+        interval : float, optional
+            Minimum time in seconds between refreshes of the progress bar.
+        log_interval : float, optional
+            Minimum time in seconds between log lines.
+        mode : str, optional
+            'bar' (progress bar), 'log' (one line per log_interval), 'off', or 'auto',
+            which uses 'bar' if the stream is a terminal and 'log' otherwise.
+        MPI : obj, optional
+            mpiutils MPI class object, only rank 0 reports.
+        stream : obj, optional
+            Output stream, default is sys.stdout.
+        bar_length : int, optional
+            Length of the progress bar.
+        """
+        self.length = length
+        self.explanation = explanation
+        self.unit = unit
+        self.stream = stream if stream is not None else sys.stdout
+        if mode == 'auto':
+            isatty = getattr(self.stream, 'isatty', None)
+            mode = 'bar' if isatty is not None and isatty() else 'log'
+        assert mode in ['bar', 'log', 'off'], "Unknown mode %s." % mode
+        if MPI is not None and MPI.rank != 0:
+            mode = 'off'
+        self.mode = mode
+        self.interval = interval if mode == 'bar' else log_interval
+        self.bar_length = bar_length
+        self.count = 0
+        self.particles = 0
+        self.nbytes = 0
+        self.start = time.monotonic()
+        self._next = self.start + self.interval
+        self._closed = False
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def update(self, n=1, particles=0, nbytes=0):
+        """Records finished items, printing only if the refresh interval has passed.
+
+        Parameters
+        ----------
+        n : int, optional
+            Number of items finished.
+        particles : int, optional
+            Number of particles read.
+        nbytes : int, optional
+            Number of bytes read.
+        """
+        self.count += n
+        self.particles += particles
+        self.nbytes += nbytes
+        if self.mode != 'off':
+            now = time.monotonic()
+            if now >= self._next:
+                self._next = now + self.interval
+                self._write()
+
+
+    def get_rates(self):
+        """Returns the elapsed time, items/s, particles/s, MB/s and the ETA in seconds
+        (None before any item is finished)."""
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        eta = None
+        if self.count != 0:
+            eta = elapsed*(self.length - self.count)/self.count
+        return elapsed, self.count/elapsed, self.particles/elapsed, self.nbytes/elapsed/1e6, eta
+
+
+    def _get_stats(self):
+        """Internal function returning the progress and throughput text."""
+        elapsed, rate, prate, mbrate, eta = self.get_rates()
+        line = "[%d/%d] %.1f %s/s" % (self.count, self.length, rate, self.unit)
+        if self.particles != 0:
+            line += ", %.3g particles/s" % prate
+        if self.nbytes != 0:
+            line += ", %.1f MB/s" % mbrate
+        if eta is not None and self.count < self.length:
+            line += ", ETA %.0fs" % eta
+        else:
+            line += ", %.1fs" % elapsed
+        return line
+
+
+    def _write(self):
+        """Internal function which prints the current state."""
+        line = self._get_stats()
+        if self.mode == 'bar':
+            done = 0
+            if self.length != 0:
+                done = int(self.bar_length*min(self.count, self.length)/self.length)
+            line = "|" + "#"*done + "_"*(self.bar_length - done) + "| " + line
+        if self.explanation is not None:
+            line = self.explanation + " : " + line
+        if self.mode == 'bar':
+            self.stream.write("\r" + line)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+    def close(self):
+        """Prints the final state."""
+        if self._closed == False and self.mode != 'off':
+            self._write()
+            if self.mode == 'bar':
+                self.stream.write("\n")
+                self.stream.flush()
+        self._closed = True
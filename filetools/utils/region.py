@@ -0,0 +1,443 @@
+import numpy as np
+
+
+def get_box(xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None):
+    """Returns region limits as a box array, with unset limits stored as NaN.
+
+    Parameters
+    ----------
+    xmin : float, optional
+        Minimum x-value.
+    xmax : float, optional
+        Maximum x-value.
+    ymin : float, optional
+        Minimum y-value.
+    ymax : float, optional
+        Maximum y-value.
+    zmin : float, optional
+        Minimum z-value.
+    zmax : float, optional
+        Maximum z-value.
+
+    Returns
+    -------
+    box : array
+        Box limits in the order [xmin, xmax, ymin, ymax, zmin, zmax].
+    """
+    lims = [xmin, xmax, ymin, ymax, zmin, zmax]
+    return np.array([np.nan if lim is None else lim for lim in lims], dtype='float64')
+
+
+def get_sphere_box(center, radius):
+    """Returns the box enclosing a sphere.
+
+    Parameters
+    ----------
+    center : array
+        Sphere center [x, y, z].
+    radius : float
+        Sphere radius.
+
+    Returns
+    -------
+    box : array
+        Box limits in the order [xmin, xmax, ymin, ymax, zmin, zmax].
+    """
+    center = np.asarray(center, dtype='float64')
+    return np.array([center[0]-radius, center[0]+radius, center[1]-radius, center[1]+radius,
+                     center[2]-radius, center[2]+radius])
+
+
+def get_periodic_boxes(box, boxsize):
+    """Splits a box in a periodic volume into boxes inside [0, boxsize).
+
+    Limits may lie outside [0, boxsize) or have the minimum above the maximum (the
+    interval then wraps around the box), and a box crossing the boundary along an axis
+    is split in two there, so up to 8 boxes are returned. Axes with an unset limit are
+    left as they are and axes spanning the whole box are unset.
+
+    Parameters
+    ----------
+    box : array
+        Box limits [xmin, xmax, ymin, ymax, zmin, zmax], NaN if unset.
+    boxsize : float
+        Size of the periodic box.
+
+    Returns
+    -------
+    boxes : array
+        (M, 6) box limits, NaN if unset.
+    """
+    boxes = np.zeros((1, 0))
+    for axis in range(0, 3):
+        lim_min, lim_max = box[2*axis], box[2*axis+1]
+        if np.isnan(lim_min) or np.isnan(lim_max):
+            lims = [[lim_min, lim_max]]
+        else:
+            width = lim_max - lim_min if lim_max >= lim_min else np.mod(lim_max - lim_min, boxsize)
+            lim_min = np.mod(lim_min, boxsize)
+            lim_max = lim_min + width
+            if width >= boxsize:
+                lims = [[np.nan, np.nan]]
+            elif lim_max < boxsize:
+                lims = [[lim_min, lim_max]]
+            else:
+                lims = [[lim_min, np.nan], [np.nan, lim_max - boxsize]]
+        boxes = np.column_stack([np.repeat(boxes, len(lims), axis=0), np.tile(lims, (len(boxes), 1))])
+    return boxes
+
+
+def merge_ranges(ranges):
+    """Returns the union of particle ranges as sorted, non-touching ranges.
+
+    Parameters
+    ----------
+    ranges : array
+        (K, 2) start and end particle indices.
+    """
+    ranges = np.asarray(ranges, dtype='int64').reshape(-1, 2)
+    ranges = ranges[ranges[:, 1] > ranges[:, 0]]
+    if len(ranges) == 0:
+        return np.zeros((0, 2), dtype='int64')
+    ranges = ranges[np.argsort(ranges[:, 0], kind='stable')]
+    ends = np.maximum.accumulate(ranges[:, 1])
+    new = np.ones(len(ranges), dtype='bool')
+    new[1:] = ranges[1:, 0] > ends[:-1]
+    last = np.ones(len(ranges), dtype='bool')
+    last[:-1] = new[1:]
+    return np.column_stack([ranges[new, 0], ends[last]])
+
+
+def get_mask(pos, xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None,
+             center=None, radius=None, boxsize=None):
+    """Returns a boolean mask of the particles inside the (inclusive) region limits or
+    sphere.
+
+    Parameters
+    ----------
+    pos : array
+        Particle positions.
+    xmin : float, optional
+        Minimum x-value.
+    xmax : float, optional
+        Maximum x-value.
+    ymin : float, optional
+        Minimum y-value.
+    ymax : float, optional
+        Maximum y-value.
+    zmin : float, optional
+        Minimum z-value.
+    zmax : float, optional
+        Maximum z-value.
+    center : array, optional
+        Sphere center [x, y, z], if set the sphere is used instead of the limits.
+    radius : float, optional
+        Sphere radius.
+    boxsize : float, optional
+        Size of the periodic box. If set, distances to the sphere center use the nearest
+        periodic image and an axis with both limits set selects the interval from the
+        minimum to the maximum wrapping around the box, so limits may lie outside
+        [0, boxsize) or have the minimum above the maximum.
+
+    Returns
+    -------
+    mask : array
+        Boolean mask, None if no limits are set.
+    """
+    if center is not None:
+        dist2 = np.zeros(len(pos))
+        for axis in range(0, 3):
+            dist = pos[:, axis] - center[axis]
+            if boxsize is not None:
+                dist -= boxsize*np.round(dist/boxsize)
+            dist2 += dist**2
+        return dist2 <= radius**2
+    mask = None
+    limits = [(0, xmin, xmax), (1, ymin, ymax), (2, zmin, zmax)]
+    for axis, lim_min, lim_max in limits:
+        if boxsize is not None and lim_min is not None and lim_max is not None:
+            width = lim_max - lim_min if lim_max >= lim_min else np.mod(lim_max - lim_min, boxsize)
+            if width < boxsize:
+                cond = np.mod(pos[:, axis] - lim_min, boxsize) <= width
+                mask = cond if mask is None else np.logical_and(mask, cond, out=mask)
+            continue
+        if lim_min is not None:
+            cond = pos[:, axis] >= lim_min
+            mask = cond if mask is None else np.logical_and(mask, cond, out=mask)
+        if lim_max is not None:
+            cond = pos[:, axis] <= lim_max
+            mask = cond if mask is None else np.logical_and(mask, cond, out=mask)
+    return mask
+
+
+def get_cell_id(pos, bounds, ngrid):
+    """Returns the cell of each particle on a grid spanning a file's bounds.
+
+    Parameters
+    ----------
+    pos : array
+        Particle positions.
+    bounds : array
+        File bounds [xmin, ymin, zmin, xmax, ymax, zmax].
+    ngrid : int
+        Number of cells along each axis.
+
+    Returns
+    -------
+    cell_id : array
+        Cell index (ix*ngrid + iy)*ngrid + iz.
+    """
+    cell_id = np.zeros(len(pos), dtype='int64')
+    for axis in range(0, 3):
+        width = max(bounds[axis+3] - bounds[axis], np.finfo('float64').tiny)
+        icell = np.floor((pos[:, axis] - bounds[axis])*(ngrid/width)).astype('int64')
+        np.clip(icell, 0, ngrid-1, out=icell)
+        cell_id = cell_id*ngrid + icell
+    return cell_id
+
+
+class FileIndex:
+
+
+    def __init__(self, filenum, bounds, cell_counts=None, is_sorted=False):
+        """Spatial index over the bounding boxes of the sub-files of a split output.
+
+        Along each axis the files are kept sorted by their minimum and by their maximum,
+        so the files meeting any one limit of a box are a contiguous run of one of these
+        orders, found with searchsorted. Only the files in the shortest of the six runs
+        are checked against every limit, for all the boxes of a batch at once.
+
+        Parameters
+        ----------
+        filenum : array
+            File numbers.
+        bounds : array
+            (N, 6) file bounds in the info file order [xmin, ymin, zmin, xmax, ymax, zmax].
+        cell_counts : array, optional
+            (N, ngrid**3) particle counts on a grid spanning each file's bounds, see
+            get_cell_id for the cell ordering.
+        is_sorted : bool, optional
+            Whether there is a per-file permutation sorting the particles by cell (see
+            make_gadget_info), in which case the cell counts give the ranges of each
+            cell in that order.
+        """
+        self.filenum = np.asarray(filenum)
+        self.bounds = np.asarray(bounds, dtype='float64').reshape(len(self.filenum), 6)
+        # orders[k] sorts the files by bounds[:, k], i.e. minima for k < 3, maxima after.
+        self._orders = np.argsort(self.bounds, axis=0, kind='stable').T.copy()
+        self._sorted = np.take_along_axis(self.bounds, self._orders.T, axis=0).T.copy()
+        self.cell_counts = cell_counts
+        self.ngrid = None
+        self.is_sorted = is_sorted
+        if cell_counts is not None:
+            self.ngrid = int(round(np.shape(cell_counts)[1]**(1./3.)))
+            assert self.ngrid**3 == np.shape(cell_counts)[1], "Cell counts must be on an ngrid**3 grid."
+
+
+    def _overlaps(self, ind, box):
+        """Internal function checking which files overlap a box.
+
+        Along each axis a file is out of range if its maximum is at or below the box
+        minimum, or its minimum is above the box maximum (at or above if both box
+        limits are set).
+
+        Parameters
+        ----------
+        ind : array
+            Indices of the candidate files.
+        box : array
+            Box limits [xmin, xmax, ymin, ymax, zmin, zmax], NaN if unset, or (len(ind), 6)
+            limits with a box for each candidate.
+        """
+        box = np.asarray(box, dtype='float64')
+        keep = np.ones(len(ind), dtype='bool')
+        for axis in range(0, 3):
+            lim_min, lim_max = box[..., 2*axis], box[..., 2*axis+1]
+            file_min = self.bounds[ind, axis]
+            file_max = self.bounds[ind, axis+3]
+            keep &= np.isnan(lim_min) | (file_max > lim_min)
+            below = np.where(np.isnan(lim_min), file_min <= lim_max, file_min < lim_max)
+            keep &= np.isnan(lim_max) | below
+        return keep
+
+
+    def _get_runs(self, boxes):
+        """Internal function returning, for each box, the shortest run of files meeting one
+        of its limits, as the sorted order k and the start and end positions in it."""
+        nfiles = len(self.filenum)
+        starts = np.zeros((len(boxes), 6), dtype='int64')
+        ends = np.full((len(boxes), 6), nfiles, dtype='int64')
+        for axis in range(0, 3):
+            lim_min, lim_max = boxes[:, 2*axis], boxes[:, 2*axis+1]
+            # file maxima above the box minimum are a suffix of the maxima order.
+            isset = ~np.isnan(lim_min)
+            starts[isset, axis+3] = np.searchsorted(self._sorted[axis+3], lim_min[isset], side='right')
+            # file minima below (or at) the box maximum are a prefix of the minima order.
+            isset = ~np.isnan(lim_max)
+            left = np.searchsorted(self._sorted[axis], lim_max[isset], side='left')
+            right = np.searchsorted(self._sorted[axis], lim_max[isset], side='right')
+            ends[isset, axis] = np.where(np.isnan(lim_min[isset]), right, left)
+        counts = np.maximum(ends - starts, 0)
+        k = np.argmin(counts, axis=1)
+        rows = np.arange(len(boxes))
+        return k, starts[rows, k], starts[rows, k] + counts[rows, k]
+
+
+    def _sphere_overlaps(self, ind, center, radius, boxsize=None):
+        """Internal function checking which files are within radius of a center, using
+        the nearest periodic image if boxsize is set.
+
+        Parameters
+        ----------
+        ind : array
+            Indices of the candidate files.
+        center : array
+            Sphere center [x, y, z].
+        radius : float
+            Sphere radius.
+        boxsize : float, optional
+            Size of the periodic box.
+        """
+        dist2 = np.zeros(len(ind))
+        shifts = [0.] if boxsize is None else [-boxsize, 0., boxsize]
+        for axis in range(0, 3):
+            file_min = self.bounds[ind, axis]
+            file_max = self.bounds[ind, axis+3]
+            dist = np.full(len(ind), np.inf)
+            for shift in shifts:
+                _center = center[axis] + shift
+                dist = np.minimum(dist, np.maximum(np.maximum(file_min - _center, _center - file_max), 0.))
+            dist2 += dist**2
+        return dist2 <= radius**2
+
+
+    def query(self, xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None,
+              center=None, radius=None, boxsize=None):
+        """Returns the files overlapping a box or sphere.
+
+        Parameters
+        ----------
+        xmin : float, optional
+            Minimum x-value.
+        xmax : float, optional
+            Maximum x-value.
+        ymin : float, optional
+            Minimum y-value.
+        ymax : float, optional
+            Maximum y-value.
+        zmin : float, optional
+            Minimum z-value.
+        zmax : float, optional
+            Maximum z-value.
+        center : array, optional
+            Sphere center [x, y, z], used instead of the box limits.
+        radius : float, optional
+            Sphere radius.
+        boxsize : float, optional
+            Size of the periodic box, if set the box or sphere wraps around its edges.
+
+        Returns
+        -------
+        files : array
+            File numbers, in info file order.
+        """
+        if center is not None:
+            center = np.asarray(center, dtype='float64')
+            box = get_sphere_box(center, radius)
+        else:
+            box = get_box(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax)
+        if boxsize is None:
+            boxes = box[np.newaxis]
+        else:
+            boxes = get_periodic_boxes(box, boxsize)
+        files = self.query_batch(boxes)
+        ind = np.flatnonzero(np.isin(self.filenum, np.concatenate(files)))
+        if center is not None:
+            ind = ind[self._sphere_overlaps(ind, center, radius, boxsize=boxsize)]
+        return self.filenum[ind]
+
+
+    def query_batch(self, boxes):
+        """Returns the files overlapping each of many boxes.
+
+        Parameters
+        ----------
+        boxes : array
+            (M, 6) box limits [xmin, xmax, ymin, ymax, zmin, zmax], NaN if unset.
+
+        Returns
+        -------
+        files : list
+            Array of file numbers for each box, in info file order.
+        """
+        boxes = np.atleast_2d(np.asarray(boxes, dtype='float64'))
+        k, starts, ends = self._get_runs(boxes)
+        counts = ends - starts
+        # every (box, candidate file) pair, taken from the shortest run of each box.
+        rows = np.repeat(np.arange(len(boxes)), counts)
+        offsets = np.zeros(len(boxes)+1, dtype='int64')
+        offsets[1:] = np.cumsum(counts)
+        pos = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, counts)
+        ind = self._orders[k[rows], pos]
+        keep = self._overlaps(ind, boxes[rows])
+        rows, ind = rows[keep], ind[keep]
+        order = np.lexsort((ind, rows))
+        rows, ind = rows[order], ind[order]
+        splits = np.searchsorted(rows, np.arange(1, len(boxes)))
+        return [self.filenum[_ind] for _ind in np.split(ind, splits)]
+
+
+    def cell_ranges(self, filenum, xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None):
+        """Returns the ranges, in cell sorted order, of the cells of a file overlapping a box.
+
+        Parameters
+        ----------
+        filenum : int
+            File number.
+        xmin : float, optional
+            Minimum x-value.
+        xmax : float, optional
+            Maximum x-value.
+        ymin : float, optional
+            Minimum y-value.
+        ymax : float, optional
+            Maximum y-value.
+        zmin : float, optional
+            Minimum z-value.
+        zmax : float, optional
+            Maximum z-value.
+
+        Returns
+        -------
+        ranges : array
+            (K, 2) start and end positions in the file's cell order, None if the file
+            has no sorted grid.
+        """
+        if self.cell_counts is None or self.is_sorted == False:
+            return None
+        i = np.where(self.filenum == filenum)[0][0]
+        box = get_box(xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax)
+        bounds = self.bounds[i]
+        cells = np.zeros(1, dtype='int64')
+        for axis in range(0, 3):
+            width = max(bounds[axis+3] - bounds[axis], np.finfo('float64').tiny)
+            ilo, ihi = 0, self.ngrid-1
+            if not np.isnan(box[2*axis]):
+                ilo = int(np.clip(np.floor((box[2*axis] - bounds[axis])*(self.ngrid/width)), 0, self.ngrid-1))
+            if not np.isnan(box[2*axis+1]):
+                ihi = int(np.clip(np.floor((box[2*axis+1] - bounds[axis])*(self.ngrid/width)), 0, self.ngrid-1))
+            cells = (cells[:, np.newaxis]*self.ngrid + np.arange(ilo, ihi+1)[np.newaxis, :]).flatten()
+        counts = np.asarray(self.cell_counts[i], dtype='int64')
+        offsets = np.zeros(len(counts)+1, dtype='int64')
+        offsets[1:] = np.cumsum(counts)
+        starts, ends = offsets[cells], offsets[cells+1]
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        if len(starts) == 0:
+            return np.zeros((0, 2), dtype='int64')
+        # merge ranges which touch.
+        new = np.ones(len(starts), dtype='bool')
+        new[1:] = starts[1:] != ends[:-1]
+        last = np.ones(len(starts), dtype='bool')
+        last[:-1] = new[1:]
+        return np.column_stack([starts[new], ends[last]])
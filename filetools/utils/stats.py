@@ -0,0 +1,162 @@
+import os
+import time
+import json
+import threading
+
+
+def make_record(fname, rank=0):
+    """Returns an empty per-file record for ReadStats.
+
+    Parameters
+    ----------
+    fname : str
+        File name.
+    rank : int, optional
+        MPI rank reading the file.
+
+    Returns
+    -------
+    record : dict
+        Contains 'file', 'rank', 'pid', 'thread', 'phases' (list of [name, start, end]
+        with wall clock times in seconds), 'nbytes' (bytes read from the file,
+        including records dropped by the region cut), 'nread' (particles read) and
+        'nkept' (particles kept after the region cut).
+    """
+    return {'file': fname, 'rank': rank, 'pid': os.getpid(), 'thread': threading.get_ident(),
+            'phases': [], 'nbytes': 0, 'nread': 0, 'nkept': 0}
+
+
+def add_phase(record, name, start):
+    """Adds a phase from start until now to a record and returns the current time.
+
+    Parameters
+    ----------
+    record : dict
+        Record from make_record.
+    name : str
+        Phase name, e.g. 'open', 'decode', 'mask'.
+    start : float
+        Start time, from time.time().
+    """
+    end = time.time()
+    record['phases'].append([name, start, end])
+    return end
+
+
+class ReadStats:
+
+
+    def __init__(self):
+        """Collects per-file timings, bytes and particle counts of a read.
+
+        Pass an instance as stats= to ReadGADGET.read, after which files holds a record
+        (see make_record) for each sub-file read and phases the timings of steps which
+        are not per file, e.g. combining MPI outputs.
+        """
+        self.files = []
+        self.phases = []
+
+
+    def add_file(self, record):
+        """Adds a per-file record."""
+        self.files.append(record)
+
+
+    def add_phase(self, name, start, rank=0):
+        """Adds a phase from start until now, not tied to a file, and returns the current time."""
+        end = time.time()
+        self.phases.append({'name': name, 'rank': rank, 'pid': os.getpid(), 'start': start, 'end': end})
+        return end
+
+
+    def merge(self, other):
+        """Adds the records of another ReadStats object, e.g. from another rank."""
+        self.files.extend(other.files)
+        self.phases.extend(other.phases)
+
+
+    def gather_mpi(self, MPI, tag=20):
+        """Gathers the records of every MPI rank onto rank 0.
+
+        Parameters
+        ----------
+        MPI : obj
+            mpiutils MPI class object.
+        tag : int, optional
+            Message tag.
+        """
+        if MPI.rank != 0:
+            MPI.send(self.to_dict(), to_rank=0, tag=tag)
+            return
+        for i in range(1, MPI.size):
+            data = MPI.recv(i, tag=tag)
+            self.files.extend(data['files'])
+            self.phases.extend(data['phases'])
+
+
+    def get_file_times(self):
+        """Returns the total time spent in each phase for each file, as a list of
+        (file, rank, {phase: seconds}, total seconds) sorted by total time, slowest first."""
+        out = []
+        for record in self.files:
+            times = {}
+            for name, start, end in record['phases']:
+                times[name] = times.get(name, 0.) + end - start
+            out.append((record['file'], record['rank'], times, sum(times.values())))
+        return sorted(out, key=lambda x: -x[3])
+
+
+    def summary(self):
+        """Returns the total time of each phase, the bytes and particles read and kept,
+        and the selectivity (fraction of particles kept)."""
+        times = {}
+        for record in self.files:
+            for name, start, end in record['phases']:
+                times[name] = times.get(name, 0.) + end - start
+        for phase in self.phases:
+            times[phase['name']] = times.get(phase['name'], 0.) + phase['end'] - phase['start']
+        nread = sum(record['nread'] for record in self.files)
+        nkept = sum(record['nkept'] for record in self.files)
+        return {'files': len(self.files), 'times': times,
+                'nbytes': sum(record['nbytes'] for record in self.files),
+                'nread': nread, 'nkept': nkept,
+                'selectivity': nkept/nread if nread != 0 else None}
+
+
+    def to_dict(self):
+        """Returns the records as a dict of plain python objects."""
+        return {'files': self.files, 'phases': self.phases}
+
+
+    def to_json(self, fname=None):
+        """Returns the records as a JSON string, and writes them to fname if given."""
+        text = json.dumps(self.to_dict())
+        if fname is not None:
+            with open(fname, 'w') as f:
+                f.write(text)
+        return text
+
+
+    def to_chrome_trace(self, fname=None):
+        """Returns the records in Chrome trace event format (for chrome://tracing or
+        Perfetto), with one row per rank and reading thread, and writes them to fname if
+        given."""
+        events = []
+        starts = [p[1] for record in self.files for p in record['phases']] + [p['start'] for p in self.phases]
+        t0 = min(starts) if len(starts) != 0 else 0.
+        for record in self.files:
+            args = {'nbytes': record['nbytes'], 'nread': record['nread'], 'nkept': record['nkept']}
+            for name, start, end in record['phases']:
+                events.append({'name': name, 'cat': record['file'], 'ph': 'X',
+                               'ts': (start - t0)*1e6, 'dur': (end - start)*1e6,
+                               'pid': record['rank'], 'tid': '%d:%d' % (record['pid'], record['thread']),
+                               'args': dict(args, file=record['file'])})
+        for phase in self.phases:
+            events.append({'name': phase['name'], 'cat': 'read', 'ph': 'X',
+                           'ts': (phase['start'] - t0)*1e6, 'dur': (phase['end'] - phase['start'])*1e6,
+                           'pid': phase['rank'], 'tid': 'main:%d' % phase['pid']})
+        text = json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+        if fname is not None:
+            with open(fname, 'w') as f:
+                f.write(text)
+        return text
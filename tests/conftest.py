@@ -0,0 +1,56 @@
+import os
+import sys
+import numpy as np
+import pytest
+import h5py
+import fitsio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import synthetic
+
+
+NFILES = 4
+NPART = 2000
+BOXSIZE = 100.
+
+
+def read_raw(gfname, nfiles=NFILES, npart=NPART):
+    """Reads the positions, velocities and IDs of a synthetic snapshot straight from the
+    Fortran records, as a reference independent of the readers being tested."""
+    pos, vel, pid = [], [], []
+    for i in range(0, nfiles):
+        with open(gfname + '.' + str(i), 'rb') as f:
+            f.seek(4 + 256 + 4)
+            for dtype, ncomp, datas in [('<f4', 3, pos), ('<f4', 3, vel), ('<u4', 1, pid)]:
+                f.seek(4, 1)
+                data = np.fromfile(f, dtype=dtype, count=npart*ncomp)
+                datas.append(data.reshape(npart, ncomp) if ncomp != 1 else data)
+                f.seek(4, 1)
+    return np.concatenate(pos), np.concatenate(vel), np.concatenate(pid)
+
+
+@pytest.fixture(scope='session')
+def gadget_snapshot(tmp_path_factory):
+    """Synthetic snapshot of NFILES sub-files, returned as (gfname, infoname, raw)."""
+    gfname = str(tmp_path_factory.mktemp('gadget') / 'snap')
+    infoname = synthetic.make_gadget(gfname, nfiles=NFILES, npart=NPART, boxsize=BOXSIZE)
+    return gfname, infoname, read_raw(gfname)
+
+
+@pytest.fixture(scope='session')
+def fits_table(tmp_path_factory):
+    """Synthetic FITS table, returned as (fname, data)."""
+    fname = str(tmp_path_factory.mktemp('fits') / 'table.fits')
+    synthetic.make_fits(fname, nrows=10000, ncols=4)
+    return fname, fitsio.read(fname)
+
+
+@pytest.fixture(scope='session')
+def hdf5_file(tmp_path_factory):
+    """Synthetic chunked HDF5 file, returned as (fname, {key: data})."""
+    fname = str(tmp_path_factory.mktemp('hdf5') / 'data.hdf5')
+    synthetic.make_hdf5(fname, nrows=20000, chunk=1000)
+    with h5py.File(fname, 'r') as f:
+        data = {key: f[key][()] for key in f.keys()}
+    return fname, data
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from filetools.fits import ReadFITS
+
+
+def test_read_chunks(fits_table):
+    fname, table = fits_table
+    RF = ReadFITS()
+    RF.file(fname, chunks=7)
+    data = np.concatenate([chunk for chunk in RF])
+    assert np.array_equal(data, table)
+    RF.clean()
+
+
+def test_chunk_bytes_columns(fits_table):
+    fname, table = fits_table
+    RF = ReadFITS()
+    RF.file(fname, chunk_bytes=8*16*100, columns=['C0', 'C1'])
+    assert RF.fraction_rows == 800
+    data = RF.read(columns=['C2'], chunk=1)
+    assert np.array_equal(data['C2'], table['C2'][800:1600])
+    with pytest.raises(ValueError):
+        RF.read(columns=['C0', 'C1', 'C2'])
+    RF.clean()
+
+
+def test_prefetch_restart(fits_table):
+    fname, table = fits_table
+    RF = ReadFITS()
+    RF.file(fname, chunks=10, prefetch=2)
+    assert np.array_equal(RF.read(), table[:1000])
+    assert np.array_equal(RF.read(chunk=5), table[5000:6000])
+    assert np.array_equal(RF.read(), table[6000:7000])
+    RF.clean()
+    assert RF._prefetcher is None
+
+
+def _where_c0(data):
+    return data['C0'] < 0.3
+
+
+@pytest.mark.parametrize('pool', ['thread', 'process'])
+def test_scan(fits_table, pool):
+    fname, table = fits_table
+    RF = ReadFITS()
+    RF.file(fname, chunks=9)
+    expected = table[(table['C1'] >= 0.2) & (table['C1'] <= 0.4)][['C0', 'C2']]
+    serial = RF.scan(columns=['C0', 'C2'], where={'C1': (0.2, 0.4)})
+    pooled = RF.scan(columns=['C0', 'C2'], where={'C1': (0.2, 0.4)}, workers=3, pool=pool)
+    for col in ['C0', 'C2']:
+        assert np.array_equal(serial[col], expected[col])
+        assert np.array_equal(pooled[col], expected[col])
+    data = RF.scan(where=_where_c0, where_columns=['C0'], workers=2, pool=pool)
+    assert np.array_equal(data, table[table['C0'] < 0.3])
+    RF.clean()
+
+
+@pytest.mark.parametrize('columns', [None, ['C3', 'C1'], 'C2'])
+def test_read_out(fits_table, columns):
+    fname, table = fits_table
+    RF = ReadFITS()
+    RF.file(fname, chunks=6)
+    buf = RF.get_buffer(columns=columns)
+    datas = []
+    while RF.read_all == False:
+        data = RF.read(columns=columns, out=buf)
+        assert np.shares_memory(data, buf)
+        datas.append(data.copy())
+    data = np.concatenate(datas)
+    if columns is None:
+        assert np.array_equal(data, table)
+    elif isinstance(columns, str):
+        assert np.array_equal(data, table[columns])
+    else:
+        for col in columns:
+            assert np.array_equal(data[col], table[col])
+    RF.clean()
@@ -0,0 +1,22 @@
+import shutil
+import numpy as np
+import pytest
+
+from filetools.gadget import gadget2binary
+from filetools.gadget import load_gadget_binary
+
+
+@pytest.mark.parametrize('fmt', ['npy', 'hdf5'])
+def test_binary_old_info(gadget_snapshot, tmp_path, fmt):
+    gfname, infoname, raw = gadget_snapshot
+    for i in range(0, 4):
+        shutil.copy(gfname + '.' + str(i), str(tmp_path / ('snap.' + str(i))))
+    _gfname = str(tmp_path / 'snap')
+    # an info file without the particle count column.
+    _infoname = _gfname + '.info'
+    np.savetxt(_infoname, np.loadtxt(infoname)[:, :7])
+    gadget2binary(_gfname, _infoname, fmt=fmt, backend='memmap')
+    pos, vel, pid = load_gadget_binary(_gfname, fmt=fmt, return_pid=True)
+    assert np.array_equal(pos, raw[0])
+    assert np.array_equal(vel, raw[1])
+    assert np.array_equal(pid, np.arange(len(raw[0])))
@@ -0,0 +1,40 @@
+import os
+
+import synthetic
+
+from filetools.gadget import header
+
+
+def test_header_cache_invalidates(tmp_path):
+    gfname = str(tmp_path / 'snap')
+    synthetic.make_gadget(gfname, nfiles=1, npart=100)
+    assert header.get_header(gfname).npart[1] == 100
+    mtime = os.stat(gfname + '.0').st_mtime_ns
+    # same size, new contents and modification time.
+    synthetic.make_gadget(gfname, nfiles=1, npart=100, seed=1)
+    with open(gfname + '.0', 'r+b') as f:
+        f.seek(4 + 4)
+        f.write((50).to_bytes(4, 'little'))
+    os.utime(gfname + '.0', ns=(mtime, mtime + 10**9))
+    assert header.get_header(gfname).npart[1] == 50
+    # same modification time, new size.
+    synthetic.make_gadget(gfname, nfiles=1, npart=200)
+    os.utime(gfname + '.0', ns=(mtime, mtime + 10**9))
+    assert header.get_header(gfname).npart[1] == 200
+    # one entry per file, however often it changed.
+    assert list(header._HEADER_CACHE.keys()).count(os.path.abspath(gfname + '.0')) == 1
+
+
+def test_header_cache_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(header, '_HEADER_CACHE_SIZE', 3)
+    header.clear_header_cache()
+    gfname = str(tmp_path / 'snap')
+    synthetic.make_gadget(gfname, nfiles=5, npart=10)
+    fnames = [os.path.abspath(gfname + '.' + str(i)) for i in range(0, 5)]
+    for fname in fnames:
+        header.get_header(fname)
+    assert list(header._HEADER_CACHE.keys()) == fnames[2:]
+    # a hit moves the entry to the most recently used end.
+    header.get_header(fnames[2])
+    header.get_header(fnames[0])
+    assert list(header._HEADER_CACHE.keys()) == [fnames[4], fnames[2], fnames[0]]
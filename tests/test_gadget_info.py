@@ -0,0 +1,64 @@
+import os
+import hashlib
+import numpy as np
+import pytest
+
+from filetools.gadget import ReadGADGET
+from filetools.gadget import make_gadget_info
+from filetools.gadget import load_gadget_info
+
+
+def get_md5(fname):
+    with open(fname, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def test_sort_keeps_snapshot(gadget_snapshot, tmp_path):
+    gfname, infoname, raw = gadget_snapshot
+    fnames = [gfname + '.' + str(i) for i in range(0, 4)]
+    md5s = [get_md5(fname) for fname in fnames]
+    sortinfo = str(tmp_path / 'snap.sorted.info')
+    make_gadget_info(gfname, sortinfo, ngrid=4, sort=True, workers=2)
+    assert [get_md5(fname) for fname in fnames] == md5s
+    info = load_gadget_info(sortinfo)
+    assert info['is_sorted'] == True
+    order = np.load(info['order'])
+    offsets = np.concatenate([[0], np.cumsum(info['npart'])])
+    for i in range(0, len(fnames)):
+        assert np.array_equal(np.sort(order[offsets[i]:offsets[i+1]]), np.arange(info['npart'][i]))
+
+
+@pytest.mark.parametrize('cut', [dict(xmin=10., xmax=30., ymin=20., ymax=70.),
+                                 dict(xmin=60., zmax=15.),
+                                 dict(center=[50., 50., 50.], radius=20.)])
+def test_sorted_read(gadget_snapshot, tmp_path, cut):
+    gfname, infoname, raw = gadget_snapshot
+    sortinfo = str(tmp_path / 'snap.sorted.info')
+    make_gadget_info(gfname, sortinfo, ngrid=4, sort=True)
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    ref = RG.read(return_pos=True, return_vel=True, return_pid=True, backend='memmap', **cut)
+    RG.file(gfname, info=sortinfo)
+    data = RG.read(return_pos=True, return_vel=True, return_pid=True, backend='memmap', **cut)
+    for _data, _ref in zip(data, ref):
+        assert np.array_equal(_data, _ref)
+    # the cell order is only used for the particle type it was made for.
+    assert RG._get_file_ranges(RG.filenum, ['a', 'b', 'c', 'd'], 'memmap', 'gas', *([None]*6)) is None
+
+
+def test_stale_sidecar(gadget_snapshot, tmp_path):
+    gfname, infoname, raw = gadget_snapshot
+    _infoname = str(tmp_path / 'snap.info')
+    make_gadget_info(gfname, _infoname, ngrid=2)
+    assert 'cell_counts' in load_gadget_info(_infoname)
+    mtime = os.path.getmtime(_infoname + '.npz')
+    os.utime(_infoname, (mtime + 10., mtime + 10.))
+    info = load_gadget_info(_infoname)
+    assert 'cell_counts' not in info
+    assert np.array_equal(info['npart'], np.full(4, len(raw[0])//4))
+
+
+def test_sort_requires_grid(gadget_snapshot, tmp_path):
+    gfname, infoname, raw = gadget_snapshot
+    with pytest.raises(ValueError):
+        make_gadget_info(gfname, str(tmp_path / 'snap.info'), sort=True)
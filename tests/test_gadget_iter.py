@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from filetools.gadget import ReadGADGET
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+@pytest.mark.parametrize('npart', [None, 1500, 2000, 7000])
+def test_iter_chunks(gadget_snapshot, prefetch, npart):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    kwargs = dict(return_pos=True, return_vel=False, return_pid=True, backend='memmap')
+    ref = RG.read(**kwargs)
+    chunks = list(RG.iter_chunks(npart=npart, prefetch=prefetch, **kwargs))
+    for chunk in chunks:
+        assert isinstance(chunk, tuple) and type(ref) == tuple
+        for _data in chunk:
+            assert isinstance(_data, np.memmap) == False and _data.flags.writeable == True
+    lengths = [len(chunk[0]) for chunk in chunks]
+    if npart is None:
+        assert lengths == [len(raw[0])//4]*4
+    else:
+        # chunks run across sub-file boundaries, only the last may be short.
+        assert all(length == npart for length in lengths[:-1]) and 0 < lengths[-1] <= npart
+    for j in range(0, 2):
+        assert np.array_equal(np.concatenate([chunk[j] for chunk in chunks]), ref[j])
+
+
+def test_iter_chunks_cut(gadget_snapshot):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    kwargs = dict(return_pos=False, return_vel=True, backend='memmap', center=[50., 50., 50.], radius=30.)
+    ref = RG.read(**kwargs)
+    chunks = list(RG.iter_chunks(npart=500, prefetch=1, **kwargs))
+    assert np.array_equal(np.concatenate(chunks), ref)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from filetools.gadget import ReadGADGET
+from filetools.gadget import make_gadget_info
+from filetools import utils
+
+
+def _read_mpi(MPI, gfname, infoname, collective, cut):
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    return RG.read(return_pos=True, return_vel=True, return_pid=True, backend='memmap',
+                   MPI=MPI, collective=collective, preallocate=True, **cut)
+
+
+@pytest.mark.parametrize('collective', [False, True])
+@pytest.mark.parametrize('cut', [dict(), dict(xmin=10., xmax=60., zmax=40.)])
+def test_read_mpi(gadget_snapshot, collective, cut):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    ref = RG.read(return_pos=True, return_vel=True, return_pid=True, backend='memmap', **cut)
+    outs = utils.run_local(_read_mpi, 3, gfname, infoname, collective, cut)
+    for _data, _ref in zip(outs[0], ref):
+        assert np.array_equal(_data, _ref)
+
+
+def _no_header(fname):
+    raise AssertionError("Header of %s read." % fname)
+
+
+def test_info_npart(gadget_snapshot, tmp_path, monkeypatch):
+    gfname, infoname, raw = gadget_snapshot
+    _infoname = str(tmp_path / 'snap.info')
+    make_gadget_info(gfname, _infoname)
+    RG = ReadGADGET()
+    RG.file(gfname, info=_infoname)
+    # counts of the type the info file was made for come from it, without the headers.
+    monkeypatch.setattr('filetools.gadget.header.get_header', _no_header)
+    assert np.array_equal(RG._get_file_npart([3, 1], part='dm'), [len(raw[0])//4]*2)
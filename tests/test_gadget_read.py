@@ -0,0 +1,75 @@
+import itertools
+import numpy as np
+import pytest
+
+from filetools.gadget import ReadGADGET
+from filetools import utils
+
+
+FLAGS = [flags for flags in itertools.product([True, False], repeat=3) if any(flags)]
+
+
+def get_expected(raw, flags, mask=None):
+    """Returns the raw fields selected by (return_pos, return_vel, return_pid)."""
+    out = [_raw if mask is None else _raw[mask] for _raw, flag in zip(raw, flags) if flag]
+    if len(out) == 1:
+        return [out[0]]
+    return out
+
+
+def as_list(data, flags):
+    """Returns a read output as a list of fields."""
+    if sum(flags) == 1:
+        return [data]
+    return list(data)
+
+
+@pytest.mark.parametrize('flags', FLAGS)
+def test_preallocate(gadget_snapshot, flags):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    kwargs = dict(return_pos=flags[0], return_vel=flags[1], return_pid=flags[2], backend='memmap')
+    data = as_list(RG.read(preallocate=True, **kwargs), flags)
+    for _data, _expected in zip(data, get_expected(raw, flags)):
+        assert np.array_equal(_data, _expected)
+
+
+@pytest.mark.parametrize('cut', [dict(xmin=10., xmax=30., ymin=20., ymax=70.),
+                                 dict(center=[50., 50., 50.], radius=20.),
+                                 dict(xmin=90., xmax=10., periodic=True),
+                                 dict(sample=0.3)])
+@pytest.mark.parametrize('flags', FLAGS)
+def test_preallocate_cut(gadget_snapshot, cut, flags):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    kwargs = dict(return_pos=flags[0], return_vel=flags[1], return_pid=flags[2], backend='memmap')
+    stats = utils.ReadStats()
+    data = as_list(RG.read(preallocate=True, stats=stats, **cut, **kwargs), flags)
+    ref = as_list(RG.read(preallocate=False, **cut, **kwargs), flags)
+    for _data, _ref in zip(data, ref):
+        assert np.array_equal(_data, _ref)
+    # the kept particles are counted first, so nothing is concatenated.
+    names = [phase['name'] for phase in stats.phases]
+    assert 'count' in names and 'concatenate' not in names
+
+
+def test_preallocate_sample(gadget_snapshot):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    pos = RG.read(return_pos=True, return_vel=False, backend='memmap', preallocate=True, sample=3)
+    nfiles = len(RG.filenum)
+    npart = len(raw[0])//nfiles
+    expected = np.concatenate([raw[0][i*npart:(i+1)*npart][::3] for i in range(0, nfiles)])
+    assert np.array_equal(pos, expected)
+
+
+def test_preallocate_other_part(gadget_snapshot):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    # counts come from the header of the requested type, not the info file.
+    pos = RG.read(return_pos=True, return_vel=False, part='gas', backend='memmap', preallocate=True)
+    assert len(pos) == 0
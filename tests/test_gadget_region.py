@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from filetools.gadget import ReadGADGET
+from filetools.gadget import make_gadget_info
+
+from conftest import BOXSIZE
+from test_gadget_read import FLAGS, get_expected, as_list
+
+
+def get_region_mask(pos, xmin, xmax, ymin, ymax, periodic=False):
+    """Brute force mask of the x and y limits, wrapping around the box if periodic."""
+    mask = np.ones(len(pos), dtype='bool')
+    for axis, lim_min, lim_max in [(0, xmin, xmax), (1, ymin, ymax)]:
+        x = pos[:, axis]
+        if periodic == True:
+            x = np.mod(x - lim_min, BOXSIZE)
+            lim_min, lim_max = 0., np.mod(lim_max - lim_min, BOXSIZE)
+        mask &= (x >= lim_min) & (x <= lim_max)
+    return mask
+
+
+def get_sphere_mask(pos, center, radius, periodic=False):
+    """Brute force mask of a sphere, using the nearest periodic image if periodic."""
+    dpos = pos.astype('float64') - np.asarray(center)
+    if periodic == True:
+        dpos = dpos - BOXSIZE*np.round(dpos/BOXSIZE)
+    return np.sum(dpos**2., axis=1) <= radius**2.
+
+
+CUTS = [(dict(xmin=10., xmax=30., ymin=20., ymax=70.), False),
+        (dict(xmin=90., xmax=10., ymin=-10., ymax=15.), True),
+        (dict(center=[50., 50., 50.], radius=20.), False),
+        (dict(center=[95., 2., 50.], radius=15.), True)]
+
+
+def get_cut_mask(pos, cut, periodic):
+    if 'center' in cut:
+        return get_sphere_mask(pos, cut['center'], cut['radius'], periodic=periodic)
+    return get_region_mask(pos, cut['xmin'], cut['xmax'], cut['ymin'], cut['ymax'], periodic=periodic)
+
+
+@pytest.mark.parametrize('cut, periodic', CUTS)
+@pytest.mark.parametrize('flags', FLAGS)
+@pytest.mark.parametrize('sorted_info', [False, True])
+def test_read_cut(gadget_snapshot, tmp_path_factory, cut, periodic, flags, sorted_info):
+    gfname, infoname, raw = gadget_snapshot
+    if sorted_info == True:
+        infoname = str(tmp_path_factory.getbasetemp() / 'snap.region.sorted.info')
+        make_gadget_info(gfname, infoname, ngrid=4, sort=True)
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    data = RG.read(return_pos=flags[0], return_vel=flags[1], return_pid=flags[2],
+                   backend='memmap', periodic=periodic, **cut)
+    mask = get_cut_mask(raw[0], cut, periodic)
+    assert mask.sum() > 0
+    for _data, _expected in zip(as_list(data, flags), get_expected(raw, flags, mask=mask)):
+        assert np.array_equal(_data, _expected)
+
+
+@pytest.mark.parametrize('cut, periodic', CUTS)
+def test_read_cut_pools(gadget_snapshot, cut, periodic):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    kwargs = dict(return_pos=False, return_vel=True, return_pid=True, backend='memmap',
+                  periodic=periodic, **cut)
+    vel, pid = RG.read(workers=2, pool='thread', **kwargs)
+    _vel, _pid = RG.read(workers=2, pool='process', **kwargs)
+    assert np.array_equal(vel, _vel)
+    assert np.array_equal(pid, _pid)
+    mask = get_cut_mask(raw[0], cut, periodic)
+    assert np.array_equal(pid, raw[2][mask])
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from filetools.gadget import ReadGADGET
+from filetools.gadget import make_gadget_info
+from filetools.gadget import read_single
+
+
+@pytest.mark.parametrize('sample', [True, False, 0, -2, 0., 1.5, 2., '2', None])
+def test_check_sample_invalid(sample):
+    with pytest.raises(ValueError):
+        read_single.check_sample(sample)
+
+
+@pytest.mark.parametrize('sample', [1, 3, np.int64(4), 0.25, 1.])
+def test_check_sample_valid(sample):
+    read_single.check_sample(sample)
+
+
+@pytest.mark.parametrize('sample', [3, 0.3])
+def test_sample_index(sample):
+    ind = read_single.get_sample_index(1000, sample, seed=2, key='snap.0')
+    index = np.sort(np.random.default_rng(0).choice(1000, 400, replace=False))
+    _ind = read_single.get_sample_index(1000, sample, seed=2, key='snap.0', index=index)
+    assert np.array_equal(_ind, np.intersect1d(ind, index))
+
+
+@pytest.mark.parametrize('sample', [3, 0.3])
+def test_sample_cut(gadget_snapshot, tmp_path, sample):
+    gfname, infoname, raw = gadget_snapshot
+    sortinfo = str(tmp_path / 'snap.sorted.info')
+    make_gadget_info(gfname, sortinfo, ngrid=4, sort=True)
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    pos, pid = RG.read(return_pos=True, return_vel=False, return_pid=True, backend='memmap',
+                       sample=sample, seed=1)
+    mask = (pos[:, 0] >= 10.) & (pos[:, 0] <= 60.) & (pos[:, 2] <= 40.)
+    RG.file(gfname, info=sortinfo)
+    _pos, _pid = RG.read(return_pos=True, return_vel=False, return_pid=True, backend='memmap',
+                         sample=sample, seed=1, xmin=10., xmax=60., zmax=40.)
+    assert np.array_equal(_pos, pos[mask])
+    assert np.array_equal(_pid, pid[mask])
+
+
+def test_read_bool_sample(gadget_snapshot):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    with pytest.raises(ValueError):
+        RG.read(return_pos=True, return_vel=False, backend='memmap', preallocate=True, sample=True)
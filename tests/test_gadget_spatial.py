@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import h5py
+
+from filetools.gadget import gadget2sorted_hdf5
+from filetools.gadget import read_sorted_hdf5
+from filetools.gadget import get_morton_key
+from filetools.gadget import get_morton_cells
+from filetools.gadget import spatial
+
+
+def test_morton_round_trip():
+    rng = np.random.default_rng(0)
+    cells = rng.integers(0, 2**21, (3, 1000))
+    ix, iy, iz = get_morton_cells(get_morton_key(*cells))
+    assert np.array_equal(np.array([ix, iy, iz]), cells)
+
+
+@pytest.fixture(scope='module', params=[3, 21])
+def sorted_hdf5(gadget_snapshot, tmp_path_factory, request):
+    """Sorted HDF5 copy of the synthetic snapshot, at a coarse and at the finest level."""
+    gfname, infoname, raw = gadget_snapshot
+    hdf5_filename = str(tmp_path_factory.mktemp('sorted') / 'snap.hdf5')
+    gadget2sorted_hdf5(gfname, hdf5_filename, infoname=infoname, level=request.param, backend='memmap')
+    return hdf5_filename
+
+
+@pytest.mark.parametrize('cut', [dict(), dict(xmin=10., xmax=30., ymin=20., ymax=70.),
+                                 dict(zmin=80.), dict(xmin=200.)])
+def test_read_sorted(gadget_snapshot, sorted_hdf5, cut):
+    gfname, infoname, raw = gadget_snapshot
+    hdf5_filename = sorted_hdf5
+    pos, pid = read_sorted_hdf5(hdf5_filename, return_pos=True, return_vel=False, return_pid=True, **cut)
+    mask = np.ones(len(raw[0]), dtype='bool')
+    for axis, name in enumerate('xyz'):
+        if name + 'min' in cut:
+            mask &= raw[0][:, axis] >= cut[name + 'min']
+        if name + 'max' in cut:
+            mask &= raw[0][:, axis] <= cut[name + 'max']
+    order = np.argsort(pid)
+    assert np.array_equal(pid[order], raw[2][mask])
+    assert np.array_equal(pos[order], raw[0][mask])
+    if len(cut) == 0:
+        with h5py.File(hdf5_filename, 'r') as hdf5_file:
+            assert np.array_equal(spatial.get_sorted_ranges(hdf5_file), [[0, len(raw[0])]])
@@ -0,0 +1,28 @@
+from filetools.gadget import ReadGADGET
+from filetools import utils
+
+
+def test_stats_bytes_read(gadget_snapshot):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    stats = utils.ReadStats()
+    RG.read(return_pos=True, return_vel=True, backend='memmap', stats=stats)
+    summary = stats.summary()
+    assert summary['nbytes'] == raw[0].nbytes + raw[1].nbytes
+    assert summary['nread'] == summary['nkept'] == len(raw[0])
+
+
+def test_stats_empty_sphere(gadget_snapshot):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    stats = utils.ReadStats()
+    # a sphere between particles: the positions are still read to find that out.
+    center = raw[0][0].astype('float64') + 1e-3
+    vel = RG.read(return_pos=False, return_vel=True, backend='memmap', stats=stats,
+                  center=center, radius=1e-6)
+    summary = stats.summary()
+    assert len(vel) == 0 and summary['nkept'] == 0
+    assert summary['nread'] > 0
+    assert summary['nbytes'] == 12*summary['nread']
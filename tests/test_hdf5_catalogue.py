@@ -0,0 +1,48 @@
+import os
+import shutil
+import numpy as np
+import h5py
+
+from filetools import hdf5
+from filetools.hdf5 import utils
+
+
+def _no_catalogue(hdf5_file):
+    raise AssertionError("The catalogue was made rather than read from the sidecar.")
+
+
+def test_catalogue_sidecar(hdf5_file, tmp_path, monkeypatch):
+    fname = str(tmp_path / 'data.hdf5')
+    shutil.copy(hdf5_file[0], fname)
+    sidecar = fname + '.catalogue.json'
+    catalogue = hdf5.get_hdf5_catalogue(fname)
+    assert os.path.isfile(sidecar)
+    assert catalogue['pos']['shape'] == [20000, 3]
+    assert catalogue['pos']['chunks'] == [1000, 3]
+    assert np.dtype(catalogue['pid']['dtype']) == np.dtype('int64')
+    assert catalogue['pid']['nbytes'] == 8*20000
+    # an unchanged file is reloaded from the sidecar.
+    with monkeypatch.context() as m:
+        m.setattr(utils, '_make_hdf5_catalogue', _no_catalogue)
+        assert hdf5.get_hdf5_catalogue(fname) == catalogue
+        assert hdf5.get_hdf5_keys(fname, catalogue=True) == catalogue
+    # a modified file makes the sidecar stale, so it is rewritten.
+    with h5py.File(fname, 'a') as f:
+        f.create_dataset('mass', data=np.ones(10))
+    new = hdf5.get_hdf5_catalogue(fname)
+    assert new['mass']['shape'] == [10] and new['pos'] == catalogue['pos']
+    with monkeypatch.context() as m:
+        m.setattr(utils, '_make_hdf5_catalogue', _no_catalogue)
+        assert hdf5.get_hdf5_catalogue(fname) == new
+    # a corrupt sidecar is replaced.
+    with open(sidecar, 'w') as f:
+        f.write('{')
+    assert hdf5.get_hdf5_catalogue(fname) == new
+
+
+def test_catalogue_no_cache(hdf5_file, tmp_path):
+    fname = str(tmp_path / 'data.hdf5')
+    shutil.copy(hdf5_file[0], fname)
+    catalogue = hdf5.get_hdf5_keys(fname, catalogue=True, cache=False)
+    assert sorted(catalogue.keys()) == ['pid', 'pos', 'vel']
+    assert os.path.isfile(fname + '.catalogue.json') == False
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import h5py
+
+from filetools import hdf5
+from filetools.hdf5 import iterate
+
+
+@pytest.fixture(scope='module')
+def mixed_chunks(tmp_path_factory):
+    """HDF5 file whose datasets have different chunk lengths, returned as (fname, data)."""
+    fname = str(tmp_path_factory.mktemp('hdf5_iterate') / 'data.hdf5')
+    nrows = 7001
+    data = {'pos': np.random.default_rng(0).uniform(0., 1., (nrows, 3)),
+            'pid': np.arange(nrows, dtype='int64')}
+    with h5py.File(fname, 'w') as f:
+        f.create_dataset('pos', data=data['pos'], chunks=(300, 3))
+        f.create_dataset('pid', data=data['pid'], chunks=(200,))
+        f.create_dataset('flat', data=data['pid'])
+    return fname, data
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+@pytest.mark.parametrize('size', [dict(block_rows=1), dict(block_rows=1000), dict(block_bytes=50000),
+                                  dict()])
+def test_iter_rows_once(mixed_chunks, size, prefetch):
+    fname, data = mixed_chunks
+    blocks = list(hdf5.iter_hdf5_data(fname, ['pos', 'pid'], prefetch=prefetch, **size))
+    pid = np.concatenate([block[1] for block in blocks])
+    # every row is read once and in order.
+    assert np.array_equal(pid, data['pid'])
+    assert np.array_equal(np.concatenate([block[0] for block in blocks]), data['pos'])
+    # blocks other than the last cover whole chunks of both datasets (lcm(300, 200)).
+    lengths = [len(block[1]) for block in blocks]
+    assert all(length % 600 == 0 for length in lengths[:-1])
+    assert len(set(lengths[:-1])) <= 1
+
+
+def test_block_rows(mixed_chunks):
+    fname, data = mixed_chunks
+    with h5py.File(fname, 'r') as f:
+        assert iterate.get_block_rows([f['pos'], f['pid']], block_bytes=0) == 600
+        # 32 bytes per row, so 2**20 bytes hold 32768 rows, rounded down to 600s.
+        assert iterate.get_block_rows([f['pos'], f['pid']], block_bytes=2**20) == 32400
+        assert iterate.get_block_rows([f['flat']], block_bytes=80) == 10
+    blocks = list(hdf5.iter_hdf5_data(fname, 'flat', block_rows=3000))
+    assert [len(block) for block in blocks] == [3000, 3000, 1001]
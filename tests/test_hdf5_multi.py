@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import h5py
+
+import synthetic
+
+from filetools.hdf5 import ReadHDF5
+from filetools.hdf5 import make_hdf5_info
+from filetools.hdf5 import multi
+
+
+@pytest.fixture(scope='module')
+def hdf5_parts(tmp_path_factory):
+    """Split synthetic HDF5 output, returned as (fname, infoname, {key: data})."""
+    fname = str(tmp_path_factory.mktemp('hdf5_parts') / 'data.*.hdf5')
+    data = {'pos': [], 'vel': [], 'pid': []}
+    for i in range(0, 4):
+        _fname = fname.replace('*', str(i))
+        synthetic.make_hdf5(_fname, nrows=5000, chunk=500, seed=i)
+        with h5py.File(_fname, 'r') as f:
+            for key in data:
+                data[key].append(f[key][()])
+    infoname = fname.replace('*', 'info')
+    make_hdf5_info(fname, infoname, 'pos', pool='thread')
+    return fname, infoname, {key: np.concatenate(data[key]) for key in data}
+
+
+def test_read_all(hdf5_parts):
+    fname, infoname, ref = hdf5_parts
+    RH = ReadHDF5()
+    RH.file(fname)
+    data = RH.read(['pos', 'pid'], pool='thread')
+    assert np.array_equal(data[0], ref['pos'])
+    assert np.array_equal(data[1], ref['pid'])
+
+
+@pytest.mark.parametrize('pool', ['thread', 'process'])
+@pytest.mark.parametrize('info', [False, True])
+@pytest.mark.parametrize('keys', [['pos', 'vel', 'pid'], ['vel', 'pid'], 'pid'])
+def test_read_region(hdf5_parts, pool, info, keys):
+    fname, infoname, ref = hdf5_parts
+    RH = ReadHDF5()
+    RH.file(fname, info=infoname if info == True else None)
+    cut = dict(xmin=100., xmax=400., ymin=250., zmax=600.)
+    data = RH.read(keys, pos_key='pos', workers=2, pool=pool, **cut)
+    pos = ref['pos']
+    mask = (pos[:, 0] >= 100.) & (pos[:, 0] <= 400.) & (pos[:, 1] >= 250.) & (pos[:, 2] <= 600.)
+    if isinstance(keys, list) == False:
+        data, keys = [data], [keys]
+    for _data, key in zip(data, keys):
+        assert np.array_equal(_data, ref[key][mask])
+
+
+def test_read_rows(hdf5_parts):
+    fname, infoname, ref = hdf5_parts
+    rng = np.random.default_rng(1)
+    ind = np.concatenate([np.arange(10, 400), np.sort(rng.choice(np.arange(400, 5000), 300, replace=False))])
+    with h5py.File(fname.replace('*', '0'), 'r') as f:
+        assert np.array_equal(multi._read_hdf5_rows(f['vel'], ind), ref['vel'][ind])
+        assert len(multi._read_hdf5_rows(f['vel'], ind[:0])) == 0
+
+
+def test_get_spans():
+    ind = np.array([0, 1, 2, 10, 11, 50, 60, 200])
+    spans = multi._get_spans(ind, gap=10, span=30)
+    assert np.array_equal(spans, [[0, 5], [5, 7], [7, 8]])
+    spans = multi._get_spans(np.arange(0, 100), gap=8, span=30)
+    assert np.array_equal(spans[:, 1] - spans[:, 0], [30, 30, 30, 10])
+
+
+@pytest.mark.parametrize('cut', [{}, dict(pos_key='pos', xmin=100.)])
+def test_read_mismatch(tmp_path, cut):
+    fname = str(tmp_path / 'data.*.hdf5')
+    for i in range(0, 3):
+        with h5py.File(fname.replace('*', str(i)), 'w') as f:
+            f.create_dataset('pos', data=np.full((10, 3), 200.))
+            # the last file has a different dtype for 'pid'.
+            f.create_dataset('pid', data=np.arange(10, dtype='int32' if i == 2 else 'int64'))
+    RH = ReadHDF5()
+    RH.file(fname)
+    with pytest.raises(ValueError, match='pid'):
+        RH.read(['pos', 'pid'], pool='thread', **cut)
+    assert len(RH.read('pos', pool='thread', **cut)) == 30
@@ -0,0 +1,48 @@
+import shutil
+import numpy as np
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from filetools import hdf5
+
+
+@pytest.mark.parametrize('select', [None, np.s_[100:5000], np.array([5, 7, 19000, 30]),
+                                    np.array([3, 3, 1])])
+def test_select_out(hdf5_file, select):
+    fname, data = hdf5_file
+    expected = data['pos'] if select is None else data['pos'][select]
+    assert np.array_equal(hdf5.get_hdf5_data(fname, 'pos', select=select), expected)
+    out = np.empty_like(expected)
+    hdf5.get_hdf5_data(fname, 'pos', select=select, out=out, pool=False)
+    assert np.array_equal(out, expected)
+    hdf5.close_hdf5_files()
+
+
+def test_pool_eviction(hdf5_file, tmp_path):
+    fname, data = hdf5_file
+    fnames = []
+    for i in range(0, 6):
+        fnames.append(str(tmp_path / ('data%i.hdf5' % i)))
+        shutil.copy(fname, fnames[-1])
+    hdf5.set_hdf5_pool_size(1)
+    try:
+        with hdf5.open_hdf5_file(fnames[0]) as hdf5_file:
+            # other files opened meanwhile do not close a file in use.
+            for _fname in fnames[1:]:
+                hdf5.get_hdf5_data(_fname, 'pid')
+            assert np.array_equal(hdf5_file['pid'][()], data['pid'])
+            hdf5.close_hdf5_files()
+            assert hdf5_file.id.valid
+        assert hdf5_file.id.valid == False
+
+        def _read(i):
+            return hdf5.get_hdf5_data(fnames[i % len(fnames)], ['pos', 'pid'])
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            for pos, pid in executor.map(_read, range(0, 60)):
+                assert np.array_equal(pos, data['pos'])
+                assert np.array_equal(pid, data['pid'])
+    finally:
+        hdf5.set_hdf5_pool_size(8)
+        hdf5.close_hdf5_files()
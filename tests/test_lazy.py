@@ -0,0 +1,30 @@
+import os
+import sys
+import subprocess
+
+import filetools
+
+
+HEAVY = ['h5py', 'fitsio', 'pygadgetreader']
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(filetools.__file__)))
+
+
+def _get_loaded(code):
+    """Runs code in a fresh interpreter and returns the heavy modules it left loaded."""
+    code += "\nimport sys\nprint(','.join(m for m in %r if m in sys.modules))" % (HEAVY,)
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return [m for m in out.strip().split(',') if m != '']
+
+
+def test_import_is_light():
+    assert _get_loaded("import filetools") == []
+    # subpackages, and looking up their functions, do not load the dependencies either.
+    assert _get_loaded("import filetools.fits, filetools.gadget, filetools.hdf5, filetools.utils\n"
+                       "filetools.hdf5.get_hdf5_data, filetools.fits.ReadFITS") == []
+
+
+def test_loaded_on_use(hdf5_file):
+    fname, data = hdf5_file
+    assert _get_loaded("import filetools\nfiletools.hdf5.get_hdf5_keys(%r, catalogue=True, "
+                       "cache=False)" % fname) == ['h5py']
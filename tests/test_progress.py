@@ -0,0 +1,82 @@
+import io
+import pytest
+
+from filetools import utils
+from filetools.gadget import ReadGADGET
+
+
+class _Rank:
+    """Stand-in for an MPI object of a given rank."""
+
+    def __init__(self, rank):
+        self.rank = rank
+
+
+def test_log_mode():
+    stream = io.StringIO()
+    tracker = utils.ProgressTracker(4, explanation='Reading', mode='log', log_interval=0.,
+                                    stream=stream)
+    for i in range(0, 4):
+        tracker.update(particles=10, nbytes=100)
+    tracker.close()
+    lines = stream.getvalue().splitlines()
+    # one line per update and the final summary.
+    assert len(lines) == 5
+    assert all(line.startswith('Reading : [') for line in lines)
+    assert lines[-1].startswith('Reading : [4/4]')
+    assert 'particles/s' in lines[-1] and 'MB/s' in lines[-1]
+
+
+def test_close_once():
+    stream = io.StringIO()
+    with utils.ProgressTracker(2, mode='log', stream=stream) as tracker:
+        tracker.update(2)
+    tracker.close()
+    assert len(stream.getvalue().splitlines()) == 1
+
+
+def test_bar_mode():
+    stream = io.StringIO()
+    tracker = utils.ProgressTracker(2, mode='bar', interval=0., bar_length=10, stream=stream)
+    tracker.update()
+    tracker.close()
+    out = stream.getvalue()
+    assert out.startswith('\r|#####_____| [1/2]')
+    assert out.endswith('\n')
+
+
+def test_off():
+    stream = io.StringIO()
+    for tracker in [utils.ProgressTracker(2, mode='off', stream=stream),
+                    utils.ProgressTracker(2, mode='log', MPI=_Rank(1), stream=stream)]:
+        tracker.update(2)
+        tracker.close()
+        assert tracker.mode == 'off'
+    assert stream.getvalue() == ''
+    assert utils.ProgressTracker(2, mode='log', MPI=_Rank(0), stream=stream).mode == 'log'
+
+
+def test_auto():
+    # StringIO is not a terminal.
+    assert utils.ProgressTracker(2, stream=io.StringIO()).mode == 'log'
+
+
+def test_rates():
+    tracker = utils.ProgressTracker(4, mode='off')
+    assert tracker.get_rates()[-1] is None
+    tracker.update(2, particles=100, nbytes=1000)
+    elapsed, rate, prate, mbrate, eta = tracker.get_rates()
+    assert elapsed > 0.
+    assert prate == pytest.approx(50*rate)
+    assert eta >= 0.
+
+
+def test_read_quiet(gadget_snapshot, capsys):
+    gfname, infoname, raw = gadget_snapshot
+    RG = ReadGADGET()
+    RG.file(gfname, info=infoname)
+    RG.read(return_pos=True, return_vel=False, backend='memmap')
+    list(RG.iter_chunks(return_pos=True, return_vel=False, backend='memmap'))
+    assert capsys.readouterr().out == ''
+    RG.read(return_pos=True, return_vel=False, backend='memmap', progress=True)
+    assert 'Reading from GADGET File : [4/4]' in capsys.readouterr().out
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from filetools.utils import FileIndex
+
+
+BOXSIZE = 100.
+
+
+def get_index(nfiles=200, seed=0):
+    rng = np.random.default_rng(seed)
+    lo = rng.uniform(0., 90., (nfiles, 3))
+    bounds = np.column_stack([lo, lo + rng.uniform(0., 10., (nfiles, 3))])
+    return FileIndex(np.arange(nfiles) + 10, bounds)
+
+
+def brute_overlaps(bounds, box):
+    """Brute force overlap of each file with a box, see FileIndex._overlaps."""
+    keep = np.ones(len(bounds), dtype='bool')
+    for axis in range(0, 3):
+        lim_min, lim_max = box[2*axis], box[2*axis+1]
+        if not np.isnan(lim_min):
+            keep &= bounds[:, axis+3] > lim_min
+        if not np.isnan(lim_max):
+            if np.isnan(lim_min):
+                keep &= bounds[:, axis] <= lim_max
+            else:
+                keep &= bounds[:, axis] < lim_max
+    return keep
+
+
+def test_query_batch():
+    FI = get_index()
+    rng = np.random.default_rng(1)
+    lo = rng.uniform(-10., 100., (300, 3))
+    boxes = np.column_stack([lo[:, 0], lo[:, 0] + rng.uniform(0., 40., 300),
+                             lo[:, 1], lo[:, 1] + rng.uniform(0., 40., 300),
+                             lo[:, 2], lo[:, 2] + rng.uniform(0., 40., 300)])
+    # unset limits, a file edge as a limit, and an empty box.
+    boxes[rng.random(boxes.shape) < 0.3] = np.nan
+    boxes[0] = [FI.bounds[5, 3], np.nan, np.nan, FI.bounds[7, 1], np.nan, np.nan]
+    boxes[1] = [200., 300., np.nan, np.nan, np.nan, np.nan]
+    boxes[2] = np.nan
+    files = FI.query_batch(boxes)
+    assert len(files) == len(boxes)
+    for box, _files in zip(boxes, files):
+        assert np.array_equal(_files, FI.filenum[brute_overlaps(FI.bounds, box)])
+    assert len(files[1]) == 0 and len(files[2]) == len(FI.filenum)
+
+
+def brute_periodic(bounds, lims):
+    """Brute force overlap with a box wrapping around the periodic box, by shifting it."""
+    keep = np.ones(len(bounds), dtype='bool')
+    for axis in range(0, 3):
+        lo, hi = lims[axis]
+        hi = lo + np.mod(hi - lo, BOXSIZE)
+        _keep = np.zeros(len(bounds), dtype='bool')
+        for shift in [-BOXSIZE, 0., BOXSIZE]:
+            _keep |= (bounds[:, axis+3] > lo + shift) & (bounds[:, axis] < hi + shift)
+        keep &= _keep
+    return keep
+
+
+@pytest.mark.parametrize('lims', [[(90., 10.), (-5., 20.), (30., 60.)],
+                                  [(95., 105.), (50., 40.), (0., 99.)]])
+def test_query_periodic(lims):
+    FI = get_index()
+    files = FI.query(xmin=lims[0][0], xmax=lims[0][1], ymin=lims[1][0], ymax=lims[1][1],
+                     zmin=lims[2][0], zmax=lims[2][1], boxsize=BOXSIZE)
+    assert np.array_equal(files, FI.filenum[brute_periodic(FI.bounds, lims)])
+
+
+def test_query_sphere_periodic():
+    FI = get_index()
+    center, radius = np.array([98., 50., 2.]), 8.
+    files = FI.query(center=center, radius=radius, boxsize=BOXSIZE)
+    dist2 = np.zeros(len(FI.filenum))
+    for axis in range(0, 3):
+        dist = np.full(len(FI.filenum), np.inf)
+        for shift in [-BOXSIZE, 0., BOXSIZE]:
+            _dist = np.maximum(np.maximum(FI.bounds[:, axis] - center[axis] - shift,
+                                          center[axis] + shift - FI.bounds[:, axis+3]), 0.)
+            dist = np.minimum(dist, _dist)
+        dist2 += dist**2
+    assert np.array_equal(files, FI.filenum[dist2 <= radius**2])
@@ -0,0 +1,24 @@
+import threading
+
+from filetools import utils
+
+
+def test_prefetch_closes_source():
+    closed = threading.Event()
+
+    def source():
+        try:
+            for i in range(0, 100):
+                yield i
+        finally:
+            closed.set()
+
+    items = utils.prefetch(source(), depth=2)
+    assert [next(items) for i in range(0, 3)] == [0, 1, 2]
+    items.close()
+    # the producer closed the source before close returned.
+    assert closed.is_set()
+
+
+def test_prefetch_order():
+    assert list(utils.prefetch(iter(range(0, 50)), depth=3)) == list(range(0, 50))